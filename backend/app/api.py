@@ -1,15 +1,41 @@
-from fastapi import FastAPI
-import joblib 
-from .schemas import MatchInput
+import os
+import json
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from typing import List
+from .schemas import MatchInput, LineupInput, LineupBatchInput
+from .inference import InferenceEngine
+from .model_store import LazyArtifacts, load_pickled
+from .feature_server import FeatureServer, NUMERIC_FEATURES
+from .player_index import load_published
+from .prediction_cache import make_cache, normalize_input, cache_key
+from .metrics import Metrics, profiled, profile_requested
+from .inplay import MatchState, MicroBatcher, LazyInPlayModel
 import pandas as pd
 import numpy as np
 
-app = FastAPI(title='Cricket Match Winner Prediction API')
 
-MODELS_DIR = "backend/models/"
-model = joblib.load(f"{MODELS_DIR}matchWinner.pkl")
-label_enc = joblib.load(f"{MODELS_DIR}label_encoders.pkl")
-scaler = joblib.load(f"{MODELS_DIR}scaler.pkl")
+@asynccontextmanager
+async def lifespan(app):
+    feature_server.start()
+    models.start()
+    yield
+    models.stop()
+    feature_server.stop()
+
+
+app = FastAPI(title='Cricket Match Winner Prediction API', lifespan=lifespan)
+
+MODELS_DIR = os.environ.get("CRICPRED_MODELS_DIR", "backend/models/")
+
+# Published by feature_store.py; without one, predictions fall back to DUMMY_VALUES
+FEATURE_SNAPSHOT_PATH = os.environ.get("CRICPRED_FEATURE_SNAPSHOT", "backend/app/feature_store/serving_snapshot.json")
+
+# Written by `python inplay.py train`; /ws/inplay refuses matches until it exists
+INPLAY_MODEL_PATH = os.environ.get("CRICPRED_INPLAY_MODEL", "backend/models/inplay.npz")
 
 TRAINING_COLUMNS = [
     'teamA', 'teamB', 'venue', 'toss_winner', 'toss_decision', 'competition',
@@ -20,25 +46,70 @@ TRAINING_COLUMNS = [
     'toss_decision_match_teamB', 'is_home_teamA', 'teamA_form_score', 'teamB_form_score'
 ]
 
+DUMMY_VALUES = {
+    'teamA_win_pct_last5': 0.48, 'teamB_win_pct_last5': 0.48, 'teamA_vs_teamB_h2h': 0.48,
+    'teamA_avg_runs_scored': 140.0, 'teamB_avg_runs_conceded': 139.7, 'teamB_avg_runs_scored': 139.5,
+    'teamA_avg_runs_conceded': 140.1, 'venue_win_bias_teamA': 0.18, 'venue_win_bias_teamB': 0.14,
+    'toss_helped_win_rate': 0.48, 'batting_first_win_pct': 0.46, 'toss_decision_match_teamA': 0.18,
+    'toss_decision_match_teamB': 0.18, 'is_home_teamA': 0.01, 'teamA_form_score': 14.5,
+    'teamB_form_score': 14.4
+}
 
-@app.get("/")
-def home():
-    return {"message": "CricPred API is working!"}
 
-@app.post("/predict")
-def predict(input_data: MatchInput):
-    input_df = pd.DataFrame([input_data.dict()])
-
-    dummy_values = {
-        'teamA_win_pct_last5': 0.48, 'teamB_win_pct_last5': 0.48, 'teamA_vs_teamB_h2h': 0.48,
-        'teamA_avg_runs_scored': 140.0, 'teamB_avg_runs_conceded': 139.7, 'teamB_avg_runs_scored': 139.5,
-        'teamA_avg_runs_conceded': 140.1, 'venue_win_bias_teamA': 0.18, 'venue_win_bias_teamB': 0.14,
-        'toss_helped_win_rate': 0.48, 'batting_first_win_pct': 0.46, 'toss_decision_match_teamA': 0.18,
-        'toss_decision_match_teamB': 0.18, 'is_home_teamA': 0.01, 'teamA_form_score': 14.5,
-        'teamB_form_score': 14.4
+def format_prediction(win_probability_teamA):
+    return {
+        "predicted_winner_is_teamA": bool(win_probability_teamA > 0.5),
+        "win_probability_for_teamA": float(win_probability_teamA)
     }
-    
-    for col, value in dummy_values.items():
+
+
+# Artifacts are memory-mapped from backend/models/packed (see model_store.py),
+# so workers share one copy; nothing is loaded until the first prediction
+models = LazyArtifacts(MODELS_DIR, build=lambda a: InferenceEngine(
+    a.model, a.label_encoders, a.scaler, TRAINING_COLUMNS, DUMMY_VALUES, NUMERIC_FEATURES))
+feature_server = FeatureServer(FEATURE_SNAPSHOT_PATH, index_loader=load_published)
+reference_models = LazyArtifacts(MODELS_DIR, loader=load_pickled)
+
+# Keyed on the normalized input plus model and snapshot versions; backend set by
+# CRICPRED_PREDICTION_CACHE ("memory", "sqlite:<path>" to share across workers, "off")
+prediction_cache = make_cache()
+models.on_reload.append(prediction_cache.invalidate)
+
+metrics = Metrics()
+metrics.describe("cricpred_requests_total", "counter", "HTTP requests by path, method and status")
+metrics.describe("cricpred_requests_in_flight", "gauge", "HTTP requests currently being handled")
+metrics.describe("cricpred_handlers_in_flight", "gauge", "Sync handlers currently running on the threadpool")
+metrics.describe("cricpred_request_seconds", "histogram", "Wall time per HTTP request, middleware to response")
+metrics.describe("cricpred_stage_seconds", "histogram",
+                 "Time per prediction stage; queue is arrival to the sync handler starting on the threadpool")
+metrics.describe("cricpred_predictions_total", "counter", "Rows predicted, by endpoint and cache result")
+CACHE_GAUGES = ("entries", "hits", "misses", "evictions", "expirations", "invalidations")
+for _name in CACHE_GAUGES:
+    metrics.describe(f"cricpred_prediction_cache_{_name}", "gauge", f"Prediction cache {_name}, as of this scrape")
+metrics.describe("cricpred_inplay_connections", "gauge", "Open /ws/inplay connections")
+metrics.describe("cricpred_inplay_deliveries_total", "counter", "Deliveries priced over /ws/inplay")
+metrics.describe("cricpred_inplay_batches_total", "counter", "In-play model calls; deliveries / batches is the mean batch size")
+
+
+def _inplay_batch_done(size, seconds):
+    metrics.inc("cricpred_inplay_batches_total")
+    metrics.observe("cricpred_stage_seconds", (("endpoint", "inplay"), ("stage", "predict_batch")), seconds)
+
+
+# Every live match on this worker shares one batcher, so concurrent deliveries
+# are priced in a single vectorized model call
+inplay_model = LazyInPlayModel(INPLAY_MODEL_PATH)
+inplay_batcher = MicroBatcher(inplay_model.predict_rows, on_batch=_inplay_batch_done)
+
+
+def predict_dataframe(values):
+    # Original pandas path over the pickled artifacts, kept as the reference
+    # the engine is checked against
+    artifacts = reference_models.get()
+    model, label_enc, scaler = artifacts.model, artifacts.label_encoders, artifacts.scaler
+    input_df = pd.DataFrame([values])
+
+    for col, value in DUMMY_VALUES.items():
         input_df[col] = value
 
     for col, encoder in label_enc.items():
@@ -52,9 +123,255 @@ def predict(input_data: MatchInput):
 
     input_scaled = scaler.transform(input_df)
 
-    win_probability_teamA = model.predict_proba(input_scaled)[0][1]
+    return model.predict_proba(input_scaled)[0][1]
 
-    return {
-        "predicted_winner_is_teamA": bool(win_probability_teamA > 0.5),
-        "win_probability_for_teamA": float(win_probability_teamA)
-    }
\ No newline at end of file
+
+@app.get("/")
+def home():
+    return {"message": "CricPred API is working!"}
+
+# Known paths label the request metrics; anything else is "other", so
+# arbitrary URLs cannot grow the label set. Built on the first request, once
+# every route is registered
+_route_paths = None
+
+
+def _path_label(path):
+    global _route_paths
+    if _route_paths is None:
+        _route_paths = frozenset(route.path for route in app.routes)
+    return path if path in _route_paths else "other"
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    labels = (("path", _path_label(request.url.path)),)
+    request.state.received = time.perf_counter()
+    status = "500"
+    try:
+        with metrics.in_flight("cricpred_requests_in_flight", labels):
+            response = await call_next(request)
+        status = str(response.status_code)
+    finally:
+        metrics.inc("cricpred_requests_total", labels + (("method", request.method), ("status", status)))
+        metrics.observe("cricpred_request_seconds", labels, time.perf_counter() - request.state.received)
+
+    profile_path = getattr(request.state, "profile_path", None)
+    if profile_path:
+        response.headers["X-Profile-Path"] = profile_path
+    return response
+
+
+def _stage(endpoint, name):
+    return metrics.timer("cricpred_stage_seconds", (("endpoint", endpoint), ("stage", name)))
+
+
+def _handler_started(request, endpoint):
+    metrics.observe("cricpred_stage_seconds", (("endpoint", endpoint), ("stage", "queue")),
+                    time.perf_counter() - request.state.received)
+
+
+def _versions():
+    artifacts, engine = models.current()
+    snapshot = feature_server.snapshot
+    # Features from another schema are out of the model's distribution
+    if snapshot is not None and snapshot.feature_schema != artifacts.feature_schema:
+        raise HTTPException(status_code=503, detail=(
+            f"Feature snapshot {snapshot.version} has feature schema {snapshot.feature_schema}, "
+            f"model {artifacts.version[:12]} expects {artifacts.feature_schema}; rebuild the feature store"))
+    snapshot_version = snapshot.version if snapshot is not None else "none"
+    return engine, snapshot, artifacts.version, snapshot_version
+
+
+@app.post("/predict")
+def predict(input_data: MatchInput, request: Request):
+    _handler_started(request, "predict")
+    with metrics.in_flight("cricpred_handlers_in_flight"), \
+            profiled(profile_requested(request.headers), "predict") as profile:
+        values = normalize_input(input_data.dict())
+        with _stage("predict", "cache"):
+            engine, snapshot, model_version, snapshot_version = _versions()
+            key = cache_key(values, model_version, snapshot_version)
+            win_probability_teamA = prediction_cache.get(key)
+
+        if win_probability_teamA is None:
+            with _stage("predict", "features"):
+                numeric = snapshot.features(values) if snapshot is not None else None
+            with _stage("predict", "encode"):
+                X = engine.transform_one(values, numeric)
+            with _stage("predict", "predict_proba"):
+                win_probability_teamA = float(engine.model.predict_proba(X)[0][1])
+            prediction_cache.put(key, win_probability_teamA)
+            metrics.inc("cricpred_predictions_total", (("endpoint", "predict"), ("cache", "miss")))
+        else:
+            metrics.inc("cricpred_predictions_total", (("endpoint", "predict"), ("cache", "hit")))
+
+    request.state.profile_path = profile.get("path")
+    return format_prediction(win_probability_teamA)
+
+@app.post("/predict/batch")
+def predict_batch(inputs: List[MatchInput], request: Request):
+    _handler_started(request, "batch")
+    with metrics.in_flight("cricpred_handlers_in_flight"), \
+            profiled(profile_requested(request.headers), "batch") as profile:
+        rows = [normalize_input(item.dict()) for item in inputs]
+        with _stage("batch", "cache"):
+            engine, snapshot, model_version, snapshot_version = _versions()
+            keys = [cache_key(row, model_version, snapshot_version) for row in rows]
+            win_probabilities_teamA = [prediction_cache.get(key) for key in keys]
+
+        missing = [i for i, p in enumerate(win_probabilities_teamA) if p is None]
+        if missing:
+            miss_rows = [rows[i] for i in missing]
+            with _stage("batch", "features"):
+                numeric = snapshot.features_many(miss_rows) if snapshot is not None else None
+            with _stage("batch", "encode"):
+                X = engine.transform_many(miss_rows, numeric)
+            with _stage("batch", "predict_proba"):
+                probabilities = engine.model.predict_proba(X)[:, 1]
+            for i, p in zip(missing, probabilities):
+                win_probabilities_teamA[i] = float(p)
+                prediction_cache.put(keys[i], win_probabilities_teamA[i])
+        metrics.inc("cricpred_predictions_total", (("endpoint", "batch"), ("cache", "miss")), len(missing))
+        metrics.inc("cricpred_predictions_total", (("endpoint", "batch"), ("cache", "hit")), len(rows) - len(missing))
+
+    request.state.profile_path = profile.get("path")
+    return [format_prediction(p) for p in win_probabilities_teamA]
+
+# Columns a custom XI replaces in the snapshot's features for the fixture
+LINEUP_FORM_COLUMNS = [NUMERIC_FEATURES.index('teamA_form_score'), NUMERIC_FEATURES.index('teamB_form_score')]
+
+
+def price_lineups(endpoint, values, teamA_lineups, teamB_lineups):
+    """teamA win probability and both team form scores for each pair of
+    lineups; everything but the form columns comes from the snapshot."""
+    engine, snapshot, _, _ = _versions()
+    if snapshot is None or snapshot.players is None:
+        raise HTTPException(status_code=503, detail="No player index published with the feature snapshot")
+    with _stage(endpoint, "features"):
+        numeric = np.tile(snapshot.features(values), (len(teamA_lineups), 1))
+        numeric[:, LINEUP_FORM_COLUMNS[0]] = snapshot.players.team_form_scores(teamA_lineups)
+        numeric[:, LINEUP_FORM_COLUMNS[1]] = snapshot.players.team_form_scores(teamB_lineups)
+    with _stage(endpoint, "encode"):
+        X = engine.transform_fixture(values, numeric)
+    with _stage(endpoint, "predict_proba"):
+        probabilities = engine.model.predict_proba(X)[:, 1]
+    metrics.inc("cricpred_predictions_total", (("endpoint", endpoint), ("cache", "miss")), len(probabilities))
+    return probabilities, numeric[:, LINEUP_FORM_COLUMNS], snapshot.players
+
+
+def _lineup_prediction(win_probability_teamA, form):
+    return {**format_prediction(win_probability_teamA),
+            "teamA_form_score": float(form[0]), "teamB_form_score": float(form[1])}
+
+
+@app.post("/predict/lineup")
+def predict_lineup(input_data: LineupInput, request: Request):
+    _handler_started(request, "lineup")
+    with metrics.in_flight("cricpred_handlers_in_flight"), \
+            profiled(profile_requested(request.headers), "lineup") as profile:
+        values = normalize_input(input_data.dict())
+        probabilities, form, index = price_lineups(
+            "lineup", values, [input_data.teamA_players], [input_data.teamB_players])
+
+    request.state.profile_path = profile.get("path")
+    return {**_lineup_prediction(probabilities[0], form[0]),
+            "unknown_players": index.unknown_players(input_data.teamA_players + input_data.teamB_players)}
+
+@app.post("/predict/lineup/batch")
+def predict_lineup_batch(input_data: LineupBatchInput, request: Request):
+    _handler_started(request, "lineup_batch")
+    with metrics.in_flight("cricpred_handlers_in_flight"), \
+            profiled(profile_requested(request.headers), "lineup_batch") as profile:
+        values = normalize_input(input_data.dict(exclude={"lineups"}))
+        probabilities, form, _ = price_lineups(
+            "lineup_batch", values, [pair.teamA_players for pair in input_data.lineups],
+            [pair.teamB_players for pair in input_data.lineups])
+
+    request.state.profile_path = profile.get("path")
+    return [_lineup_prediction(p, f) for p, f in zip(probabilities.tolist(), form)]
+
+
+def prematch_probability(values):
+    """teamA win probability for normalized /predict values, through the prediction cache."""
+    engine, snapshot, model_version, snapshot_version = _versions()
+    key = cache_key(values, model_version, snapshot_version)
+    win_probability_teamA = prediction_cache.get(key)
+    if win_probability_teamA is None:
+        numeric = snapshot.features(values) if snapshot is not None else None
+        win_probability_teamA = float(engine.model.predict_proba(engine.transform_one(values, numeric))[0][1])
+        prediction_cache.put(key, win_probability_teamA)
+    return win_probability_teamA
+
+
+async def _inplay_message(state, message):
+    """Reply to one client message; returns (reply, state)."""
+    kind = message.get("type")
+    if kind == "start":
+        values = normalize_input(MatchInput(**message.get("match", {})).dict())
+        state = MatchState(values["teamA"], values["teamB"])
+        try:
+            prematch = format_prediction(await asyncio.to_thread(prematch_probability, values))
+        except Exception as e:
+            print(f"[WARN] No pre-match prediction for {values['teamA']} vs {values['teamB']}: {e}")
+            prematch = None
+        return {"type": "started", "teamA": state.teamA, "teamB": state.teamB, "prematch": prematch}, state
+    if kind == "delivery":
+        if state is None:
+            raise ValueError("send a start message first")
+        state.apply(int(message["innings"]), message["team"], int(message["over"]), message["delivery"])
+        win_probability = state.settled()
+        if win_probability is None:
+            win_probability = await inplay_batcher.submit((state.innings, state.runs, state.wickets,
+                                                           state.balls_left, state.target, state.batter,
+                                                           state.bowler))
+        metrics.inc("cricpred_inplay_deliveries_total")
+        win_probability_teamA = win_probability if state.batting_team == state.teamA else 1 - win_probability
+        return {"type": "probability", "ball": state.deliveries, **state.summary(),
+                "win_probability_batting": win_probability, "win_probability_teamA": win_probability_teamA}, state
+    raise ValueError(f"unknown message type {kind!r}")
+
+
+@app.websocket("/ws/inplay")
+async def inplay(websocket: WebSocket):
+    """Live win probability. Send {"type": "start", "match": <MatchInput>},
+    then one {"type": "delivery", "innings", "team", "over", "delivery"} per
+    ball (the delivery as it appears in a Cricsheet file), then
+    {"type": "end"}. Each delivery is answered with the updated probability."""
+    await websocket.accept()
+    model = inplay_model.get() if inplay_model.loaded else await asyncio.to_thread(inplay_model.get)
+    if model is None:
+        await websocket.send_json({"type": "error", "error": f"No in-play model at {INPLAY_MODEL_PATH}"})
+        await websocket.close(code=1011)
+        return
+
+    state = None
+    with metrics.in_flight("cricpred_inplay_connections"):
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                    if message.get("type") == "end":
+                        await websocket.send_json({"type": "ended", "balls": state.deliveries if state else 0})
+                        await websocket.close()
+                        return
+                    reply, state = await _inplay_message(state, message)
+                except (ValueError, KeyError, TypeError, AttributeError) as e:
+                    reply = {"type": "error", "error": str(e)}
+                await websocket.send_json(reply)
+        except WebSocketDisconnect:
+            pass
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    stats = prediction_cache.stats()
+    stats["model_version"] = models.current()[0].version
+    return stats
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    for name, value in prediction_cache.stats().items():
+        if name in CACHE_GAUGES:
+            metrics.set_gauge(f"cricpred_prediction_cache_{name}", (), value)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
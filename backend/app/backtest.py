@@ -0,0 +1,282 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from train import CAT_COLS, DROP_COLS, UNMODELLED_COLS, TARGET, XGB_PARAMS
+
+# Same preprocessing as train.py: CAT_COLS are label encoded, the remaining
+# feature columns are used as they are, and everything is scaled
+NON_FEATURE_COLS = DROP_COLS + UNMODELLED_COLS + [TARGET, 'season']
+
+INITIAL_BANKROLL = 1000.0
+MAX_STAKE_FRACTION = 0.05  # never stake more than this share of the bankroll on one match
+DEFAULT_EDGES = (0.0, 0.02, 0.05, 0.1)
+DEFAULT_KELLY_FRACTIONS = (0.1, 0.25, 0.5, 1.0)
+
+
+def load_features(path):
+    df = pd.read_csv(path)
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    df["season"] = df["date"].astype(str).str[:4]
+    return df
+
+
+def feature_columns(df):
+    return [c for c in df.columns if c not in NON_FEATURE_COLS]
+
+
+def encode(df, columns, classes, mean, scale):
+    """Label-encode with the given class tables (unseen labels become -1, as
+    in the API) and standardise, all column-wise."""
+    X = np.empty((len(df), len(columns)), dtype=np.float64)
+    for j, col in enumerate(columns):
+        if col in classes:
+            X[:, j] = pd.Categorical(df[col], categories=classes[col]).codes
+        else:
+            X[:, j] = df[col].to_numpy(dtype=np.float64)
+    return (X - mean) / scale
+
+
+def fit_window(train, columns, params, n_jobs=1):
+    from xgboost import XGBClassifier
+
+    classes = {col: np.unique(train[col].astype(str)) for col in CAT_COLS}
+    raw = encode(train, columns, classes, 0.0, 1.0)
+    mean = raw.mean(axis=0)
+    scale = raw.std(axis=0)
+    scale[scale == 0] = 1.0  # StandardScaler leaves constant columns unscaled
+    model = XGBClassifier(**params, n_jobs=n_jobs)
+    model.fit((raw - mean) / scale, train[TARGET].to_numpy())
+    return model, classes, mean, scale
+
+
+def _run_window(args):
+    """Fit on train, score test in one predict_proba call."""
+    train, test, columns, params, n_jobs = args
+    model, classes, mean, scale = fit_window(train, columns, params, n_jobs)
+    return test.index.to_numpy(), model.predict_proba(encode(test, columns, classes, mean, scale))[:, 1]
+
+
+def walk_forward_windows(df, min_train_seasons=3, train_seasons=0):
+    """(test season, train index, test index) for each season after the first
+    min_train_seasons. train_seasons=0 trains on everything before the test
+    season (expanding window), otherwise on the last train_seasons seasons."""
+    seasons = sorted(df["season"].unique())
+    for i in range(min_train_seasons, len(seasons)):
+        first = 0 if train_seasons <= 0 else max(0, i - train_seasons)
+        train = df.index[df["season"].isin(seasons[first:i])]
+        test = df.index[df["season"] == seasons[i]]
+        yield seasons[i], train, test
+
+
+def predict_walk_forward(df, mode="retrain", models_dir="../models/", min_train_seasons=3, train_seasons=0,
+                         params=None, workers=1):
+    """Out-of-sample win probability for teamA on every match in a test season.
+
+    retrain fits a model per window in a process pool. reuse scores every
+    window with the deployed artifacts; they were trained on the full
+    archive, so that measures fit, not forecasting skill.
+    """
+    columns = feature_columns(df)
+    windows = list(walk_forward_windows(df, min_train_seasons, train_seasons))
+    p = np.full(len(df), np.nan)
+    window_of = np.full(len(df), "", dtype=object)
+
+    if mode == "reuse":
+        from model_store import load_artifacts
+        artifacts = load_artifacts(models_dir)
+        classes = {col: enc.classes_ for col, enc in artifacts.label_encoders.items()}
+        mean = np.asarray(artifacts.scaler.mean_)
+        scale = np.asarray(artifacts.scaler.scale_)
+        test_index = np.concatenate([test for _, _, test in windows]) if windows else np.empty(0, dtype=int)
+        test = df.loc[test_index]
+        p[test_index] = artifacts.model.predict_proba(encode(test, columns, classes, mean, scale))[:, 1]
+    else:
+        params = params or XGB_PARAMS
+        tasks = [(df.loc[train], df.loc[test], columns, params, 1 if workers > 1 else None)
+                 for _, train, test in windows]
+        if workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_run_window, tasks))
+        else:
+            results = [_run_window(task) for task in tasks]
+        for index, probs in results:
+            p[index] = probs
+
+    for season, _, test in windows:
+        window_of[test] = season
+    out = df.assign(window=window_of, p_teamA=p)
+    return out[out["window"] != ""].reset_index(drop=True)
+
+
+def attach_odds(predictions, odds_path):
+    """Join decimal odds (date, teamA, teamB, odds_teamA, odds_teamB) onto the
+    predictions, matching fixtures listed with the teams either way round."""
+    odds = pd.read_csv(odds_path, dtype={"date": str})
+    swapped = odds.rename(columns={"teamA": "teamB", "teamB": "teamA",
+                                   "odds_teamA": "odds_teamB", "odds_teamB": "odds_teamA"})
+    both = pd.concat([odds, swapped]).drop_duplicates(["date", "teamA", "teamB"])
+    predictions = predictions.assign(date=predictions["date"].astype(str))
+    return predictions.merge(both[["date", "teamA", "teamB", "odds_teamA", "odds_teamB"]],
+                             on=["date", "teamA", "teamB"], how="left")
+
+
+def add_expected_value(predictions):
+    """EV per unit staked on each side and the full-Kelly fraction of the better one."""
+    p = predictions["p_teamA"].to_numpy()
+    oa = predictions["odds_teamA"].to_numpy(dtype=np.float64)
+    ob = predictions["odds_teamB"].to_numpy(dtype=np.float64)
+    ev_a = p * oa - 1
+    ev_b = (1 - p) * ob - 1
+    back_a = ev_a >= ev_b
+    ev = np.where(back_a, ev_a, ev_b)
+    odds = np.where(back_a, oa, ob)
+    return predictions.assign(
+        ev_teamA=ev_a, ev_teamB=ev_b,
+        pick=np.where(np.isnan(ev), "", np.where(back_a, predictions["teamA"], predictions["teamB"])),
+        pick_ev=ev, pick_odds=odds,
+        kelly=np.clip(ev / (odds - 1), 0, None),  # f* = (p*o - 1) / (o - 1)
+    )
+
+
+def simulate_bankroll(predictions, edge=0.0, kelly_fraction=0.25, initial=INITIAL_BANKROLL,
+                      max_stake_fraction=MAX_STAKE_FRACTION):
+    """Bet kelly_fraction * Kelly on the picked side whenever its EV exceeds
+    edge, in date order, settling each bet before the next."""
+    ev = predictions["pick_ev"].to_numpy()
+    kelly = predictions["kelly"].to_numpy()
+    odds = predictions["pick_odds"].to_numpy()
+    won = (predictions["pick"] == predictions["winner"]).to_numpy()
+    settled = predictions["settled"].to_numpy()
+
+    bet = settled & ~np.isnan(ev) & (ev > edge)
+    bankroll = initial
+    curve = np.empty(len(ev))
+    stakes = np.zeros(len(ev))
+    for i in np.flatnonzero(bet):
+        stake = bankroll * min(kelly_fraction * kelly[i], max_stake_fraction)
+        stakes[i] = stake
+        bankroll += stake * (odds[i] - 1) if won[i] else -stake
+        curve[i] = bankroll
+    # Carry the bankroll forward across matches without a bet
+    curve[~bet] = np.nan
+    curve = pd.Series(curve).ffill().fillna(initial).to_numpy()
+
+    peak = np.maximum.accumulate(np.concatenate([[initial], curve]))[1:]
+    staked = stakes.sum()
+    return {
+        "edge": edge, "kelly_fraction": kelly_fraction,
+        "bets": int(bet.sum()), "hit_rate": float(won[bet].mean()) if bet.any() else float("nan"),
+        "staked": float(staked), "final_bankroll": float(bankroll),
+        "roi": float((bankroll - initial) / staked) if staked else 0.0,
+        "max_drawdown": float(((peak - curve) / peak).max()) if len(curve) else 0.0,
+    }, curve, stakes
+
+
+def _sweep_chunk(args):
+    predictions, combos = args
+    rows, curves = [], []
+    for edge, fraction in combos:
+        summary, curve, _ = simulate_bankroll(predictions, edge, fraction)
+        rows.append(summary)
+        curves.append(curve)
+    return rows, curves
+
+
+def sweep(predictions, edges=DEFAULT_EDGES, kelly_fractions=DEFAULT_KELLY_FRACTIONS, workers=1):
+    """Bankroll simulation for every (edge, Kelly fraction) pair. Returns the
+    summary table and the long-format bankroll curves."""
+    combos = list(itertools.product(edges, kelly_fractions))
+    columns = ["date", "season", "pick", "winner", "settled", "pick_ev", "pick_odds", "kelly"]
+    slim = predictions[columns]
+    chunks = [combos[i::workers] for i in range(max(1, workers))]
+    chunks = [c for c in chunks if c]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            results = list(pool.map(_sweep_chunk, [(slim, c) for c in chunks]))
+    else:
+        results = [_sweep_chunk((slim, c)) for c in chunks]
+
+    rows = [row for chunk_rows, _ in results for row in chunk_rows]
+    curves = [curve for _, chunk_curves in results for curve in chunk_curves]
+    summary = pd.DataFrame(rows).sort_values(["edge", "kelly_fraction"]).reset_index(drop=True)
+    bankroll = pd.concat([
+        pd.DataFrame({"edge": row["edge"], "kelly_fraction": row["kelly_fraction"], "match": np.arange(len(curve)),
+                      "date": predictions["date"].to_numpy(), "bankroll": curve})
+        for row, curve in zip(rows, curves)
+    ], ignore_index=True) if rows else pd.DataFrame()
+    return summary, bankroll
+
+
+def season_metrics(predictions):
+    """Accuracy, log loss and Brier score per season and overall, on settled matches."""
+    def metrics(group):
+        y = group[TARGET].to_numpy()
+        p = np.clip(group["p_teamA"].to_numpy(), 1e-15, 1 - 1e-15)
+        return pd.Series({
+            "matches": len(group),
+            "accuracy": float(((p > 0.5) == (y == 1)).mean()),
+            "log_loss": float(-(y * np.log(p) + (1 - y) * np.log(1 - p)).mean()),
+            "brier": float(((p - y) ** 2).mean()),
+        })
+
+    settled = predictions[predictions["settled"]]
+    per_season = settled.groupby("season").apply(metrics, include_groups=False).reset_index()
+    overall = metrics(settled).to_frame().T.assign(season="all")
+    return pd.concat([per_season, overall], ignore_index=True)
+
+
+def write_table(df, path):
+    df.to_parquet(f"{path}.parquet", engine="pyarrow", index=False)
+    return f"{path}.parquet"
+
+
+def run_backtest(features_csv, out_dir, odds_path=None, mode="retrain", models_dir="../models/",
+                 min_train_seasons=3, train_seasons=0, edges=DEFAULT_EDGES,
+                 kelly_fractions=DEFAULT_KELLY_FRACTIONS, workers=1):
+    import pyarrow  # noqa: F401  results are Parquet; fail before the walk-forward, not after it
+    df = load_features(features_csv)
+    predictions = predict_walk_forward(df, mode, models_dir, min_train_seasons, train_seasons, workers=workers)
+    # No-result matches stay in training, like the notebook, but are void for scoring and betting
+    predictions["settled"] = (predictions["winner"] == predictions["teamA"]) | \
+        (predictions["winner"] == predictions["teamB"])
+
+    os.makedirs(out_dir, exist_ok=True)
+    metrics = season_metrics(predictions)
+    written = [write_table(metrics, os.path.join(out_dir, "season_metrics"))]
+    print(metrics.to_string(index=False))
+
+    if odds_path:
+        predictions = add_expected_value(attach_odds(predictions, odds_path))
+        summary, bankroll = sweep(predictions, edges, kelly_fractions, workers)
+        written.append(write_table(summary, os.path.join(out_dir, "sweep")))
+        written.append(write_table(bankroll, os.path.join(out_dir, "bankroll")))
+        print(summary.to_string(index=False))
+
+    written.append(write_table(predictions, os.path.join(out_dir, "predictions")))
+    print(f"Backtest results written: {', '.join(written)}")
+    return predictions
+
+
+if __name__ == "__main__":
+    import argparse
+
+    def floats(text):
+        return tuple(float(x) for x in text.split(","))
+
+    parser = argparse.ArgumentParser(description="Walk-forward backtest with betting EV and bankroll simulation")
+    parser.add_argument("--features", default="t20_features_full.csv")
+    parser.add_argument("--odds", help="CSV of date, teamA, teamB, odds_teamA, odds_teamB (decimal odds)")
+    parser.add_argument("--mode", choices=["retrain", "reuse"], default="retrain")
+    parser.add_argument("--models-dir", default="../models/")
+    parser.add_argument("--min-train-seasons", type=int, default=3)
+    parser.add_argument("--train-seasons", type=int, default=0, help="rolling window size; 0 = expanding")
+    parser.add_argument("--edges", type=floats, default=DEFAULT_EDGES)
+    parser.add_argument("--kelly", type=floats, default=DEFAULT_KELLY_FRACTIONS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="backtest")
+    args = parser.parse_args()
+
+    run_backtest(args.features, args.out, args.odds, args.mode, args.models_dir, args.min_train_seasons,
+                 args.train_seasons, args.edges, args.kelly, args.workers)
@@ -0,0 +1,139 @@
+import numpy as np
+
+# illegal marks wides and no-balls, which do not count toward the over
+DELIVERY_COLUMNS = ["innings", "over", "ball", "batter", "bowler", "batter_runs", "total_runs", "wicket", "illegal"]
+
+DELIVERY_DTYPES = {
+    "innings": np.int8, "over": np.int16, "ball": np.int8,
+    "batter": np.int32, "bowler": np.int32,
+    "batter_runs": np.int16, "total_runs": np.int16, "wicket": np.int8, "illegal": np.int8,
+}
+
+
+class PlayerRegistry:
+    """Interns player names to dense integer ids that stay stable across matches."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}
+        for name in names:
+            self.intern(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name):
+        pid = self.ids.get(name)
+        if pid is None:
+            pid = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return pid
+
+    def intern_many(self, names):
+        return np.array([self.intern(name) for name in names], dtype=np.int32)
+
+
+class DeliveryTable:
+    """One match's ball-by-ball data as parallel NumPy arrays.
+
+    batter/bowler hold ids into self.players (interned per match, -1 when the
+    delivery names nobody), and teams holds the batting side of each innings.
+    """
+
+    def __init__(self, columns, players, teams):
+        for col in DELIVERY_COLUMNS:
+            setattr(self, col, columns[col])
+        self.players = players
+        self.teams = teams
+
+    def __len__(self):
+        return len(self.innings)
+
+    @classmethod
+    def from_match(cls, match):
+        players = {}
+        def player_id(name):
+            return players.setdefault(name, len(players)) if name else -1
+
+        columns = {col: [] for col in DELIVERY_COLUMNS}
+        teams = []
+        for i, inning in enumerate(match.get("innings", [])):
+            teams.append(inning.get("team") or "")
+            for over in inning.get("overs", []):
+                for ball, delivery in enumerate(over.get("deliveries", [])):
+                    runs = delivery.get("runs", {})
+                    columns["innings"].append(i)
+                    columns["over"].append(over.get("over", 0))
+                    columns["ball"].append(ball)
+                    columns["batter"].append(player_id(delivery.get("batter")))
+                    columns["bowler"].append(player_id(delivery.get("bowler")))
+                    columns["batter_runs"].append(runs.get("batter", 0))
+                    columns["total_runs"].append(runs.get("total", 0))
+                    columns["wicket"].append(1 if delivery.get("wickets", []) else 0)
+                    extras = delivery.get("extras", {})
+                    columns["illegal"].append(1 if "wides" in extras or "noballs" in extras else 0)
+
+        return cls(
+            {col: np.array(values, dtype=DELIVERY_DTYPES[col]) for col, values in columns.items()},
+            np.array(list(players), dtype=str),
+            np.array(teams, dtype=str),
+        )
+
+    @classmethod
+    def from_arrays(cls, packed, players, teams):
+        """Inverse of to_arrays(): packed is the (n_columns, n_deliveries) block."""
+        return cls({col: packed[i] for i, col in enumerate(DELIVERY_COLUMNS)}, players, teams)
+
+    def to_arrays(self):
+        packed = np.stack([getattr(self, col) for col in DELIVERY_COLUMNS]).astype(np.int32)
+        return packed, self.players, self.teams
+
+    def global_ids(self, registry):
+        """batter and bowler columns remapped to registry ids (-1 stays -1)."""
+        lookup = np.append(registry.intern_many(self.players.tolist()), -1).astype(np.int32)
+        return lookup[self.batter], lookup[self.bowler]
+
+    # Reductions -------------------------------------------------------------
+
+    def innings_totals(self):
+        """(runs, wickets, deliveries) per innings."""
+        n = len(self.teams)
+        runs = np.bincount(self.innings, weights=self.total_runs, minlength=n).astype(np.int64)
+        wickets = np.bincount(self.innings, weights=self.wicket, minlength=n).astype(np.int64)
+        balls = np.bincount(self.innings, minlength=n)
+        return runs, wickets, balls
+
+    def team_runs(self):
+        """Total runs per batting team, summed over all of its innings."""
+        runs, _, _ = self.innings_totals()
+        totals = {}
+        for team, r in zip(self.teams.tolist(), runs.tolist()):
+            totals[team] = totals.get(team, 0) + r
+        return totals
+
+    def _tally(self, ids, weights=None):
+        valid = ids >= 0
+        if weights is not None:
+            weights = weights[valid]
+        return np.bincount(ids[valid], weights=weights, minlength=len(self.players))
+
+    def runs_by_batter(self):
+        return self._tally(self.batter, self.batter_runs).astype(np.int64)
+
+    def balls_faced(self):
+        return self._tally(self.batter)
+
+    def wickets_by_bowler(self):
+        return self._tally(self.bowler, self.wicket).astype(np.int64)
+
+    def balls_bowled(self):
+        return self._tally(self.bowler)
+
+    def group_by(self, ids, values):
+        """Yield (player id, values in delivery order) for each player in ids."""
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]]) if len(ids) else []
+        bounds = np.append(starts, len(ids))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            yield int(sorted_ids[start]), values[order[start:end]]
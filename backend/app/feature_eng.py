@@ -1,8 +1,9 @@
-import os
-import json
 import pandas as pd
-from collections import defaultdict, deque
-from player_tracker import update_player_stats, get_team_form_score, reset_trackers
+from collections import defaultdict
+from ingest import iter_matches, is_t20
+from player_tracker import (update_player_stats, get_team_form_scores, get_team_match_form_scores, reset_trackers,
+                            export_state, import_state)
+from rolling import RollingStats
 
 # Directory where Cricsheet T20 JSON files are stored
 T20_DATA_DIR = "data"
@@ -10,15 +11,12 @@ T20_DATA_DIR = "data"
 # How many recent matches to consider for win % or avg runs
 RECENT_MATCH_WINDOW = 5
 
+# Windows the team trackers maintain; extra sizes come at O(1) per match each
+TEAM_WINDOWS = (RECENT_MATCH_WINDOW,)
+
 def load_all_matches(data_dir):
-    matches = []
-    for fname in os.listdir(data_dir):
-        if fname.endswith(".json"):
-            with open(os.path.join(data_dir, fname), 'r', encoding='utf-8') as f:
-                match = json.load(f)
-                if match.get("info", {}).get("match_type") == "T20":
-                    matches.append(match)
-    return matches
+    # Streams cached match records in date order rather than holding them all
+    return iter_matches(data_dir, match_filter=is_t20)
 
 def extract_basic_metadata(match):
     info = match["info"]
@@ -39,133 +37,242 @@ def extract_basic_metadata(match):
         "competition": competition
     }
 
-def compute_total_runs(match, team):
-    total = 0
-    for inning in match.get("innings", []):
-        if inning.get("team") == team:
-            for over in inning.get("overs", []):
-                for delivery in over.get("deliveries", []):
-                    total += delivery.get("runs", {}).get("total", 0)
-    return total
+class FeatureState:
+    """History trackers behind the rolling features, including the player
+    tracker globals, in a form that can be checkpointed as JSON."""
 
-def feature_engineering(matches):
-    data = []
+    def __init__(self, windows=TEAM_WINDOWS):
+        self.windows = tuple(windows)
+        self.team_wins = defaultdict(self._rolling)
+        self.team_runs = defaultdict(self._rolling)
+        self.team_conceded = defaultdict(self._rolling)
+        self.h2h_tracker = defaultdict(lambda: defaultdict(lambda: [0, 0]))  # [teamA wins, meetings]
+        self.venue_wins = defaultdict(lambda: defaultdict(int))
+        self.toss_stats = defaultdict(lambda: [0, 0])  # [toss_wins, match_wins]
+        self.bat_first_outcomes = [0, 0]  # [bat first wins, total]
+        self.team_players = {}  # team -> most recent XI, used for serving form
 
-    # History trackers
-    team_wins = defaultdict(list)
-    team_runs = defaultdict(list)
-    team_conceded = defaultdict(list)
-    h2h_tracker = defaultdict(lambda: defaultdict(list))
-    venue_wins = defaultdict(lambda: defaultdict(int))
-    toss_stats = defaultdict(lambda: [0, 0])  # [toss_wins, match_wins]
-    bat_first_outcomes = [0, 0]  # [bat first wins, total]
+    def _rolling(self):
+        return RollingStats(self.windows)
 
-    reset_trackers()
+    def to_dict(self):
+        return {
+            "windows": list(self.windows),
+            "team_wins": {t: r.to_dict() for t, r in self.team_wins.items()},
+            "team_runs": {t: r.to_dict() for t, r in self.team_runs.items()},
+            "team_conceded": {t: r.to_dict() for t, r in self.team_conceded.items()},
+            "h2h_tracker": {a: dict(opps) for a, opps in self.h2h_tracker.items()},
+            "venue_wins": {v: dict(wins) for v, wins in self.venue_wins.items()},
+            "toss_stats": dict(self.toss_stats),
+            "bat_first_outcomes": list(self.bat_first_outcomes),
+            "team_players": dict(self.team_players),
+            "players": export_state(),
+        }
 
-    for match in matches:
-        meta = extract_basic_metadata(match)
+    @classmethod
+    def from_dict(cls, d):
+        """Rebuild the trackers; also restores the player tracker globals."""
+        state = cls(d["windows"])
+        for name in ("team_wins", "team_runs", "team_conceded"):
+            tracker = getattr(state, name)
+            for team, r in d[name].items():
+                tracker[team] = RollingStats.from_dict(r)
+        for a, opps in d["h2h_tracker"].items():
+            state.h2h_tracker[a].update(opps)
+        for v, wins in d["venue_wins"].items():
+            state.venue_wins[v].update(wins)
+        state.toss_stats.update(d["toss_stats"])
+        state.bat_first_outcomes = list(d["bat_first_outcomes"])
+        state.team_players.update(d.get("team_players", {}))
+        import_state(d["players"])
+        return state
+
+    def record_result(self, meta, teamA_players, teamB_players, deliveries):
+        """Update the history trackers with a finished match."""
         A, B = meta['teamA'], meta['teamB']
         venue = meta['venue']
         winner = meta['winner']
         toss_winner = meta['toss_winner']
         toss_decision = meta['toss_decision']
+        bat_first_team = A if toss_winner == B else B if toss_decision == "field" else toss_winner
 
-        # Update player stats before computing form features
-        update_player_stats(match)
+        self.team_players[A] = teamA_players
+        self.team_players[B] = teamB_players
+        self.team_wins[A].push(1 if winner == A else 0)
+        self.team_wins[B].push(1 if winner == B else 0)
+        self.h2h_tracker[A][B][0] += 1 if winner == A else 0
+        self.h2h_tracker[A][B][1] += 1
+
+        # One bincount over the delivery table covers both sides
+        team_totals = deliveries.team_runs()
+        runs_A = team_totals.get(A, 0)
+        runs_B = team_totals.get(B, 0)
+        self.team_runs[A].push(runs_A)
+        self.team_conceded[B].push(runs_A)
+        self.team_runs[B].push(runs_B)
+        self.team_conceded[A].push(runs_B)
+
+        self.venue_wins[venue][winner] += 1
+
+        self.toss_stats[toss_winner][0] += 1
+        if winner == toss_winner:
+            self.toss_stats[toss_winner][1] += 1
+
+        if winner == bat_first_team:
+            self.bat_first_outcomes[0] += 1
+        self.bat_first_outcomes[1] += 1
 
+    def apply_match(self, match):
+        """Replay a match into the trackers without building its feature row."""
+        meta = extract_basic_metadata(match)
+        update_player_stats(match)
         players = match.get("info", {}).get("players", {})
-        teamA_players = players.get(A, [])
-        teamB_players = players.get(B, [])
-        teamA_form_score = get_team_form_score(teamA_players)
-        teamB_form_score = get_team_form_score(teamB_players)
+        self.record_result(meta, players.get(meta['teamA'], []), players.get(meta['teamB'], []), match["deliveries"])
+
+    def fixture_features(self, A, B, venue, toss_winner, toss_decision, teamA_players=None, teamB_players=None):
+        """Feature values for an A vs B fixture given the history so far.
+
+        Lineups default to each team's most recent XI. Lookups never insert
+        into the trackers, so querying leaves the state unchanged.
+        """
+        W = RECENT_MATCH_WINDOW
+
+        def rolling_mean(tracker, team, default):
+            return tracker[team].mean(W, default=default) if team in tracker else default
+
+        if teamA_players is None:
+            teamA_players = self.team_players.get(A, [])
+        if teamB_players is None:
+            teamB_players = self.team_players.get(B, [])
+        teamA_form_score, teamB_form_score = get_team_form_scores([teamA_players, teamB_players]).tolist()
+        teamA_match_form, teamB_match_form = get_team_match_form_scores([teamA_players, teamB_players]).tolist()
 
         # Recent win pct
-        teamA_recent_wins = sum(team_wins[A][-RECENT_MATCH_WINDOW:])
-        teamB_recent_wins = sum(team_wins[B][-RECENT_MATCH_WINDOW:])
-        teamA_win_pct = teamA_recent_wins / min(len(team_wins[A]), RECENT_MATCH_WINDOW) if team_wins[A] else 0.5
-        teamB_win_pct = teamB_recent_wins / min(len(team_wins[B]), RECENT_MATCH_WINDOW) if team_wins[B] else 0.5
+        teamA_win_pct = rolling_mean(self.team_wins, A, 0.5)
+        teamB_win_pct = rolling_mean(self.team_wins, B, 0.5)
 
         # H2H win %
-        h2h_wins = sum(h2h_tracker[A][B])
-        h2h_total = len(h2h_tracker[A][B])
+        h2h_wins, h2h_total = self.h2h_tracker[A][B] if A in self.h2h_tracker and B in self.h2h_tracker[A] else (0, 0)
         h2h_pct = h2h_wins / h2h_total if h2h_total > 0 else 0.5
 
-        # Avg runs scored
-        avg_runs_A = sum(team_runs[A][-RECENT_MATCH_WINDOW:]) / min(len(team_runs[A]), RECENT_MATCH_WINDOW) if team_runs[A] else 150
-        avg_runs_B_conceded = sum(team_conceded[B][-RECENT_MATCH_WINDOW:]) / min(len(team_conceded[B]), RECENT_MATCH_WINDOW) if team_conceded[B] else 160
-
-        avg_runs_B = sum(team_runs[B][-RECENT_MATCH_WINDOW:]) / min(len(team_runs[B]), RECENT_MATCH_WINDOW) if team_runs[B] else 150
-        avg_runs_A_conceded = sum(team_conceded[A][-RECENT_MATCH_WINDOW:]) / min(len(team_conceded[A]), RECENT_MATCH_WINDOW) if team_conceded[A] else 160
-
         # Venue win %
-        venue_A_wins = venue_wins[venue].get(A, 0)
-        venue_B_wins = venue_wins[venue].get(B, 0)
-        total_at_venue = sum(venue_wins[venue].values())
-        venue_A_pct = venue_A_wins / total_at_venue if total_at_venue else 0.5
-        venue_B_pct = venue_B_wins / total_at_venue if total_at_venue else 0.5
+        wins_at_venue = self.venue_wins[venue] if venue in self.venue_wins else {}
+        total_at_venue = sum(wins_at_venue.values())
+        venue_A_pct = wins_at_venue.get(A, 0) / total_at_venue if total_at_venue else 0.5
+        venue_B_pct = wins_at_venue.get(B, 0) / total_at_venue if total_at_venue else 0.5
 
         # Toss impact
-        toss_total, toss_match_wins = toss_stats[toss_winner]
+        toss_total, toss_match_wins = self.toss_stats[toss_winner] if toss_winner in self.toss_stats else (0, 0)
         toss_win_rate = toss_match_wins / toss_total if toss_total else 0.5
 
         # Batting first win rate
-        bat_first_team = A if toss_winner == B else B if toss_decision == "field" else toss_winner
-        bat_first_wins, bat_first_total = bat_first_outcomes
+        bat_first_wins, bat_first_total = self.bat_first_outcomes
         bat_first_win_pct = bat_first_wins / bat_first_total if bat_first_total else 0.5
 
-        # Toss match alignment
-        toss_match_teamA = 1 if toss_decision == "bat" and teamA_win_pct > 0.5 else 0
-        toss_match_teamB = 1 if toss_decision == "bat" and teamB_win_pct > 0.5 else 0
-
-        is_home = 1 if A.lower() in venue.lower() else 0
-
-        data.append({
-            **meta,
+        return {
             "teamA_win_pct_last5": teamA_win_pct,
             "teamB_win_pct_last5": teamB_win_pct,
             "teamA_vs_teamB_h2h": h2h_pct,
-            "teamA_avg_runs_scored": avg_runs_A,
-            "teamB_avg_runs_conceded": avg_runs_B_conceded,
-            "teamB_avg_runs_scored": avg_runs_B,
-            "teamA_avg_runs_conceded": avg_runs_A_conceded,
+            "teamA_avg_runs_scored": rolling_mean(self.team_runs, A, 150),
+            "teamB_avg_runs_conceded": rolling_mean(self.team_conceded, B, 160),
+            "teamB_avg_runs_scored": rolling_mean(self.team_runs, B, 150),
+            "teamA_avg_runs_conceded": rolling_mean(self.team_conceded, A, 160),
             "venue_win_bias_teamA": venue_A_pct,
             "venue_win_bias_teamB": venue_B_pct,
             "toss_helped_win_rate": toss_win_rate,
             "batting_first_win_pct": bat_first_win_pct,
-            "toss_decision_match_teamA": toss_match_teamA,
-            "toss_decision_match_teamB": toss_match_teamB,
-            "is_home_teamA": is_home,
+            # Toss match alignment
+            "toss_decision_match_teamA": 1 if toss_decision == "bat" and teamA_win_pct > 0.5 else 0,
+            "toss_decision_match_teamB": 1 if toss_decision == "bat" and teamB_win_pct > 0.5 else 0,
+            "is_home_teamA": 1 if A.lower() in venue.lower() else 0,
             "teamA_form_score": teamA_form_score,
             "teamB_form_score": teamB_form_score,
-            "match_winner_teamA": 1 if winner == A else 0
-        })
+            # Not a model input yet; the shipped model was trained on the delivery-based form above
+            "teamA_match_form_score": teamA_match_form,
+            "teamB_match_form_score": teamB_match_form,
+        }
 
-        # Update history trackers
-        team_wins[A].append(1 if winner == A else 0)
-        team_wins[B].append(1 if winner == B else 0)
-        h2h_tracker[A][B].append(1 if winner == A else 0)
+    def serving_snapshot(self):
+        """Flatten the trackers into the per-key feature values the API serves.
 
-        runs_A = compute_total_runs(match, A)
-        runs_B = compute_total_runs(match, B)
-        team_runs[A].append(runs_A)
-        team_conceded[B].append(runs_A)
-        team_runs[B].append(runs_B)
-        team_conceded[A].append(runs_B)
+        Each value is what feature_engineering would compute for the next match
+        involving that key, with teams fielding their most recent XI. Lookups
+        missing from a map fall back to the same defaults as the builder.
+        """
+        W = RECENT_MATCH_WINDOW
+        teams = sorted(set(self.team_wins) | set(self.team_players))
+        lineups = [self.team_players.get(t, []) for t in teams]
+        form_scores = get_team_form_scores(lineups).tolist()
+        match_form_scores = get_team_match_form_scores(lineups).tolist()
 
-        venue_wins[venue][winner] += 1
+        return {
+            "window": W,
+            "teams": {
+                team: {
+                    "win_pct": self.team_wins[team].mean(W, default=0.5) if team in self.team_wins else 0.5,
+                    "avg_runs_scored": self.team_runs[team].mean(W, default=150) if team in self.team_runs else 150,
+                    "avg_runs_conceded": self.team_conceded[team].mean(W, default=160) if team in self.team_conceded else 160,
+                    "form_score": form,
+                    "match_form_score": match_form,
+                }
+                for team, form, match_form in zip(teams, form_scores, match_form_scores)
+            },
+            "h2h": {
+                a: {b: wins / total for b, (wins, total) in opps.items() if total}
+                for a, opps in self.h2h_tracker.items()
+            },
+            "venue": {
+                venue: {team: n / sum(wins.values()) for team, n in wins.items()}
+                for venue, wins in self.venue_wins.items() if sum(wins.values())
+            },
+            "toss": {team: wins / total for team, (total, wins) in self.toss_stats.items() if total},
+            "batting_first_win_pct": (self.bat_first_outcomes[0] / self.bat_first_outcomes[1]
+                                      if self.bat_first_outcomes[1] else 0.5),
+        }
 
-        toss_stats[toss_winner][0] += 1
-        if winner == toss_winner:
-            toss_stats[toss_winner][1] += 1
+def feature_engineering(matches, state=None):
+    """Build one feature row per match. Pass a restored FeatureState to carry
+    on from a checkpoint; it is updated in place."""
+    data = []
 
-        if winner == bat_first_team:
-            bat_first_outcomes[0] += 1
-        bat_first_outcomes[1] += 1
+    if state is None:
+        state = FeatureState()
+        reset_trackers()
+
+    for match in matches:
+        meta = extract_basic_metadata(match)
+        A, B = meta['teamA'], meta['teamB']
+
+        # Update player stats before computing form features
+        update_player_stats(match)
+
+        players = match.get("info", {}).get("players", {})
+        teamA_players = players.get(A, [])
+        teamB_players = players.get(B, [])
+        features = state.fixture_features(A, B, meta['venue'], meta['toss_winner'], meta['toss_decision'],
+                                          teamA_players, teamB_players)
+
+        data.append({
+            **meta,
+            **features,
+            "match_winner_teamA": 1 if meta['winner'] == A else 0
+        })
+
+        state.record_result(meta, teamA_players, teamB_players, match["deliveries"])
 
     return pd.DataFrame(data)
 
 if __name__ == "__main__":
-    all_matches = load_all_matches(T20_DATA_DIR)
-    df = feature_engineering(all_matches)
-    df.to_csv("t20_features_full.csv", index=False)
+    import argparse
+    from feature_store import build_full, update_incremental
+
+    parser = argparse.ArgumentParser(description="Build the T20 feature dataset")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only ingest match files not yet in the feature store checkpoint")
+    args = parser.parse_args()
+
+    if args.incremental:
+        update_incremental(T20_DATA_DIR, "t20_features_full.csv")
+    else:
+        build_full(T20_DATA_DIR, "t20_features_full.csv")
     print("Feature dataset saved as t20_features_full.csv")
@@ -0,0 +1,147 @@
+import os
+import json
+import threading
+import numpy as np
+
+# How often the watcher checks for a newly published snapshot
+SNAPSHOT_POLL_SECONDS = 5.0
+
+# Order of the values returned by FeatureSnapshot.features()
+NUMERIC_FEATURES = [
+    'teamA_win_pct_last5', 'teamB_win_pct_last5', 'teamA_vs_teamB_h2h',
+    'teamA_avg_runs_scored', 'teamB_avg_runs_conceded', 'teamB_avg_runs_scored',
+    'teamA_avg_runs_conceded', 'venue_win_bias_teamA', 'venue_win_bias_teamB',
+    'toss_helped_win_rate', 'batting_first_win_pct', 'toss_decision_match_teamA',
+    'toss_decision_match_teamB', 'is_home_teamA', 'teamA_form_score', 'teamB_form_score'
+]
+
+# Same fallbacks feature_engineering uses for a team with no history
+UNKNOWN_TEAM = {"win_pct": 0.5, "avg_runs_scored": 150, "avg_runs_conceded": 160, "form_score": 0.0}
+
+
+class FeatureSnapshot:
+    """Immutable view of a published serving snapshot.
+
+    Every feature is a dict lookup keyed by team, (teamA, teamB) or
+    (venue, team), precomputed by FeatureState.serving_snapshot().
+    """
+
+    def __init__(self, payload):
+        self.version = payload.get("version", "unknown")
+        self.feature_schema = payload.get("feature_schema")  # None for snapshots that predate it
+        self.teams = payload["teams"]
+        self.h2h = {(a, b): pct for a, opps in payload["h2h"].items() for b, pct in opps.items()}
+        self.venue_bias = {(v, t): pct for v, wins in payload["venue"].items() for t, pct in wins.items()}
+        self.venues = set(payload["venue"])
+        self.toss = payload["toss"]
+        self.batting_first_win_pct = payload["batting_first_win_pct"]
+        self.players = None  # PlayerIndex for custom lineups, when one was published
+
+    @classmethod
+    def load(cls, path, index_loader=None):
+        """index_loader(store_dir) loads the player index published next to
+        the snapshot (player_index.load_published); without one, custom
+        lineups are not served."""
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        snapshot = cls(payload)
+        # The index is written before the snapshot naming it, so a mismatch
+        # means a newer one is on its way and the next poll picks both up
+        if payload.get("player_index") is not None and index_loader is not None:
+            try:
+                index = index_loader(os.path.dirname(path))
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARN] Serving snapshot {snapshot.version} without its player index: {e}")
+            else:
+                if index.version == payload["player_index"]:
+                    snapshot.players = index
+                else:
+                    print(f"[WARN] Player index {index.version} does not match snapshot {snapshot.version}")
+        return snapshot
+
+    def _venue_pct(self, venue, team):
+        # A known venue where the team never won scores 0, an unknown one 0.5
+        if venue not in self.venues:
+            return 0.5
+        return self.venue_bias.get((venue, team), 0.0)
+
+    def features(self, values):
+        A, B, venue = values["teamA"], values["teamB"], values["venue"]
+        toss_decision = values["toss_decision"]
+        team_a = self.teams.get(A, UNKNOWN_TEAM)
+        team_b = self.teams.get(B, UNKNOWN_TEAM)
+
+        return [
+            team_a["win_pct"],
+            team_b["win_pct"],
+            self.h2h.get((A, B), 0.5),
+            team_a["avg_runs_scored"],
+            team_b["avg_runs_conceded"],
+            team_b["avg_runs_scored"],
+            team_a["avg_runs_conceded"],
+            self._venue_pct(venue, A),
+            self._venue_pct(venue, B),
+            self.toss.get(values["toss_winner"], 0.5),
+            self.batting_first_win_pct,
+            1 if toss_decision == "bat" and team_a["win_pct"] > 0.5 else 0,
+            1 if toss_decision == "bat" and team_b["win_pct"] > 0.5 else 0,
+            1 if A.lower() in venue.lower() else 0,
+            team_a["form_score"],
+            team_b["form_score"],
+        ]
+
+    def features_many(self, rows):
+        return np.array([self.features(row) for row in rows], dtype=np.float64).reshape(len(rows), len(NUMERIC_FEATURES))
+
+
+class FeatureServer:
+    """Holds the current FeatureSnapshot and swaps in newly published ones.
+
+    Requests read self.snapshot once and use that object throughout, and a
+    reload builds the new snapshot fully before a single reference swap, so
+    readers never wait on or observe a half-loaded snapshot.
+    """
+
+    def __init__(self, path, poll_seconds=SNAPSHOT_POLL_SECONDS, index_loader=None):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self.index_loader = index_loader
+        self.snapshot = None
+        self._mtime_ns = None
+        self._stop = threading.Event()
+        self._thread = None
+        self.reload()
+
+    def reload(self):
+        """Load the snapshot if it changed on disk. Returns True on a swap."""
+        try:
+            mtime_ns = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime_ns == self._mtime_ns:
+            return False
+        try:
+            snapshot = FeatureSnapshot.load(self.path, self.index_loader)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"[WARN] Could not load feature snapshot {self.path}: {e}")
+            return False
+        self.snapshot = snapshot
+        self._mtime_ns = mtime_ns
+        print(f"[INFO] Serving feature snapshot {snapshot.version}")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.reload()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="feature-snapshot-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,175 @@
+import os
+import json
+import shutil
+import tempfile
+import pandas as pd
+from feature_eng import FeatureState, feature_engineering
+from ingest import index_matches, load_record, match_sort_key, is_t20
+from player_tracker import reset_trackers
+import player_tracker
+from player_index import write_index, PLAYER_INDEX_SUBDIR
+from model_store import FEATURE_SCHEMA_VERSION
+
+# Checkpoint of the tracker state plus a watermark of the files already ingested
+FEATURE_STORE_DIR = "feature_store"
+STATE_FILE = "state.json"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_FILE = "serving_snapshot.json"  # what the API hot-reloads
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(payload))
+    os.replace(tmp_path, path)
+
+
+def load_manifest(store_dir=FEATURE_STORE_DIR):
+    path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_state(store_dir=FEATURE_STORE_DIR):
+    with open(os.path.join(store_dir, STATE_FILE), "r", encoding="utf-8") as f:
+        return FeatureState.from_dict(json.load(f))
+
+
+def save_checkpoint(state, manifest, store_dir=FEATURE_STORE_DIR):
+    # State first: a manifest never points past the state it was written with
+    os.makedirs(store_dir, exist_ok=True)
+    _write_json_atomic(os.path.join(store_dir, STATE_FILE), state.to_dict())
+    _write_json_atomic(os.path.join(store_dir, MANIFEST_FILE), manifest)
+    publish_snapshot(state, manifest, store_dir)
+
+
+def publish_snapshot(state, manifest, store_dir=FEATURE_STORE_DIR):
+    snapshot = state.serving_snapshot()
+    snapshot["version"] = f"{manifest['last_key'][0] if manifest['last_key'] else 'empty'}-{manifest['rows']}"
+    # The API refuses a snapshot whose features the served model was not trained on
+    snapshot["feature_schema"] = FEATURE_SCHEMA_VERSION
+    # Player form lives in the tracker globals, which hold this state's players.
+    # The index goes first so a snapshot never points at an older one
+    write_index(player_tracker.engine, os.path.join(store_dir, PLAYER_INDEX_SUBDIR), snapshot["version"])
+    snapshot["player_index"] = snapshot["version"]
+    _write_json_atomic(os.path.join(store_dir, SNAPSHOT_FILE), snapshot)
+
+
+def _stream(data_dir, entries, cache_dir=None):
+    for fname, info in entries:
+        yield load_record(data_dir, fname, info, cache_dir=cache_dir)
+
+
+def build_full(data_dir, out_csv, store_dir=FEATURE_STORE_DIR, cache_dir=None):
+    """Replay the whole archive, rewrite the dataset and checkpoint the state.
+    cache_dir overrides the ingest cache inside data_dir."""
+    fnames = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))
+    entries = index_matches(data_dir, fnames, match_filter=is_t20, cache_dir=cache_dir)
+
+    state = FeatureState()
+    reset_trackers()
+    df = feature_engineering(_stream(data_dir, entries, cache_dir), state=state)
+    df.to_csv(out_csv, index=False)
+
+    manifest = {
+        "ingested": fnames,
+        "last_key": list(match_sort_key(*entries[-1])) if entries else None,
+        "rows": len(df),
+        "dataset": os.path.abspath(out_csv),
+        "feature_schema": FEATURE_SCHEMA_VERSION,
+    }
+    save_checkpoint(state, manifest, store_dir)
+    print(f"Full build: {len(df)} rows from {len(fnames)} files")
+    return df
+
+
+def update_incremental(data_dir, out_csv, store_dir=FEATURE_STORE_DIR):
+    """Ingest only files missing from the watermark and append their rows.
+
+    Falls back to a full rebuild when there is no checkpoint, the dataset has
+    gone missing, the checkpoint was built under another feature schema, or a
+    new match predates the last one ingested (its features would otherwise
+    depend on replay order).
+    """
+    manifest = load_manifest(store_dir)
+    if manifest is None or not os.path.exists(out_csv):
+        print("No feature store checkpoint, running a full build")
+        return build_full(data_dir, out_csv, store_dir)
+    if manifest.get("feature_schema") != FEATURE_SCHEMA_VERSION:
+        print(f"[WARN] Checkpoint has feature schema {manifest.get('feature_schema')}, "
+              f"expected {FEATURE_SCHEMA_VERSION}; running a full build")
+        return build_full(data_dir, out_csv, store_dir)
+
+    ingested = set(manifest["ingested"])
+    new_fnames = sorted(f for f in os.listdir(data_dir) if f.endswith(".json") and f not in ingested)
+    if not new_fnames:
+        print("Feature store is up to date")
+        return pd.DataFrame()
+
+    entries = index_matches(data_dir, new_fnames, match_filter=is_t20)
+    last_key = tuple(manifest["last_key"]) if manifest["last_key"] else None
+    if entries and last_key and match_sort_key(*entries[0]) < last_key:
+        print(f"[WARN] {entries[0][0]} predates the checkpoint watermark, running a full build")
+        return build_full(data_dir, out_csv, store_dir)
+
+    state = load_state(store_dir)
+    df = feature_engineering(_stream(data_dir, entries), state=state)
+    if len(df):
+        df.to_csv(out_csv, mode="a", header=False, index=False)
+
+    manifest["ingested"] = sorted(ingested.union(new_fnames))
+    if entries:
+        manifest["last_key"] = list(match_sort_key(*entries[-1]))
+    manifest["rows"] += len(df)
+    save_checkpoint(state, manifest, store_dir)
+    print(f"Incremental build: appended {len(df)} rows from {len(new_fnames)} new files")
+    return df
+
+
+def build_both(data_dir, split=0.8):
+    """(incremental dataset, full dataset): a checkpointed build of the oldest
+    `split` of the archive plus an incremental run over the rest, and one full
+    rebuild, read back from their CSVs. The two should be equal."""
+    fnames = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))
+    ordered = [fname for fname, _ in index_matches(data_dir, fnames, match_filter=is_t20)]
+    cutoff = int(len(ordered) * split)
+
+    workdir = tempfile.mkdtemp(prefix="feature_store_check_")
+    try:
+        full_csv = os.path.join(workdir, "full.csv")
+        build_full(data_dir, full_csv, os.path.join(workdir, "full_store"))
+
+        # Stage the oldest files first, then drop in the rest and go incremental
+        staged_dir = os.path.join(workdir, "data")
+        os.makedirs(staged_dir)
+        for fname in ordered[:cutoff]:
+            shutil.copy(os.path.join(data_dir, fname), staged_dir)
+        inc_csv = os.path.join(workdir, "incremental.csv")
+        inc_store = os.path.join(workdir, "inc_store")
+        build_full(staged_dir, inc_csv, inc_store)
+        for fname in fnames:
+            if fname not in ordered[:cutoff]:
+                shutil.copy(os.path.join(data_dir, fname), staged_dir)
+        update_incremental(staged_dir, inc_csv, inc_store)
+
+        return pd.read_csv(inc_csv), pd.read_csv(full_csv)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from feature_eng import T20_DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Feature store maintenance")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--data-dir", default=T20_DATA_DIR)
+    args = parser.parse_args()
+
+    inc_df, full_df = build_both(args.data_dir)
+    same = inc_df.equals(full_df)
+    print(f"Incremental rows match full rebuild: {same} ({len(inc_df)} vs {len(full_df)} rows)")
+    if not same:
+        raise SystemExit(1)
@@ -0,0 +1,144 @@
+import threading
+import numpy as np
+
+
+class InferenceEngine:
+    """Pandas-free inference path compiled once from the trained artifacts.
+
+    Every LabelEncoder becomes a dict of label -> already-scaled value, and the
+    numeric defaults are scaled into a template row up front, so a request is a
+    handful of dict lookups written into a preallocated (1, n_features) array.
+    Live values for numeric_columns, when a request has them, are scaled in one
+    vector op over those positions.
+    """
+
+    def __init__(self, model, label_encoders, scaler, training_columns, default_values, numeric_columns=()):
+        self.model = model
+        self.training_columns = list(training_columns)
+        n_features = len(self.training_columns)
+
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n_features)
+
+        # Same (x - mean) / scale arithmetic as StandardScaler.transform, done
+        # once per value instead of once per request
+        def fold(j, x):
+            return (np.float64(x) - mean[j]) / scale[j]
+
+        self.template = np.zeros(n_features, dtype=np.float64)
+        for j, col in enumerate(self.training_columns):
+            if col in default_values:
+                self.template[j] = fold(j, default_values[col])
+
+        self.categorical = []  # (column, position, lookup table, unseen value)
+        for j, col in enumerate(self.training_columns):
+            encoder = label_encoders.get(col)
+            if encoder is None:
+                continue
+            table = {label: fold(j, code) for code, label in enumerate(encoder.classes_)}
+            self.categorical.append((col, j, table, fold(j, -1)))
+
+        self.numeric_positions = np.array([self.training_columns.index(col) for col in numeric_columns], dtype=np.intp)
+        self.numeric_mean = mean[self.numeric_positions]
+        self.numeric_scale = scale[self.numeric_positions]
+
+        self._local = threading.local()
+
+    def _row_buffer(self):
+        # Starlette runs sync endpoints on a threadpool, so each worker thread
+        # gets its own preallocated row
+        buf = getattr(self._local, "row", None)
+        if buf is None:
+            buf = self._local.row = np.empty((1, len(self.template)), dtype=np.float64)
+        return buf
+
+    def transform_one(self, values, numeric=None):
+        row = self._row_buffer()
+        row[0] = self.template
+        for col, j, table, unseen in self.categorical:
+            row[0, j] = table.get(values[col], unseen)
+        if numeric is not None:
+            row[0, self.numeric_positions] = (np.asarray(numeric, dtype=np.float64) - self.numeric_mean) / self.numeric_scale
+        return row
+
+    def transform_many(self, rows, numeric=None):
+        X = np.tile(self.template, (len(rows), 1))
+        for col, j, table, unseen in self.categorical:
+            X[:, j] = [table.get(row[col], unseen) for row in rows]
+        if numeric is not None:
+            X[:, self.numeric_positions] = (np.asarray(numeric, dtype=np.float64) - self.numeric_mean) / self.numeric_scale
+        return X
+
+    def transform_fixture(self, values, numeric):
+        """One fixture under many numeric rows (e.g. candidate lineups): the
+        categoricals are encoded once and only the numeric block varies."""
+        numeric = np.asarray(numeric, dtype=np.float64)
+        X = np.tile(self.transform_one(values)[0], (len(numeric), 1))
+        X[:, self.numeric_positions] = (numeric - self.numeric_mean) / self.numeric_scale
+        return X
+
+    def predict_proba_one(self, values, numeric=None):
+        return self.model.predict_proba(self.transform_one(values, numeric))[0][1]
+
+    def predict_proba_many(self, rows, numeric=None):
+        if not rows:
+            return np.empty(0)
+        return self.model.predict_proba(self.transform_many(rows, numeric))[:, 1]
+
+
+def parity_cases(label_encoders):
+    """Inputs covering every known team, venue and competition, plus a few
+    unseen labels."""
+    teams = list(label_encoders['teamA'].classes_)
+    venues = list(label_encoders['venue'].classes_)
+    competitions = list(label_encoders['competition'].classes_)
+    decisions = list(label_encoders['toss_decision'].classes_)
+
+    cases = []
+    for i, team in enumerate(teams + ["Unknown XI"]):
+        opponent = teams[(i + 1) % len(teams)]
+        cases.append({
+            "teamA": team, "teamB": opponent, "venue": venues[i % len(venues)],
+            "toss_winner": team, "toss_decision": decisions[i % len(decisions)],
+            "competition": competitions[i % len(competitions)],
+        })
+    for i, venue in enumerate(venues + ["Unknown Ground"]):
+        cases.append({
+            "teamA": teams[i % len(teams)], "teamB": teams[(i + 7) % len(teams)], "venue": venue,
+            "toss_winner": teams[(i + 7) % len(teams)], "toss_decision": decisions[i % len(decisions)],
+            "competition": competitions[(i * 3) % len(competitions)],
+        })
+    for i, competition in enumerate(competitions + ["Unknown Cup"]):
+        cases.append({
+            "teamA": teams[(i * 5) % len(teams)], "teamB": teams[(i * 5 + 1) % len(teams)],
+            "venue": venues[(i * 2) % len(venues)], "toss_winner": teams[(i * 5) % len(teams)],
+            "toss_decision": decisions[i % len(decisions)], "competition": competition,
+        })
+    return cases
+
+
+def check_parity(engine, reference_predict, label_encoders):
+    """Compare the engine, one row and batched, to the reference pandas path
+    over parity_cases(). Returns [(case, expected, single, batched)] for the
+    inputs where they differ."""
+    cases = parity_cases(label_encoders)
+    mismatches = []
+    batch = engine.predict_proba_many(cases)
+    for case, batched in zip(cases, batch):
+        expected = reference_predict(case)
+        single = engine.predict_proba_one(case)
+        if single != expected or batched != expected:
+            mismatches.append((case, expected, single, batched))
+    return mismatches
+
+
+if __name__ == "__main__":
+    from .api import models, predict_dataframe
+    engine = models.get()
+    label_encoders = models.artifacts.label_encoders
+    mismatches = check_parity(engine, predict_dataframe, label_encoders)
+    for case, expected, single, batched in mismatches[:10]:
+        print(f"[ERROR] {case}: expected {expected!r}, single {single!r}, batched {batched!r}")
+    print(f"Checked {len(parity_cases(label_encoders))} inputs, {len(mismatches)} mismatches")
+    if mismatches:
+        raise SystemExit(1)
@@ -0,0 +1,135 @@
+import os
+import json
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from deliveries import DeliveryTable
+
+# Per-data-dir cache of parsed matches, one .npz per Cricsheet file
+INGEST_CACHE_SUBDIR = ".ingest_cache"
+INDEX_FILE = "index.json"  # fname -> mtime/size and the match info block
+# Bumped when the cached DeliveryTable columns change; older entries are reparsed
+CACHE_FORMAT = 2
+
+# Files parsed per pool task; small files make per-task overhead dominate otherwise
+POOL_CHUNKSIZE = 32
+
+
+def is_t20(info):
+    return info.get("match_type") == "T20"
+
+
+def match_sort_key(fname, info):
+    # Replay order for anything with rolling state: match date, then file name
+    return (info.get("dates", ["?"])[0], fname)
+
+
+def summarize_match(match):
+    """Split a Cricsheet match into its info block and a DeliveryTable."""
+    info = dict(match.get("info", {}))
+    info.pop("registry", None)
+    return {"info": info, "deliveries": DeliveryTable.from_match(match)}
+
+
+def _cache_path(cache_dir, fname):
+    return os.path.join(cache_dir, fname[:-len(".json")] + ".npz")
+
+
+def _write_cache(path, record):
+    # Delivery columns are packed into one 2-D member: each npz member costs a
+    # zip lookup on read, so fewer members means faster replays
+    packed, players, teams = record["deliveries"].to_arrays()
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, deliveries=packed, players=players, teams=teams)
+    os.replace(tmp_path, path)
+
+
+def _load_index(cache_dir):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def _save_index(cache_dir, index):
+    path = os.path.join(cache_dir, INDEX_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(index))
+    os.replace(tmp_path, path)
+
+
+def _parse_file(args):
+    """Pool task: parse one file into its cache entry and return the index row."""
+    data_dir, cache_dir, fname, stat = args
+    try:
+        with open(os.path.join(data_dir, fname), "r", encoding="utf-8") as f:
+            record = summarize_match(json.load(f))
+        _write_cache(_cache_path(cache_dir, fname), record)
+        return fname, {"format": CACHE_FORMAT, "mtime_ns": stat[0], "size": stat[1], "info": record["info"]}
+    except Exception as e:
+        print(f"Failed to parse {fname}: {e}")
+        return fname, None
+
+
+def index_matches(data_dir, fnames=None, match_filter=None, cache_dir=None, workers=None):
+    """Return [(fname, info)] for the matches passing match_filter, in date order.
+
+    Files whose mtime/size match the cache index are not opened at all; the
+    rest are parsed across a process pool and their deliveries written straight
+    to the cache, so only metadata is ever held in memory here."""
+    cache_dir = cache_dir or os.path.join(data_dir, INGEST_CACHE_SUBDIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    if fnames is None:
+        fnames = os.listdir(data_dir)
+    index = _load_index(cache_dir)
+
+    entries = []
+    stale = []
+    for fname in fnames:
+        if not fname.endswith(".json"):
+            continue
+        st = os.stat(os.path.join(data_dir, fname))
+        cached = index.get(fname)
+        if (cached and cached.get("format") == CACHE_FORMAT and cached["mtime_ns"] == st.st_mtime_ns
+                and cached["size"] == st.st_size):
+            entries.append((fname, cached["info"]))
+        else:
+            stale.append((data_dir, cache_dir, fname, (st.st_mtime_ns, st.st_size)))
+
+    if stale:
+        if workers == 1 or len(stale) < POOL_CHUNKSIZE:
+            parsed = list(map(_parse_file, stale))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = list(pool.map(_parse_file, stale, chunksize=POOL_CHUNKSIZE))
+        for fname, row in parsed:
+            if row is not None:
+                index[fname] = row
+                entries.append((fname, row["info"]))
+        _save_index(cache_dir, index)
+
+    if match_filter is not None:
+        entries = [(fname, info) for fname, info in entries if match_filter(info)]
+    entries.sort(key=lambda entry: match_sort_key(*entry))
+    return entries
+
+
+def load_record(data_dir, fname, info, with_deliveries=True, cache_dir=None):
+    record = {"fname": fname, "info": info}
+    if with_deliveries:
+        cache_dir = cache_dir or os.path.join(data_dir, INGEST_CACHE_SUBDIR)
+        with np.load(_cache_path(cache_dir, fname)) as cached:
+            record["deliveries"] = DeliveryTable.from_arrays(cached["deliveries"], cached["players"], cached["teams"])
+    return record
+
+
+def iter_matches(data_dir, fnames=None, match_filter=None, with_deliveries=True, cache_dir=None, workers=None):
+    """Stream match records in date order, one cached file at a time."""
+    entries = index_matches(data_dir, fnames, match_filter, cache_dir, workers)
+    for fname, info in entries:
+        yield load_record(data_dir, fname, info, with_deliveries, cache_dir)
@@ -0,0 +1,352 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import numpy as np
+
+# Written by `python inplay.py train`; the API loads it on the first live match
+INPLAY_MODEL_PATH = "../models/inplay.npz"
+INPLAY_FORMAT = 2
+
+OVERS = 20
+BALLS_PER_OVER = 6
+TOTAL_BALLS = OVERS * BALLS_PER_OVER
+
+# Order of the columns state_features() returns
+STATE_FEATURES = ["runs", "wickets", "balls_left", "run_rate", "runs_needed", "required_rate",
+                  "batter_form", "bowler_form"]
+
+# Deliveries gathered into one predict call; a partial batch waits at most BATCH_WAIT_SECONDS
+MAX_BATCH = 512
+BATCH_WAIT_SECONDS = 0.002
+
+
+def state_features(innings, runs, wickets, balls_left, target, batter_form, bowler_form):
+    """Model inputs for arrays of match states, one row each.
+
+    balls_left counts legal balls only: wides and no-balls are re-bowled,
+    in training (DeliveryTable.illegal) and serving (MatchState) alike.
+    The chase columns are zero in the first innings.
+    """
+    innings = np.asarray(innings)
+    runs = np.asarray(runs, dtype=np.float64)
+    balls_left = np.asarray(balls_left, dtype=np.float64)
+    bowled = TOTAL_BALLS - balls_left
+    chasing = innings == 1
+    runs_needed = np.where(chasing, np.asarray(target, dtype=np.float64) - runs, 0.0)
+    return np.column_stack([
+        runs,
+        np.asarray(wickets, dtype=np.float64),
+        balls_left,
+        np.divide(runs * BALLS_PER_OVER, bowled, out=np.zeros(len(runs)), where=bowled > 0),
+        runs_needed,
+        np.where(chasing, np.clip(runs_needed * BALLS_PER_OVER / np.maximum(balls_left, 1), 0, 36), 0.0),
+        np.asarray(batter_form, dtype=np.float64),
+        np.asarray(bowler_form, dtype=np.float64),
+    ])
+
+
+class MatchState:
+    """Running state of one live match, updated in O(1) per delivery.
+
+    Only counters and the current players are kept, never the ball history.
+    apply() takes a Cricsheet delivery with its innings index, batting team
+    and over number, exactly as they appear in a Cricsheet file.
+    """
+
+    __slots__ = ("teamA", "teamB", "innings", "batting_team", "runs", "wickets", "over", "legal_in_over",
+                 "target", "batter", "non_striker", "bowler", "deliveries")
+
+    def __init__(self, teamA=None, teamB=None):
+        self.teamA = teamA
+        self.teamB = teamB
+        self.innings = 0
+        self.batting_team = None
+        self.runs = 0
+        self.wickets = 0
+        self.over = -1
+        self.legal_in_over = 0
+        self.target = None
+        self.batter = self.non_striker = self.bowler = None
+        self.deliveries = 0
+
+    @property
+    def balls_left(self):
+        if self.over < 0:
+            return TOTAL_BALLS
+        return max(0, TOTAL_BALLS - self.over * BALLS_PER_OVER - min(self.legal_in_over, BALLS_PER_OVER))
+
+    def apply(self, innings, team, over, delivery):
+        if innings > 1:
+            raise ValueError("super overs are not modelled")
+        if innings < self.innings:
+            raise ValueError(f"delivery for innings {innings} after innings {self.innings} started")
+        if innings != self.innings:
+            self.target = self.runs + 1
+            self.innings = innings
+            self.runs = self.wickets = self.legal_in_over = 0
+            self.over = -1
+        if over != self.over:
+            self.over = over
+            self.legal_in_over = 0
+        self.batting_team = team
+        extras = delivery.get("extras", {})
+        self.legal_in_over += 0 if "wides" in extras or "noballs" in extras else 1
+        self.runs += delivery.get("runs", {}).get("total", 0)
+        self.wickets += 1 if delivery.get("wickets") else 0
+        self.batter = delivery.get("batter")
+        self.non_striker = delivery.get("non_striker")
+        self.bowler = delivery.get("bowler")
+        self.deliveries += 1
+
+    def settled(self):
+        """Win probability of the batting side once the result is decided, else None."""
+        if self.innings != 1:
+            return None
+        if self.runs >= self.target:
+            return 1.0
+        if self.wickets >= 10 or self.balls_left == 0:
+            return 0.5 if self.runs == self.target - 1 else 0.0
+        return None
+
+    def summary(self):
+        return {"innings": self.innings, "batting_team": self.batting_team, "runs": self.runs,
+                "wickets": self.wickets, "balls_left": self.balls_left, "target": self.target,
+                "batter": self.batter, "bowler": self.bowler}
+
+
+class InPlayModel:
+    """Logistic regression per innings on state_features(), plus the latest
+    batting and bowling form of every player, all plain arrays."""
+
+    def __init__(self, arrays, version="unknown"):
+        self.coef = [arrays["coef_0"], arrays["coef_1"]]
+        self.intercept = [float(arrays["intercept_0"]), float(arrays["intercept_1"])]
+        self.mean = [arrays["mean_0"], arrays["mean_1"]]
+        self.scale = [arrays["scale_0"], arrays["scale_1"]]
+        self.players = {name: i for i, name in enumerate(arrays["players"].tolist())}
+        self.batting_form = arrays["batting_form"]
+        self.bowling_form = arrays["bowling_form"]
+        self.version = version
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as saved:
+            if int(saved["format"]) != INPLAY_FORMAT:
+                raise ValueError(f"Unsupported in-play model format {int(saved['format'])}")
+            arrays = {key: saved[key] for key in saved.files}
+        return cls(arrays, version=str(arrays["version"]))
+
+    def form(self, batter, bowler):
+        """(batting form of batter, bowling form of bowler); 0 for unknown players."""
+        b = self.players.get(batter)
+        w = self.players.get(bowler)
+        return (float(self.batting_form[b]) if b is not None else 0.0,
+                float(self.bowling_form[w]) if w is not None else 0.0)
+
+    def predict(self, innings, X):
+        """Batting side win probability for each row of X."""
+        innings = np.asarray(innings)
+        z = np.empty(len(X))
+        for k in (0, 1):
+            rows = innings == k
+            if rows.any():
+                z[rows] = ((X[rows] - self.mean[k]) / self.scale[k]) @ self.coef[k] + self.intercept[k]
+        return 1 / (1 + np.exp(-z))
+
+
+class MicroBatcher:
+    """Coalesces per-delivery predictions from every live match into one
+    vectorized predict call per event-loop tick (at most max_wait later).
+
+    The predict runs on the event loop itself; it is a few array ops, far
+    cheaper than a thread hop, so nothing here blocks for long.
+    """
+
+    def __init__(self, predict, max_batch=MAX_BATCH, max_wait=BATCH_WAIT_SECONDS, on_batch=None):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.on_batch = on_batch
+        self._pending = []
+        self._timer = None
+
+    async def submit(self, row):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((row, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        start = time.perf_counter()
+        try:
+            results = self.predict([row for row, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(float(result))
+        if self.on_batch is not None:
+            self.on_batch(len(pending), time.perf_counter() - start)
+
+
+class LazyInPlayModel:
+    """Loads the in-play model on first use; None if it has not been trained."""
+
+    def __init__(self, path):
+        self.path = path
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._model is not None
+
+    def get(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None and os.path.exists(self.path):
+                    self._model = InPlayModel.load(self.path)
+                    print(f"[INFO] Loaded in-play model {self._model.version[:12]} from {self.path}")
+        return self._model
+
+    def predict_rows(self, rows):
+        """rows are (innings, runs, wickets, balls_left, target, batter, bowler)."""
+        model = self._model
+        innings, runs, wickets, balls_left, target, batters, bowlers = zip(*rows)
+        forms = [model.form(b, w) for b, w in zip(batters, bowlers)]
+        X = state_features(innings, runs, wickets, balls_left, [t or 0 for t in target],
+                           [f[0] for f in forms], [f[1] for f in forms])
+        return model.predict(innings, X)
+
+
+# Training -------------------------------------------------------------------
+
+def training_rows(data_dir):
+    """One row per delivery of every decided T20 match, as seen after that
+    ball, labelled with whether the batting side went on to win. Player form
+    is as of the start of the match, from player_tracker."""
+    from ingest import iter_matches, is_t20
+    from player_tracker import update_player_stats, reset_trackers, get_batting_avg, get_bowling_avg
+
+    reset_trackers()
+    parts = []
+    for record in iter_matches(data_dir, match_filter=is_t20):
+        table = record["deliveries"]
+        teams = table.teams.tolist()
+        winner = record["info"].get("outcome", {}).get("winner")
+        names = table.players.tolist()
+        if winner is not None and len(table) and len(teams) >= 2:
+            batting_form = np.append([get_batting_avg(name) for name in names], 0.0)
+            bowling_form = np.append([get_bowling_avg(name) for name in names], 0.0)
+            keep = table.innings < 2
+            innings = table.innings[keep].astype(np.int64)
+            runs = table.total_runs[keep].astype(np.int64)
+            wicket = table.wicket[keep].astype(np.int64)
+            # Cumulative runs and wickets within each innings
+            first = innings == 0
+            cum_runs = np.where(first, np.cumsum(runs * first), np.cumsum(runs * ~first))
+            cum_wickets = np.where(first, np.cumsum(wicket * first), np.cumsum(wicket * ~first))
+            target = int((runs * first).sum()) + 1
+            # Legal balls so far in each over, as MatchState counts them
+            over = table.over[keep].astype(np.int64)
+            legal = (table.illegal[keep] == 0).astype(np.int64)
+            starts = np.r_[True, (innings[1:] != innings[:-1]) | (over[1:] != over[:-1])]
+            cum_legal = np.cumsum(legal)
+            legal_in_over = cum_legal - (cum_legal - legal)[starts][np.cumsum(starts) - 1]
+            balls_left = np.maximum(0, TOTAL_BALLS - over * BALLS_PER_OVER
+                                    - np.minimum(legal_in_over, BALLS_PER_OVER))
+            won = np.array([1 if teams[i] == winner else 0 for i in range(len(teams))])[innings]
+            parts.append((innings, cum_runs, cum_wickets, balls_left, np.where(innings == 1, target, 0),
+                          batting_form[table.batter[keep]], bowling_form[table.bowler[keep]], won))
+        update_player_stats(record)
+
+    columns = [np.concatenate(c) for c in zip(*parts)] if parts else [np.empty(0)] * 8
+    innings, runs, wickets, balls_left, target, batter_form, bowler_form, won = columns
+    X = state_features(innings, runs, wickets, balls_left, target, batter_form, bowler_form)
+    matches = np.concatenate([np.full(len(p[0]), i) for i, p in enumerate(parts)]) if parts else np.empty(0)
+    return innings, X, won, matches
+
+
+def _final_form():
+    """Every known player with their form after the last archived match."""
+    from player_tracker import engine, get_batting_avg, get_bowling_avg
+    names = list(engine.registry.names)
+    return (np.array(names, dtype=str),
+            np.array([get_batting_avg(name) for name in names], dtype=np.float64),
+            np.array([get_bowling_avg(name) for name in names], dtype=np.float64))
+
+
+def train(data_dir, out_path=INPLAY_MODEL_PATH, holdout=0.2):
+    """Fit both innings models, report held-out log loss on the most recent
+    matches, refit on everything and save atomically."""
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import log_loss, brier_score_loss
+
+    start = time.perf_counter()
+    innings, X, won, matches = training_rows(data_dir)
+    players, batting_form, bowling_form = _final_form()
+    print(f"[INFO] {len(X)} deliveries from {int(matches.max()) + 1 if len(matches) else 0} matches "
+          f"in {time.perf_counter() - start:.1f}s")
+    if not len(X):
+        raise ValueError(f"No decided T20 matches in {data_dir}")
+
+    def fit(rows):
+        mean = X[rows].mean(axis=0)
+        scale = X[rows].std(axis=0)
+        scale[scale == 0] = 1.0
+        model = LogisticRegression(max_iter=1000).fit((X[rows] - mean) / scale, won[rows])
+        return model.coef_[0], float(model.intercept_[0]), mean, scale
+
+    cutoff = np.quantile(matches, 1 - holdout)
+    report = {}
+    for k in (0, 1):
+        train_rows = (innings == k) & (matches < cutoff)
+        test_rows = (innings == k) & (matches >= cutoff)
+        if train_rows.any() and test_rows.any():
+            coef, intercept, mean, scale = fit(train_rows)
+            p = 1 / (1 + np.exp(-(((X[test_rows] - mean) / scale) @ coef + intercept)))
+            report[f"innings_{k}"] = {"rows": int(test_rows.sum()),
+                                      "log_loss": float(log_loss(won[test_rows], p, labels=[0, 1])),
+                                      "brier": float(brier_score_loss(won[test_rows], p))}
+    print(f"[INFO] Held-out {holdout:.0%} of matches: {json.dumps(report)}")
+
+    arrays = {}
+    for k in (0, 1):
+        coef, intercept, mean, scale = fit(innings == k)
+        arrays.update({f"coef_{k}": coef, f"intercept_{k}": np.float64(intercept),
+                       f"mean_{k}": mean, f"scale_{k}": scale})
+    version = time.strftime("%Y%m%d-%H%M%S")
+    tmp_path = f"{out_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, format=INPLAY_FORMAT, version=version, features=np.array(STATE_FEATURES),
+             players=players, batting_form=batting_form, bowling_form=bowling_form, **arrays)
+    os.replace(tmp_path, out_path)
+    print(f"[INFO] In-play model {version} saved to {out_path}")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train the ball-by-ball in-play win probability model")
+    parser.add_argument("command", choices=["train"])
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--out", default=INPLAY_MODEL_PATH)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    train(args.data_dir, args.out, args.holdout)
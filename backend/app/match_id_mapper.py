@@ -1,8 +1,13 @@
 import os
+import re
 import json
+import time
+import asyncio
+import hashlib
 import requests
 from bs4 import BeautifulSoup
 from datetime import datetime
+from ingest import index_matches, load_record
 
 # ESPN IPL base fixture URLs (2015–2024 known league codes)
 IPL_SERIES = [
@@ -17,23 +22,35 @@ IPL_SERIES = [
 
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
+# On-disk HTTP cache: fresh entries are served without a request, stale ones
+# are revalidated with their ETag / Last-Modified
+HTTP_CACHE_DIR = "http_cache"
+HTTP_CACHE_TTL = 24 * 3600
+
+# Fixture pages fetched at once
+FETCH_CONCURRENCY = 4
+
+DATE_PATTERNS = [
+    (re.compile(r"\d{4}-\d{2}-\d{2}"), "%Y-%m-%d"),
+    (re.compile(r"\d{1,2} [A-Z][a-z]{2} \d{4}"), "%d %b %Y"),
+    (re.compile(r"[A-Z][a-z]{2} \d{1,2},? \d{4}"), "%b %d %Y"),
+]
+
+
+def is_ipl(info):
+    comp = info.get("competition") or info.get("event", {}).get("name", "")
+    return "IPL" in comp
+
 
 def load_cricsheet_matches(folder):
     matches = []
-    for fname in os.listdir(folder):
-        if not fname.endswith(".json"):
-            continue
-        with open(os.path.join(folder, fname), 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            info = data.get("info", {})
-            comp = info.get("competition") or info.get("event", {}).get("name", "")
-            if "IPL" in comp:
-                matches.append({
-                    "date": info.get("dates", ["?"])[0],
-                    "teams": info.get("teams", ["?", "?"]),
-                    "venue": info.get("venue", "Unknown"),
-                    "match": data
-                })
+    for fname, info in index_matches(folder, match_filter=is_ipl):
+        matches.append({
+            "date": info.get("dates", ["?"])[0],
+            "teams": info.get("teams", ["?", "?"]),
+            "venue": info.get("venue", "Unknown"),
+            "match": load_record(folder, fname, info, with_deliveries=False)
+        })
     return matches
 
 
@@ -57,11 +74,29 @@ def standardize_team_name(name):
     return replacements.get(name, name)
 
 
-def match_teams_date(match_date, team1, team2, html):
-    soup = BeautifulSoup(html, 'html.parser')
-    cards = soup.find_all('a', href=True)
+def _anchor_date(a):
+    """ISO date of a fixture card, from a <time datetime>, title or the text."""
+    tag = a.find("time")
+    candidates = [tag.get("datetime", "") if tag else "", a.get("title", ""), a.get_text(" ")]
+    for text in candidates:
+        for pattern, fmt in DATE_PATTERNS:
+            found = pattern.search(text)
+            if found:
+                try:
+                    return datetime.strptime(found.group(0).replace(",", ""), fmt.replace(",", "")).strftime("%Y-%m-%d")
+                except ValueError:
+                    continue
+    return None
 
-    for a in cards:
+
+def build_fixture_index(html):
+    """Parse a fixture page once into {(sorted team pair, date): match_id}.
+
+    Cards without a readable date are stored under (pair, None); the first
+    card seen for a key wins, as in the old per-match scan."""
+    index = {}
+    soup = BeautifulSoup(html, 'html.parser')
+    for a in soup.find_all('a', href=True):
         href = a['href']
         text = a.get_text().strip()
         if not ("vs" in text and "/full-scorecard" in href):
@@ -74,51 +109,159 @@ def match_teams_date(match_date, team1, team2, html):
         t1 = standardize_team_name(parts[0].strip())
         t2 = standardize_team_name(parts[1].split(',')[0].strip())
 
-        if sorted([t1, t2]) != sorted([team1, team2]):
+        match_id = href.strip('/').split('-')[-1]
+        if not match_id.isdigit():
+            match_id = href.strip('/').split('/')[-2].split('-')[-1]
+        if not match_id.isdigit():
             continue
 
-        # Attempt to match by date in URL if present
-        match_id = href.strip('/').split('-')[-1]
-        if match_id.isdigit():
-            return match_id
-    return None
+        index.setdefault((tuple(sorted([t1, t2])), _anchor_date(a)), match_id)
+    return index
 
 
-def map_cricsheet_to_espn(folder):
-    cricsheet_matches = load_cricsheet_matches(folder)
-    print(f"Found {len(cricsheet_matches)} IPL matches from Cricsheet")
+def lookup_match_id(index, match_date, team1, team2):
+    """Id of the card for this pair on this date. Undated cards match any
+    date; a card dated otherwise is another meeting, possibly another season."""
+    pair = tuple(sorted([team1, team2]))
+    return index.get((pair, match_date)) or index.get((pair, None))
 
-    match_id_map = {}
 
-    for series_name, series_url in IPL_SERIES:
-        print(f"Fetching fixtures from {series_name}...")
+def match_teams_date(match_date, team1, team2, html):
+    return lookup_match_id(build_fixture_index(html), match_date, team1, team2)
+
+
+class HttpCache:
+    """URL -> body on disk, with the validators needed for conditional GETs."""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _paths(self, url):
+        key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.html"), os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, url):
+        body_path, meta_path = self._paths(url)
         try:
-            res = requests.get(series_url, headers=HEADERS, timeout=10)
-            if res.status_code != 200:
-                print(f"[WARN] Could not fetch {series_url}")
-                continue
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "r", encoding="utf-8") as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            return None, None
 
-            html = res.text
-            for match in cricsheet_matches:
-                date = match['date']
-                team1 = standardize_team_name(match['teams'][0])
-                team2 = standardize_team_name(match['teams'][1])
-                key = f"{team1}_vs_{team2}_{date}"
+    def is_fresh(self, meta):
+        return meta is not None and time.time() - meta["fetched_at"] < self.ttl
 
-                if key in match_id_map:
-                    continue  # already found
+    def put(self, url, body, meta):
+        body_path, meta_path = self._paths(url)
+        for path, payload in ((body_path, body), (meta_path, json.dumps(meta))):
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
 
-                match_id = match_teams_date(date, team1, team2, html)
-                if match_id:
-                    match_id_map[key] = match_id
 
+def fetch_cached(url, cache, session=None):
+    """Blocking fetch through the cache; returns the body or None."""
+    body, meta = cache.get(url)
+    if cache.is_fresh(meta):
+        return body
+
+    headers = dict(HEADERS)
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    res = (session or requests).get(url, headers=headers, timeout=10)
+    if res.status_code == 304 and body is not None:
+        meta["fetched_at"] = time.time()
+        cache.put(url, body, meta)
+        return body
+    if res.status_code != 200:
+        print(f"[WARN] Could not fetch {url}")
+        return None
+
+    cache.put(url, res.text, {
+        "url": url,
+        "etag": res.headers.get("ETag"),
+        "last_modified": res.headers.get("Last-Modified"),
+        "fetched_at": time.time(),
+    })
+    return res.text
+
+
+async def fetch_all(urls, cache, concurrency=FETCH_CONCURRENCY):
+    """Fetch every URL through the cache, at most `concurrency` at a time.
+
+    requests is blocking, so each fetch runs on a worker thread; the
+    semaphore bounds how many are in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    session = requests.Session()
+
+    async def fetch(url):
+        async with semaphore:
+            try:
+                return await asyncio.to_thread(fetch_cached, url, cache, session)
+            except Exception as e:
+                print(f"[ERROR] Failed to fetch {url}: {e}")
+                return None
+
+    try:
+        bodies = await asyncio.gather(*(fetch(url) for url in urls))
+    finally:
+        session.close()
+    return dict(zip(urls, bodies))
+
+
+def map_cricsheet_to_espn(folder, series=IPL_SERIES, out_path="ipl_match_id_map.json",
+                          cache_dir=HTTP_CACHE_DIR, ttl=HTTP_CACHE_TTL, concurrency=FETCH_CONCURRENCY):
+    cricsheet_matches = load_cricsheet_matches(folder)
+    print(f"Found {len(cricsheet_matches)} IPL matches from Cricsheet")
+
+    print(f"Fetching fixtures for {len(series)} series...")
+    pages = asyncio.run(fetch_all([url for _, url in series], HttpCache(cache_dir, ttl), concurrency))
+
+    match_id_map = {}
+
+    for series_name, series_url in series:
+        html = pages.get(series_url)
+        if html is None:
+            continue
+        try:
+            index = build_fixture_index(html)
         except Exception as e:
             print(f"[ERROR] Failed to parse {series_name}: {e}")
+            continue
+
+        for match in cricsheet_matches:
+            date = match['date']
+            team1 = standardize_team_name(match['teams'][0])
+            team2 = standardize_team_name(match['teams'][1])
+            key = f"{team1}_vs_{team2}_{date}"
+
+            if key in match_id_map:
+                continue  # already found
 
-    with open("ipl_match_id_map.json", "w") as f:
+            match_id = lookup_match_id(index, date, team1, team2)
+            if match_id:
+                match_id_map[key] = match_id
+
+    with open(out_path, "w") as f:
         json.dump(match_id_map, f, indent=2)
-    print(f"Saved {len(match_id_map)} match IDs to ipl_match_id_map.json")
+    print(f"Saved {len(match_id_map)} match IDs to {out_path}")
+    return match_id_map
 
 
 if __name__ == "__main__":
-    map_cricsheet_to_espn("data")
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Map Cricsheet IPL matches to ESPNcricinfo match ids")
+    parser.add_argument("--data-dir", default="data")
+    args = parser.parse_args()
+
+    map_cricsheet_to_espn(args.data_dir)
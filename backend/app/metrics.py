@@ -0,0 +1,182 @@
+import os
+import time
+import bisect
+import threading
+import cProfile
+import pstats
+from contextlib import contextmanager
+import numpy as np
+
+# Histogram bucket bounds in seconds, Prometheus-style (cumulative, +Inf implied)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# p50/p95/p99 are computed over this many most recent observations per series
+QUANTILE_WINDOW = 2048
+QUANTILES = (0.5, 0.95, 0.99)
+
+# Opt-in request profiling: only honoured when CRICPRED_PROFILING=1
+PROFILING_ENABLED = os.environ.get("CRICPRED_PROFILING") == "1"
+PROFILE_HEADER = "x-profile"
+PROFILE_DIR = os.environ.get("CRICPRED_PROFILE_DIR", "profiles")
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = np.zeros(QUANTILE_WINDOW)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.recent[self.count % QUANTILE_WINDOW] = value
+        self.sum += value
+        self.count += 1
+
+    def quantiles(self):
+        return self.window()[0]
+
+    def window(self):
+        """(quantiles, sum, count) over the last QUANTILE_WINDOW observations."""
+        if not self.count:
+            return [float("nan")] * len(QUANTILES), 0.0, 0
+        window = self.recent[:min(self.count, QUANTILE_WINDOW)]
+        return np.quantile(window, QUANTILES).tolist(), float(window.sum()), len(window)
+
+
+class Metrics:
+    """Counters, gauges and latency histograms for one process.
+
+    A series is a metric name plus a tuple of (label, value) pairs. Each
+    histogram is rendered twice: as a Prometheus histogram (buckets that
+    aggregate across workers) and as a `<name>_recent` summary with
+    p50/p95/p99, sum and count all over the last QUANTILE_WINDOW
+    observations.
+    """
+
+    def __init__(self):
+        self.help = {}
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, text):
+        self.help[name] = (kind, text)
+
+    def inc(self, name, labels=(), n=1):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + n
+
+    def gauge_add(self, name, labels=(), delta=1):
+        with self._lock:
+            self.gauges[(name, labels)] = self.gauges.get((name, labels), 0) + delta
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, labels, seconds, buckets=LATENCY_BUCKETS):
+        with self._lock:
+            series = self.histograms.get((name, labels))
+            if series is None:
+                series = self.histograms[(name, labels)] = _Histogram(buckets)
+            series.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, labels=()):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, labels, time.perf_counter() - start)
+
+    @contextmanager
+    def in_flight(self, name, labels=()):
+        self.gauge_add(name, labels, 1)
+        try:
+            yield
+        finally:
+            self.gauge_add(name, labels, -1)
+
+    def quantiles(self, name, labels=()):
+        with self._lock:
+            series = self.histograms.get((name, labels))
+            return dict(zip(QUANTILES, series.quantiles())) if series is not None else {}
+
+    def render(self):
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            histograms = sorted((key, series.counts[:], series.sum, series.count, series.window(), series.buckets)
+                                for key, series in self.histograms.items())
+
+        lines = []
+        described = set()
+
+        def header(name, kind):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {self.help.get(name, (kind, name))[1]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            header(name, "counter")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            header(name, "gauge")
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), counts, total, count, _, buckets in histograms:
+            header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (name, labels), _, _, _, (quantiles, window_sum, window_count), _ in histograms:
+            recent = f"{name}_recent"
+            header(recent, "summary")
+            for q, value in zip(QUANTILES, quantiles):
+                lines.append(f"{recent}{_labels(labels + (('quantile', str(q)),))} {value}")
+            lines.append(f"{recent}_sum{_labels(labels)} {window_sum}")
+            lines.append(f"{recent}_count{_labels(labels)} {window_count}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def profile_requested(headers):
+    return PROFILING_ENABLED and headers.get(PROFILE_HEADER, "") not in ("", "0")
+
+
+@contextmanager
+def profiled(enabled, name):
+    """cProfile the block when enabled; yields a dict that gets the path of
+    the saved .prof file (readable with pstats or snakeviz).
+
+    Profiling runs inside the handler rather than the middleware because
+    sync endpoints execute on a threadpool thread and cProfile only sees
+    the thread it was enabled on.
+    """
+    result = {}
+    if not enabled:
+        yield result
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{name}-{time.perf_counter_ns()}.prof")
+        pstats.Stats(profiler).dump_stats(path)
+        result["path"] = path
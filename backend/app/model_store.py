@@ -0,0 +1,525 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import ctypes
+import ctypes.util
+import numpy as np
+
+# Memory-mappable copy of the pickled artifacts, written by `pack`
+PACKED_SUBDIR = "packed"
+MANIFEST_FILE = "manifest.json"
+PACKED_FORMAT = 1
+
+# Published training runs live in versions/<version>/; CURRENT names the live one
+VERSIONS_SUBDIR = "versions"
+CURRENT_FILE = "CURRENT"
+
+# How often a started LazyArtifacts checks for new artifacts on disk
+MODEL_POLL_SECONDS = 30.0
+
+PICKLE_FILES = {"model": "matchWinner.pkl", "label_encoders": "label_encoders.pkl", "scaler": "scaler.pkl"}
+
+# Definition of the feature columns a model is trained on and a snapshot
+# serves; bump it whenever a column's meaning or scale changes. Artifacts that
+# predate it were trained on the notebook's features, which are version 1
+FEATURE_SCHEMA_VERSION = 1
+TRAIN_REPORT_FILE = "train_report.json"
+
+# XGBoost's sigmoid is 1 / (1 + expf(-margin)); numpy's float32 exp can be an
+# ulp away from libm's, so libm is used where it can be found
+_libm_path = ctypes.util.find_library("m")
+if _libm_path:
+    _expf = ctypes.CDLL(_libm_path).expf
+    _expf.restype = ctypes.c_float
+    _expf.argtypes = [ctypes.c_float]
+    _expf_many = np.frompyfunc(_expf, 1, 1)
+else:
+    _expf_many = None
+
+
+def _exp32(x):
+    if _expf_many is None:
+        return np.exp(x.astype(np.float64)).astype(np.float32)
+    return _expf_many(x).astype(np.float32)
+
+
+class PackedForest:
+    """XGBoost binary:logistic model evaluated from flat node arrays.
+
+    All trees share one set of node arrays (children already offset to global
+    node ids), so with the arrays memory-mapped every worker process reads the
+    same page-cache pages. Traversal and accumulation are done in float32 in
+    tree order, matching XGBoost's own predictions bit for bit.
+    """
+
+    def __init__(self, arrays, base_margin, max_depth, n_features):
+        self.roots = arrays["roots"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.default_left = arrays["default_left"]
+        self.base_margin = np.float32(base_margin)
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features
+
+    def predict_margin(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        n = X.shape[0]
+        node = np.broadcast_to(self.roots, (n, len(self.roots))).copy()
+        rows = np.arange(n)[:, None]
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.default_left[node], x < self.threshold[node])
+            node = np.where(left < 0, node, np.where(go_left, left, self.right[node]))
+        # Leaf values live in the threshold array, as in XGBoost's own layout.
+        # cumsum adds strictly left to right, which is XGBoost's order
+        leaves = np.hstack([np.full((n, 1), self.base_margin, dtype=np.float32), self.threshold[node]])
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+    def predict_proba(self, X):
+        p = np.float32(1) / (np.float32(1) + _exp32(-self.predict_margin(X)))
+        return np.column_stack([np.float32(1) - p, p])
+
+
+class PackedScaler:
+    """StandardScaler attributes over mapped arrays; importing sklearn alone
+    would cost a new worker about a second."""
+
+    def __init__(self, mean, scale, var, with_mean=True, with_std=True, feature_names=None):
+        self.mean_ = mean
+        self.scale_ = scale
+        self.var_ = var
+        self.with_mean = with_mean
+        self.with_std = with_std
+        self.n_features_in_ = len(mean)
+        if feature_names is not None:
+            self.feature_names_in_ = feature_names
+
+    def transform(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if self.with_mean:
+            X = X - self.mean_
+        if self.with_std:
+            X = X / self.scale_
+        return X
+
+
+class PackedEncoder:
+    """LabelEncoder over a mapped, sorted classes_ array."""
+
+    def __init__(self, classes):
+        self.classes_ = classes
+
+    def transform(self, y):
+        y = np.asarray(y, dtype=str)
+        codes = np.searchsorted(self.classes_, y)
+        found = codes < len(self.classes_)
+        found[found] = self.classes_[codes[found]] == y[found]
+        if not found.all():
+            raise ValueError(f"y contains previously unseen labels: {y[~found].tolist()}")
+        return codes
+
+
+class ModelArtifacts:
+    """The model, label encoders and scaler, plus where they came from."""
+
+    def __init__(self, model, label_encoders, scaler, version, source, feature_schema=1):
+        self.model = model
+        self.label_encoders = label_encoders
+        self.scaler = scaler
+        self.version = version
+        self.source = source
+        self.feature_schema = feature_schema
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _content_hash(file_hashes):
+    h = hashlib.sha256()
+    for name in sorted(file_hashes):
+        h.update(f"{name}:{file_hashes[name]}\n".encode())
+    return h.hexdigest()
+
+
+def pickled_feature_schema(models_dir):
+    """Feature schema recorded by train.py next to the pickles, else 1."""
+    try:
+        with open(os.path.join(models_dir, TRAIN_REPORT_FILE), "r", encoding="utf-8") as f:
+            return json.load(f).get("feature_schema", 1)
+    except OSError:
+        return 1
+
+
+def load_pickled(models_dir):
+    """The original joblib artifacts, fully deserialized into this process."""
+    import joblib
+    paths = {key: os.path.join(models_dir, name) for key, name in PICKLE_FILES.items()}
+    version = _content_hash({PICKLE_FILES[key]: _sha256(path) for key, path in paths.items()})
+    return ModelArtifacts(joblib.load(paths["model"]), joblib.load(paths["label_encoders"]),
+                          joblib.load(paths["scaler"]), version, "pickle", pickled_feature_schema(models_dir))
+
+
+def _forest_arrays(xgb_model):
+    booster = xgb_model.get_booster()
+    saved = json.loads(booster.save_raw("json"))
+    learner = saved["learner"]
+    if learner["objective"]["name"] != "binary:logistic":
+        raise ValueError(f"Only binary:logistic models can be packed, not {learner['objective']['name']}")
+    trees = learner["gradient_booster"]["model"]["trees"]
+
+    columns = {key: [] for key in ("left", "right", "feature", "threshold", "default_left")}
+    roots, max_depth, offset = [], 0, 0
+    for tree in trees:
+        if any(tree["split_type"]):
+            raise ValueError("Categorical splits are not supported by the packed format")
+        left = np.array(tree["left_children"])
+        right = np.array(tree["right_children"])
+        depth = np.zeros(len(left), dtype=np.int64)
+        for i in range(len(left)):  # parents always precede their children
+            if left[i] >= 0:
+                depth[left[i]] = depth[right[i]] = depth[i] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        roots.append(offset)
+        columns["left"].append(np.where(left >= 0, left + offset, -1))
+        columns["right"].append(np.where(right >= 0, right + offset, -1))
+        columns["feature"].append(tree["split_indices"])
+        columns["threshold"].append(tree["split_conditions"])
+        columns["default_left"].append(tree["default_left"])
+        offset += len(left)
+
+    arrays = {
+        "roots": np.array(roots, dtype=np.int32),
+        "left": np.concatenate(columns["left"]).astype(np.int32),
+        "right": np.concatenate(columns["right"]).astype(np.int32),
+        "feature": np.concatenate(columns["feature"]).astype(np.int32),
+        "threshold": np.concatenate(columns["threshold"]).astype(np.float32),
+        "default_left": np.concatenate(columns["default_left"]).astype(bool),
+    }
+    # base_score is stored as a probability; XGBoost turns it into a margin in float32
+    base_score = np.float32(learner["learner_model_param"]["base_score"].strip("[]"))
+    base_margin = -np.log(np.float32(1) / base_score - np.float32(1))
+    meta = {"base_margin": float(base_margin), "max_depth": max_depth,
+            "n_features": int(learner["learner_model_param"]["num_feature"]), "n_trees": len(trees)}
+    return arrays, meta
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def pack(models_dir, out_dir=None, feature_schema=None):
+    """Write the pickled artifacts as .npy arrays plus a manifest with hashes.
+
+    Every file is replaced atomically and the manifest is written last, so a
+    worker that starts mid-pack loads either the old set or the new one.
+    """
+    out_dir = out_dir or os.path.join(models_dir, PACKED_SUBDIR)
+    os.makedirs(out_dir, exist_ok=True)
+    artifacts = load_pickled(models_dir)
+
+    arrays, forest = _forest_arrays(artifacts.model)
+    arrays = {f"forest_{name}": array for name, array in arrays.items()}
+
+    scaler = artifacts.scaler
+    arrays["scaler_mean"] = np.asarray(scaler.mean_, dtype=np.float64)
+    arrays["scaler_scale"] = np.asarray(scaler.scale_, dtype=np.float64)
+    arrays["scaler_var"] = np.asarray(scaler.var_, dtype=np.float64)
+    if hasattr(scaler, "feature_names_in_"):
+        arrays["scaler_feature_names"] = np.asarray(scaler.feature_names_in_, dtype=str)
+
+    # Fixed-width unicode, unlike the object arrays in the pickles, so they map too
+    encoder_columns = list(artifacts.label_encoders)
+    for col in encoder_columns:
+        arrays[f"encoder_{col}"] = np.asarray(artifacts.label_encoders[col].classes_, dtype=str)
+
+    files = {}
+    for name, array in arrays.items():
+        path = os.path.join(out_dir, f"{name}.npy")
+        _save_npy(path, array)
+        files[f"{name}.npy"] = _sha256(path)
+
+    manifest = {
+        "format": PACKED_FORMAT,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source_version": artifacts.version,
+        "content_hash": _content_hash(files),
+        "files": files,
+        "forest": forest,
+        "scaler": {"with_mean": bool(scaler.with_mean), "with_std": bool(scaler.with_std)},
+        "encoders": encoder_columns,
+        "feature_schema": feature_schema if feature_schema is not None else pickled_feature_schema(models_dir),
+    }
+    tmp_path = os.path.join(out_dir, f"{MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_FILE))
+    print(f"[INFO] Packed {len(files)} arrays into {out_dir} ({manifest['content_hash'][:12]})")
+    return manifest
+
+
+def read_manifest(packed_dir):
+    with open(os.path.join(packed_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != PACKED_FORMAT:
+        raise ValueError(f"Unsupported packed artifact format {manifest.get('format')}")
+    return manifest
+
+
+def verify(packed_dir):
+    """Re-hash every file against the manifest. Returns the names that differ."""
+    manifest = read_manifest(packed_dir)
+    bad = [name for name, digest in manifest["files"].items()
+           if not os.path.exists(os.path.join(packed_dir, name)) or _sha256(os.path.join(packed_dir, name)) != digest]
+    if _content_hash(manifest["files"]) != manifest["content_hash"]:
+        bad.append(MANIFEST_FILE)
+    return bad
+
+
+def load_packed(packed_dir, mmap_mode="r"):
+    """Artifacts backed by read-only memory maps of the packed arrays."""
+    manifest = read_manifest(packed_dir)
+
+    def array(name):
+        return np.load(os.path.join(packed_dir, f"{name}.npy"), mmap_mode=mmap_mode)
+
+    forest = manifest["forest"]
+    model = PackedForest({name: array(f"forest_{name}") for name in
+                          ("roots", "left", "right", "feature", "threshold", "default_left")},
+                         forest["base_margin"], forest["max_depth"], forest["n_features"])
+
+    has_names = "scaler_feature_names.npy" in manifest["files"]
+    scaler = PackedScaler(array("scaler_mean"), array("scaler_scale"), array("scaler_var"),
+                          manifest["scaler"]["with_mean"], manifest["scaler"]["with_std"],
+                          array("scaler_feature_names") if has_names else None)
+    label_encoders = {col: PackedEncoder(array(f"encoder_{col}")) for col in manifest["encoders"]}
+
+    return ModelArtifacts(model, label_encoders, scaler, manifest["content_hash"], "packed",
+                          manifest.get("feature_schema", 1))
+
+
+def active_dir(models_dir):
+    """The published version's directory if models_dir has a CURRENT
+    pointer, else models_dir itself."""
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return models_dir
+    return os.path.join(models_dir, VERSIONS_SUBDIR, version)
+
+
+def list_versions(models_dir):
+    versions_dir = os.path.join(models_dir, VERSIONS_SUBDIR)
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(name for name in os.listdir(versions_dir) if not name.startswith("."))
+
+
+def publish_version(models_dir, version):
+    """Point CURRENT at versions/<version>. A single rename, so loaders see
+    either the previous version or this one; publishing an older version
+    is a rollback."""
+    if not os.path.isdir(os.path.join(models_dir, VERSIONS_SUBDIR, version)):
+        raise ValueError(f"No model version {version} in {models_dir}")
+    path = os.path.join(models_dir, CURRENT_FILE)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp_path, path)
+    print(f"[INFO] Published model version {version}")
+
+
+def load_artifacts(models_dir):
+    """Packed artifacts when they exist, else the pickles."""
+    models_dir = active_dir(models_dir)
+    packed_dir = os.path.join(models_dir, PACKED_SUBDIR)
+    if os.path.exists(os.path.join(packed_dir, MANIFEST_FILE)):
+        return load_packed(packed_dir)
+    print(f"[WARN] No packed artifacts in {packed_dir}; loading pickles (run `model_store pack`)")
+    return load_pickled(models_dir)
+
+
+def _source_stamp(models_dir):
+    """mtimes of CURRENT, the manifest and pickles; any change means new artifacts."""
+    paths = [os.path.join(models_dir, CURRENT_FILE)]
+    models_dir = active_dir(models_dir)
+    paths += [os.path.join(models_dir, PACKED_SUBDIR, MANIFEST_FILE)]
+    paths += [os.path.join(models_dir, name) for name in PICKLE_FILES.values()]
+    stamp = []
+    for path in paths:
+        try:
+            stamp.append(os.stat(path).st_mtime_ns)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+class LazyArtifacts:
+    """Loads artifacts, and whatever is built from them, on first use.
+
+    `build` turns a ModelArtifacts into the object handed out by get() (the
+    API's InferenceEngine). Loading happens once, under a lock, so concurrent
+    first requests wait for the same load instead of each doing it. Once
+    loaded, reload() (or the start() watcher) swaps in new artifacts when the
+    files change and then calls every on_reload callback with the new version.
+    """
+
+    def __init__(self, models_dir, build=None, loader=load_artifacts, poll_seconds=MODEL_POLL_SECONDS):
+        self.models_dir = models_dir
+        self.build = build or (lambda artifacts: artifacts)
+        self.loader = loader
+        self.poll_seconds = poll_seconds
+        self.on_reload = []
+        self._loaded = None  # (stamp, artifacts, built), swapped as one reference
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _load(self):
+        start = time.perf_counter()
+        stamp = _source_stamp(self.models_dir)
+        artifacts = self.loader(active_dir(self.models_dir))
+        loaded = (stamp, artifacts, self.build(artifacts))
+        print(f"[INFO] Loaded {artifacts.source} model artifacts {artifacts.version[:12]} "
+              f"in {(time.perf_counter() - start) * 1000:.1f}ms")
+        return loaded
+
+    def current(self):
+        """(artifacts, built) from the same load."""
+        loaded = self._loaded
+        if loaded is None:
+            with self._lock:
+                if self._loaded is None:
+                    self._loaded = self._load()
+                loaded = self._loaded
+        return loaded[1], loaded[2]
+
+    def get(self):
+        return self.current()[1]
+
+    @property
+    def artifacts(self):
+        return self.current()[0]
+
+    def reload(self):
+        """Swap in new artifacts if the files changed. Returns True on a swap."""
+        with self._lock:
+            previous = self._loaded
+            if previous is None or _source_stamp(self.models_dir) == previous[0]:
+                return False
+            try:
+                self._loaded = self._load()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[WARN] Could not reload model artifacts from {self.models_dir}: {e}")
+                return False
+        version = self._loaded[1].version
+        for callback in self.on_reload:
+            callback(version)
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.reload()
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="model-artifact-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+_BENCH_SNIPPET = """
+import json, resource, sys, time
+start = time.perf_counter()
+import numpy as np
+from backend.app import model_store
+artifacts = model_store.load_pickled(sys.argv[2]) if sys.argv[1] == "pickle" else model_store.load_packed(sys.argv[3])
+loaded = time.perf_counter()
+artifacts.model.predict_proba(np.zeros((1, artifacts.model.n_features_in_)))
+done = time.perf_counter()
+print(json.dumps({"load_ms": (loaded - start) * 1000, "first_prediction_ms": (done - start) * 1000,
+                  "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def benchmark(models_dir, runs=5):
+    """Startup cost of each loader, each run in a fresh interpreter.
+
+    Times cover imports, loading and the first prediction, i.e. what a new
+    worker pays before it can serve. Medians over `runs`.
+    """
+    import subprocess
+    import sys
+
+    packed_dir = os.path.join(models_dir, PACKED_SUBDIR)
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    results = {}
+    for loader in ("pickle", "packed"):
+        samples = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", _BENCH_SNIPPET, loader, models_dir, packed_dir],
+                                 cwd=root, capture_output=True, text=True, check=True)
+            samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        results[loader] = {key: float(np.median([s[key] for s in samples])) for key in samples[0]}
+        print(f"{loader:>7}: load {results[loader]['load_ms']:.0f}ms, "
+              f"first prediction {results[loader]['first_prediction_ms']:.0f}ms, "
+              f"max RSS {results[loader]['max_rss_mb']:.0f}MB")
+    return results
+
+
+def check_packed(models_dir, n=20000, seed=0):
+    """Packed forest vs the pickled XGBoost model on random scaled inputs."""
+    reference = load_pickled(models_dir).model
+    packed = load_packed(os.path.join(models_dir, PACKED_SUBDIR)).model
+    X = np.random.default_rng(seed).normal(scale=2.0, size=(n, packed.n_features_in_))
+    X[::97, ::5] = np.nan  # exercise missing-value default directions
+    mismatches = int((reference.predict_proba(X) != packed.predict_proba(X)).any(axis=1).sum())
+    print(f"Checked {n} inputs, {mismatches} mismatches")
+    return mismatches
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack, verify and benchmark model artifacts")
+    parser.add_argument("command", choices=["pack", "verify", "check", "bench", "versions", "publish"])
+    parser.add_argument("--models-dir", default=os.environ.get("CRICPRED_MODELS_DIR", "backend/models/"))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--version", help="version to publish")
+    args = parser.parse_args()
+
+    if args.command == "versions":
+        live = os.path.basename(active_dir(args.models_dir))
+        for version in list_versions(args.models_dir):
+            print(f"{'*' if version == live else ' '} {version}")
+    elif args.command == "publish":
+        publish_version(args.models_dir, args.version)
+    elif args.command == "pack":
+        pack(args.models_dir)
+    elif args.command == "verify":
+        bad = verify(os.path.join(active_dir(args.models_dir), PACKED_SUBDIR))
+        print("[OK] All files match the manifest" if not bad else f"[ERROR] Hash mismatch: {bad}")
+        raise SystemExit(1 if bad else 0)
+    elif args.command == "check":
+        raise SystemExit(1 if check_packed(active_dir(args.models_dir)) else 0)
+    else:
+        benchmark(active_dir(args.models_dir), args.runs)
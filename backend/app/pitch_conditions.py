@@ -1,12 +1,33 @@
+import os
+import re
+import json
+import time
+import asyncio
 import requests
+import pandas as pd
 from bs4 import BeautifulSoup
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlparse
 import datetime
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0"
 }
 
+ESPN_SEARCH_URL = "https://www.espncricinfo.com/search/_/q/{query}"
+
+# Persistent (venue, date) -> pitch type cache. Unknown results expire sooner
+# so a venue gets retried once articles appear
+PITCH_CACHE_PATH = "pitch_cache.json"
+PITCH_CACHE_TTL = 30 * 24 * 3600
+UNKNOWN_CACHE_TTL = 24 * 3600
+
+# Fetch limits: requests in flight overall, and minimum gap between two
+# requests to the same host
+FETCH_CONCURRENCY = 8
+PER_HOST_INTERVAL = 1.0
+
+DEBUG = False
+
 # Expanded keywords mapping to pitch type
 PITCH_KEYWORDS = {
     "spin": ["turn", "dry", "slow", "dust", "crumble", "grip", "assists spinners", "spin-friendly", "spin"],
@@ -15,66 +36,249 @@ PITCH_KEYWORDS = {
     "balanced": ["balanced", "even contest"]
 }
 
+
+def _compile_matcher(keywords):
+    """One lookahead regex over every keyword, longest first.
+
+    At each position it reports the longest keyword starting there; every
+    shorter keyword starting at the same position is a prefix of it, so the
+    per-keyword categories to credit are precomputed. None of the keywords
+    overlap themselves, which makes this equal to a str.count per keyword.
+    """
+    category_of = {kw: category for category, kws in keywords.items() for kw in kws}
+    ordered = sorted(category_of, key=len, reverse=True)
+    pattern = re.compile("(?=(" + "|".join(re.escape(kw) for kw in ordered) + "))")
+    credits = {kw: [category_of[other] for other in ordered if kw.startswith(other)] for kw in ordered}
+    return pattern, credits
+
+
+PITCH_PATTERN, PITCH_CREDITS = _compile_matcher(PITCH_KEYWORDS)
+
+
 def fallback_espn_search(venue):
+    html = _get(_search_url(venue))
+    return _article_links(html) if html is not None else []
+
+
+def _search_url(venue):
     query = quote_plus(f"{venue} pitch report site:espncricinfo.com")
-    search_url = f"https://www.espncricinfo.com/search/_/q/{query}"
-    print(f"[DEBUG] Using fallback ESPNcricinfo search: {search_url}")
+    return ESPN_SEARCH_URL.format(query=query)
+
+
+def _article_links(html):
+    soup = BeautifulSoup(html, "html.parser")
+    links = []
+    for a in soup.find_all("a"):
+        href = a.get("href")
+        if href and "pitch" in href and href.startswith(("https://", "http://")):
+            links.append(href)
+    return links[:3]
 
+
+def _page_text(html):
+    soup = BeautifulSoup(html, "html.parser")
+    paragraphs = soup.find_all("p")
+    text = " ".join(p.get_text() for p in paragraphs)
+    return text.lower()
+
+
+def _get(url, session=None):
+    """Body of a successful response, else None; error pages (404, 429, ...)
+    are never classified."""
     try:
-        resp = requests.get(search_url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        links = []
-        for a in soup.find_all("a"):
-            href = a.get("href")
-            if href and "pitch" in href and href.startswith("https://"):
-                links.append(href)
-        return links[:3]
+        resp = (session or requests).get(url, headers=HEADERS, timeout=10)
     except Exception as e:
-        print(f"[ERROR] Fallback ESPN search failed: {e}")
-        return []
+        print(f"[ERROR] Failed to fetch {url}: {e}")
+        return None
+    if not resp.ok:
+        print(f"[WARN] Could not fetch {url}: HTTP {resp.status_code}")
+        return None
+    return resp.text
+
 
 def fetch_pitch_text(url):
-    try:
-        page = requests.get(url, headers=HEADERS, timeout=10)
-        soup = BeautifulSoup(page.text, "html.parser")
-        paragraphs = soup.find_all("p")
-        text = " ".join(p.get_text() for p in paragraphs)
-        text = text.lower()
+    html = _get(url)
+    text = _page_text(html) if html is not None else ""
+    if DEBUG:
         print(f"[DEBUG] Text extracted from {url} (first 500 chars):\n{text[:500]}\n")
-        return text
-    except Exception as e:
-        print(f"[ERROR] Failed to fetch or parse {url}: {e}")
-        return ""
+    return text
+
 
 def classify_pitch_type(text):
     scores = {k: 0 for k in PITCH_KEYWORDS}
-    for category, keywords in PITCH_KEYWORDS.items():
-        for kw in keywords:
-            scores[category] += text.count(kw)
+    for found in PITCH_PATTERN.finditer(text):
+        for category in PITCH_CREDITS[found.group(1)]:
+            scores[category] += 1
 
-    print("[DEBUG] Keyword match scores:", scores)
+    if DEBUG:
+        print("[DEBUG] Keyword match scores:", scores)
 
     if all(v == 0 for v in scores.values()):
         return "unknown"
 
     return max(scores.items(), key=lambda x: x[1])[0]
 
-def get_pitch_type(date, venue):
+
+def _date_str(date):
     if isinstance(date, datetime.date):
-        date_str = date.strftime("%Y-%m-%d")
-    else:
-        date_str = str(date)
-
-    print("[INFO] Attempting direct ESPN fallback scraping...")
-    article_urls = fallback_espn_search(venue)
-    for url in article_urls:
-        text = fetch_pitch_text(url)
-        pitch_type = classify_pitch_type(text)
-        if pitch_type != "unknown":
-            return pitch_type
-
-    return "unknown"
-
-# Example usage:
-pitch_type = get_pitch_type("2022-10-23", "Melbourne Cricket Ground")
-print("Predicted pitch type:", pitch_type)
+        return date.strftime("%Y-%m-%d")
+    return str(date)
+
+
+class PitchCache:
+    """JSON file of (venue, date) -> {pitch_type, fetched_at}."""
+
+    def __init__(self, path=PITCH_CACHE_PATH, ttl=PITCH_CACHE_TTL, unknown_ttl=UNKNOWN_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.unknown_ttl = unknown_ttl
+        self.entries = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except ValueError:
+                self.entries = {}
+
+    @staticmethod
+    def key(venue, date):
+        return f"{venue}|{_date_str(date)}"
+
+    def get(self, venue, date):
+        entry = self.entries.get(self.key(venue, date))
+        if entry is None:
+            return None
+        ttl = self.unknown_ttl if entry["pitch_type"] == "unknown" else self.ttl
+        return entry["pitch_type"] if time.time() - entry["fetched_at"] < ttl else None
+
+    def put(self, venue, date, pitch_type):
+        self.entries[self.key(venue, date)] = {"pitch_type": pitch_type, "fetched_at": time.time()}
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self.entries))
+        os.replace(tmp_path, self.path)
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least `interval` seconds apart."""
+
+    def __init__(self, interval=PER_HOST_INTERVAL):
+        self.interval = interval
+        self.locks = {}
+        self.last = {}
+
+    async def wait(self, url):
+        host = urlparse(url).netloc
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            delay = self.last.get(host, 0) + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.last[host] = time.monotonic()
+
+
+class PitchFetcher:
+    """Concurrent, rate-limited, de-duplicated page fetches for one batch."""
+
+    def __init__(self, concurrency=FETCH_CONCURRENCY, per_host_interval=PER_HOST_INTERVAL):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = HostRateLimiter(per_host_interval)
+        self.session = requests.Session()
+        self.pages = {}  # url -> task, so each URL is fetched once per batch
+
+    def get(self, url):
+        if url not in self.pages:
+            self.pages[url] = asyncio.ensure_future(self._fetch(url))
+        return self.pages[url]
+
+    async def _fetch(self, url):
+        async with self.semaphore:
+            await self.limiter.wait(url)
+            return await asyncio.to_thread(_get, url, self.session)
+
+    async def pitch_type(self, venue):
+        """Pitch type for the venue, or None when a fetch failed before one
+        was found, so the miss is not cached as "unknown"."""
+        html = await self.get(_search_url(venue))
+        if html is None:
+            return None
+        pages = await asyncio.gather(*(self.get(url) for url in _article_links(html)))
+        # Same precedence as before: the first article that classifies wins
+        for html in pages:
+            pitch_type = classify_pitch_type(_page_text(html) if html is not None else "")
+            if pitch_type != "unknown":
+                return pitch_type
+        return None if None in pages else "unknown"
+
+    def close(self):
+        self.session.close()
+
+
+async def lookup_pitch_types(fixtures, cache=None, concurrency=FETCH_CONCURRENCY, per_host_interval=PER_HOST_INTERVAL):
+    """Pitch type for every (venue, date) in fixtures, keyed by (venue, 'YYYY-MM-DD').
+
+    Venues whose pages could not be fetched come back "unknown" for this call
+    only; they are left out of the cache and retried next time."""
+    cache = cache if cache is not None else PitchCache()
+    fixtures = list(dict.fromkeys((venue, _date_str(date)) for venue, date in fixtures))
+    results = {}
+    missing = []
+    for venue, date in fixtures:
+        cached = cache.get(venue, date)
+        if cached is not None:
+            results[(venue, _date_str(date))] = cached
+        else:
+            missing.append((venue, date))
+
+    if missing:
+        fetcher = PitchFetcher(concurrency, per_host_interval)
+        try:
+            # The search is per venue, so each venue is resolved once per batch
+            venues = sorted({venue for venue, _ in missing})
+            by_venue = dict(zip(venues, await asyncio.gather(*(fetcher.pitch_type(v) for v in venues))))
+        finally:
+            fetcher.close()
+        for venue, date in missing:
+            if by_venue[venue] is not None:
+                cache.put(venue, date, by_venue[venue])
+            results[(venue, _date_str(date))] = by_venue[venue] or "unknown"
+        cache.save()
+    return results
+
+
+def get_pitch_types(fixtures, cache=None, concurrency=FETCH_CONCURRENCY, per_host_interval=PER_HOST_INTERVAL):
+    """Blocking lookup_pitch_types for scripts; from async code, await
+    lookup_pitch_types instead (this starts its own event loop)."""
+    return asyncio.run(lookup_pitch_types(fixtures, cache, concurrency, per_host_interval))
+
+
+def get_season_pitch_types(matches, season=None, **kwargs):
+    """Pitch types for a feature/metadata DataFrame (venue and date columns),
+    optionally limited to one season (year prefix of date), as a Series aligned
+    to its index so it can be added as a column."""
+    if season is not None:
+        matches = matches[matches["date"].astype(str).str.startswith(str(season))]
+    fixtures = list(zip(matches["venue"], matches["date"].astype(str)))
+    results = get_pitch_types(fixtures, **kwargs) if fixtures else {}
+    return pd.Series([results[fixture] for fixture in fixtures], index=matches.index, dtype=object)
+
+
+def get_pitch_type(date, venue, cache=None):
+    return get_pitch_types([(venue, date)], cache=cache)[(venue, _date_str(date))]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pitch type from ESPNcricinfo pitch reports")
+    parser.add_argument("--venue", default="Melbourne Cricket Ground")
+    parser.add_argument("--date", default="2022-10-23")
+    args = parser.parse_args()
+
+    # Example usage:
+    pitch_type = get_pitch_type(args.date, args.venue)
+    print("Predicted pitch type:", pitch_type)
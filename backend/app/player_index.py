@@ -0,0 +1,171 @@
+import os
+import json
+import time
+import numpy as np
+
+# Published by feature_store.py next to the serving snapshot; the API maps it read-only
+PLAYER_INDEX_SUBDIR = "player_index"
+PLAYER_INDEX_FORMAT = 2
+MANIFEST_FILE = "manifest.json"
+
+# One float64 array per column, indexed by player id; sums and counts are over
+# the tracker's form window. form is the cached player_tracker form score the
+# model's teamX_form_score columns sum, match_form its match-based counterpart
+STAT_COLUMNS = ["batting_runs", "innings", "balls_faced", "bowling_wickets", "bowled_matches", "balls_bowled",
+                "player_of_match", "form", "match_form"]
+
+MAX_LINEUP_SIZE = 11
+
+
+def index_arrays(engine):
+    """Flatten a PlayerFormEngine into (names, {column: array}), ids in
+    registry order."""
+    w = engine.form_window
+    n = len(engine.registry)
+    names = np.array(engine.registry.names, dtype=str)
+    columns = {col: np.zeros(n, dtype=np.float64) for col in STAT_COLUMNS}
+    for pid in range(n):
+        bat, bowl = engine.batting_runs[pid], engine.bowling_wickets[pid]
+        columns["batting_runs"][pid] = bat.sum(w)
+        columns["innings"][pid] = bat.window_count(w)
+        columns["balls_faced"][pid] = engine.balls_faced[pid].sum(w)
+        columns["bowling_wickets"][pid] = bowl.sum(w)
+        columns["bowled_matches"][pid] = bowl.window_count(w)
+        columns["balls_bowled"][pid] = engine.balls_bowled[pid].sum(w)
+        columns["player_of_match"][pid] = engine.player_of_match[pid]
+    columns["form"][:] = engine.form[:n]
+    columns["match_form"][:] = engine.match_form[:n]
+    return names, columns
+
+
+def _save_npy(path, array):
+    tmp_path = f"{path}.tmp.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def write_index(engine, out_dir, version):
+    """Write the index for the engine's current state. Each array is replaced
+    atomically and the manifest goes last, carrying the version readers
+    check against the snapshot that points at it."""
+    os.makedirs(out_dir, exist_ok=True)
+    names, columns = index_arrays(engine)
+    _save_npy(os.path.join(out_dir, "players.npy"), names)
+    for col, array in columns.items():
+        _save_npy(os.path.join(out_dir, f"{col}.npy"), array)
+
+    manifest = {"format": PLAYER_INDEX_FORMAT, "version": version, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "players": len(names), "window": engine.form_window, "columns": STAT_COLUMNS}
+    tmp_path = os.path.join(out_dir, f"{MANIFEST_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(manifest, indent=2))
+    os.replace(tmp_path, os.path.join(out_dir, MANIFEST_FILE))
+    return manifest
+
+
+class PlayerIndex:
+    """Player stats memory-mapped from a published index.
+
+    Names are interned once at load; after that a batch of lineups is one
+    dict pass to ids and one gather per stat column, so workers share the
+    arrays' pages and thousands of lineups cost a few array ops.
+    """
+
+    def __init__(self, players, columns, version="unknown", window=None):
+        self.players = players
+        self.columns = columns
+        self.version = version
+        self.window = window
+        self.ids = {name: i for i, name in enumerate(players.tolist())}
+
+    @classmethod
+    def load(cls, index_dir, mmap_mode="r"):
+        with open(os.path.join(index_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != PLAYER_INDEX_FORMAT:
+            raise ValueError(f"Unsupported player index format {manifest.get('format')}")
+        players = np.load(os.path.join(index_dir, "players.npy"), mmap_mode=mmap_mode)
+        columns = {col: np.load(os.path.join(index_dir, f"{col}.npy"), mmap_mode=mmap_mode)
+                   for col in manifest["columns"]}
+        if any(len(array) != manifest["players"] for array in [players, *columns.values()]):
+            raise ValueError(f"Player index in {index_dir} does not match its manifest")
+        return cls(players, columns, manifest["version"], manifest["window"])
+
+    def __len__(self):
+        return len(self.players)
+
+    def lookup(self, lineups):
+        """(n_lineups, longest lineup) array of player ids; -1 for unknown
+        players and for the padding after shorter lineups."""
+        width = max((len(players) for players in lineups), default=0)
+        ids = np.full((len(lineups), width), -1, dtype=np.intp)
+        get = self.ids.get
+        for i, players in enumerate(lineups):
+            ids[i, :len(players)] = [get(p, -1) for p in players]
+        return ids
+
+    def gather(self, ids, column):
+        """Values of one stat column for an array of ids, 0 where the id is -1."""
+        return np.where(ids >= 0, self.columns[column][ids], 0.0)
+
+    def team_form_scores(self, lineups):
+        """Sum of player form for each lineup, as get_team_form_scores gives
+        for the state the index was written from."""
+        return self.gather(self.lookup(lineups), "form").sum(axis=1)
+
+    def unknown_players(self, players):
+        return [p for p in players if p not in self.ids]
+
+
+def load_published(store_dir):
+    """The index feature_store.py publishes inside a feature store directory."""
+    return PlayerIndex.load(os.path.join(store_dir, PLAYER_INDEX_SUBDIR))
+
+
+def verify(data_dir, samples=2000, seed=0):
+    """Build the index from a replay and check lineup form scores against
+    player_tracker for random lineups of known and unknown players."""
+    import shutil
+    import tempfile
+    from feature_eng import feature_engineering
+    from feature_store import _stream
+    from ingest import index_matches, is_t20
+    from player_tracker import engine, reset_trackers, get_team_form_scores
+
+    fnames = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))
+    reset_trackers()
+    feature_engineering(_stream(data_dir, index_matches(data_dir, fnames, match_filter=is_t20)))
+
+    out_dir = tempfile.mkdtemp(prefix="player_index_check_")
+    try:
+        write_index(engine, out_dir, "check")
+        index = PlayerIndex.load(out_dir)
+        rng = np.random.default_rng(seed)
+        names = list(engine.registry.names) + [f"Unknown {i}" for i in range(20)]
+        lineups = [[names[j] for j in rng.choice(len(names), rng.integers(1, MAX_LINEUP_SIZE + 1), replace=False)]
+                   for _ in range(samples)]
+
+        start = time.perf_counter()
+        scores = index.team_form_scores(lineups)
+        seconds = time.perf_counter() - start
+        expected = get_team_form_scores(lineups)
+        mismatches = int((~np.isclose(scores, expected, rtol=1e-12, atol=1e-9)).sum())
+        print(f"Checked {len(lineups)} lineups over {len(index)} players, {mismatches} mismatches; "
+              f"{len(lineups) / seconds:,.0f} lineups/s")
+        return mismatches == 0
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+    from feature_eng import T20_DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Memory-mapped player index for lineup pricing")
+    parser.add_argument("command", choices=["verify"])
+    parser.add_argument("--data-dir", default=T20_DATA_DIR)
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    if not verify(args.data_dir, args.samples):
+        raise SystemExit(1)
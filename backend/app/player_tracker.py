@@ -1,55 +1,202 @@
-from collections import defaultdict
+import numpy as np
+from deliveries import PlayerRegistry, DeliveryTable
+from rolling import RollingStats
 
-# Match-specific contributions
-player_batting_scores = defaultdict(list)  # player -> [scores]
-player_bowling_wickets = defaultdict(list)  # player -> [wickets]
+# Windows kept per player, in matches; get_batting_avg/get_bowling_avg take one of these
+PLAYER_WINDOWS = (5,)
 
-player_of_match_count = defaultdict(int)
+# Window the cached form scores are computed over
+FORM_WINDOW = 5
+
+# The model's teamX_form_score columns use the original definition, averaging a
+# player's last DELIVERY_FORM_WINDOW deliveries rather than their last matches
+DELIVERY_FORM_WINDOW = 5
+
+
+class PlayerFormEngine:
+    """Per-player, per-match aggregates with cached form scores.
+
+    Each match a player bats in pushes (runs, balls faced) into their rolling
+    windows, and each match they bowl in pushes (wickets, balls bowled).
+    match_form is built from those windows. form keeps the definition the
+    shipped model was trained on: mean batter runs over the player's last
+    DELIVERY_FORM_WINDOW deliveries faced, plus mean wickets over their last
+    DELIVERY_FORM_WINDOW deliveries bowled, plus 0.1 per award. Both are only
+    recomputed for players who appeared, so scoring an XI is a gather over a
+    cached array.
+    """
+
+    def __init__(self, windows=PLAYER_WINDOWS, form_window=FORM_WINDOW):
+        self.windows = tuple(windows)
+        self.form_window = form_window
+        self.reset()
+
+    def reset(self):
+        self.registry = PlayerRegistry()
+        self.batting_runs = []
+        self.balls_faced = []
+        self.bowling_wickets = []
+        self.balls_bowled = []
+        self.player_of_match = []
+        self.delivery_runs = []
+        self.delivery_wickets = []
+        # Kept longer than the registry so index -1 is always an unused zero,
+        # which is what unknown players score
+        self.form = np.zeros(64)
+        self.match_form = np.zeros(64)
+
+    def _player_id(self, name):
+        pid = self.registry.intern(name)
+        if pid == len(self.batting_runs):
+            for tracker in (self.batting_runs, self.balls_faced, self.bowling_wickets, self.balls_bowled):
+                tracker.append(RollingStats(self.windows))
+            for tracker in (self.delivery_runs, self.delivery_wickets):
+                tracker.append(RollingStats((DELIVERY_FORM_WINDOW,)))
+            self.player_of_match.append(0)
+            if pid + 1 >= len(self.form):
+                self.form = np.concatenate([self.form, np.zeros(len(self.form))])
+                self.match_form = np.concatenate([self.match_form, np.zeros(len(self.match_form))])
+        return pid
+
+    def _refresh(self, pid):
+        pom_boost = self.player_of_match[pid] * 0.1  # Scaled
+        self.form[pid] = (self.delivery_runs[pid].mean(DELIVERY_FORM_WINDOW)
+                          + self.delivery_wickets[pid].mean(DELIVERY_FORM_WINDOW) + pom_boost)
+        self.match_form[pid] = (self.batting_runs[pid].mean(self.form_window)
+                                + self.bowling_wickets[pid].mean(self.form_window) + pom_boost)
+
+    def update_match(self, table, player_of_match=()):
+        pids = [self._player_id(name) for name in table.players.tolist()]
+        touched = set()
+
+        runs, faced = table.runs_by_batter(), table.balls_faced()
+        for local in np.flatnonzero(faced).tolist():
+            pid = pids[local]
+            self.batting_runs[pid].push(int(runs[local]))
+            self.balls_faced[pid].push(int(faced[local]))
+            touched.add(pid)
+
+        wickets, bowled = table.wickets_by_bowler(), table.balls_bowled()
+        for local in np.flatnonzero(bowled).tolist():
+            pid = pids[local]
+            self.bowling_wickets[pid].push(int(wickets[local]))
+            self.balls_bowled[pid].push(int(bowled[local]))
+            touched.add(pid)
+
+        # Delivery windows only keep their last few values, which extend() takes directly
+        for ids, values, trackers in ((table.batter, table.batter_runs, self.delivery_runs),
+                                      (table.bowler, table.wicket, self.delivery_wickets)):
+            for local, seq in table.group_by(ids, values):
+                if local >= 0:
+                    trackers[pids[local]].extend(seq.tolist())
+
+        for name in player_of_match:
+            pid = self._player_id(name)
+            self.player_of_match[pid] += 1
+            touched.add(pid)
+
+        for pid in touched:
+            self._refresh(pid)
+
+    def lookup(self, players):
+        ids = self.registry.ids
+        return [ids.get(p, -1) for p in players]
+
+    def batting_avg(self, player, recent_n):
+        pid = self.registry.ids.get(player)
+        return self.batting_runs[pid].mean(recent_n) if pid is not None else 0
+
+    def bowling_avg(self, player, recent_n):
+        pid = self.registry.ids.get(player)
+        return self.bowling_wickets[pid].mean(recent_n) if pid is not None else 0
+
+    def form_score(self, player):
+        return float(self.form[self.registry.ids.get(player, -1)])
+
+    def match_form_score(self, player):
+        return float(self.match_form[self.registry.ids.get(player, -1)])
+
+    def team_form_scores(self, lineups, form=None):
+        """Sum of cached form (or match_form, passed as form) for each
+        lineup, gathered in one go."""
+        if not lineups:
+            return np.empty(0)
+        form = self.form if form is None else form
+        ids = [pid for players in lineups for pid in self.lookup(players)]
+        offsets = np.cumsum([0] + [len(players) for players in lineups[:-1]])
+        gathered = np.append(form[ids], 0.0)  # trailing zero keeps empty lineups in range
+        sizes = np.array([len(players) for players in lineups])
+        return np.where(sizes > 0, np.add.reduceat(gathered, offsets), 0.0)
+
+    def export_state(self):
+        return {
+            "windows": list(self.windows),
+            "form_window": self.form_window,
+            "players": list(self.registry.names),
+            "batting_runs": [r.to_dict() for r in self.batting_runs],
+            "balls_faced": [r.to_dict() for r in self.balls_faced],
+            "bowling_wickets": [r.to_dict() for r in self.bowling_wickets],
+            "balls_bowled": [r.to_dict() for r in self.balls_bowled],
+            "delivery_runs": [r.to_dict() for r in self.delivery_runs],
+            "delivery_wickets": [r.to_dict() for r in self.delivery_wickets],
+            "player_of_match": list(self.player_of_match),
+        }
+
+    def import_state(self, state):
+        self.windows = tuple(state["windows"])
+        self.form_window = state["form_window"]
+        self.reset()
+        for name in state["players"]:
+            self._player_id(name)
+        for key in ("batting_runs", "balls_faced", "bowling_wickets", "balls_bowled", "delivery_runs", "delivery_wickets"):
+            setattr(self, key, [RollingStats.from_dict(r) for r in state[key]])
+        self.player_of_match = list(state["player_of_match"])
+        for pid in range(len(self.registry)):
+            self._refresh(pid)
+
+
+# Module-level engine behind the functional API used by the feature pipeline
+engine = PlayerFormEngine()
 
 def update_player_stats(match):
-    from collections import Counter
-
-    for inning in match.get("innings", []):
-        team = inning.get("team")
-        for over in inning.get("overs", []):
-            for delivery in over.get("deliveries", []):
-                batter = delivery.get("batter")
-                bowler = delivery.get("bowler")
-                runs = delivery.get("runs", {}).get("batter", 0)
-                wicket = delivery.get("wickets", [])
-
-                if batter:
-                    player_batting_scores[batter].append(runs)
-
-                if wicket:
-                    # Count dismissal against bowler
-                    player_bowling_wickets[bowler].append(1)
-                else:
-                    player_bowling_wickets[bowler].append(0)
-
-    # Track PoM stats
-    for pom in match.get("info", {}).get("player_of_match", []):
-        player_of_match_count[pom] += 1
+    """Fold one match into the form trackers. Takes an ingest record, whose
+    deliveries are already a DeliveryTable, or a raw Cricsheet match."""
+    table = match.get("deliveries")
+    if table is None:
+        table = DeliveryTable.from_match(match)
+    engine.update_match(table, match.get("info", {}).get("player_of_match", []))
 
 def get_batting_avg(player, recent_n=5):
-    scores = player_batting_scores.get(player, [])[-recent_n:]
-    return sum(scores) / len(scores) if scores else 0
+    """Average runs per innings over the player's last recent_n innings."""
+    return engine.batting_avg(player, recent_n)
 
 def get_bowling_avg(player, recent_n=5):
-    wickets = player_bowling_wickets.get(player, [])[-recent_n:]
-    return sum(wickets) / len(wickets) if wickets else 0
+    """Average wickets per match over the last recent_n matches they bowled in."""
+    return engine.bowling_avg(player, recent_n)
 
 def get_form_score(player):
     """Composite form score: avg_runs + wickets + PoM frequency"""
-    bat = get_batting_avg(player)
-    bowl = get_bowling_avg(player)
-    pom_boost = player_of_match_count.get(player, 0) * 0.1  # Scaled
-    return bat + bowl + pom_boost
+    return engine.form_score(player)
+
+def get_match_form_score(player):
+    """Form score over the player's last matches rather than last deliveries."""
+    return engine.match_form_score(player)
 
 def get_team_form_score(players):
-    return sum(get_form_score(p) for p in players)
+    return float(engine.team_form_scores([players])[0])
+
+def get_team_form_scores(lineups):
+    """Bulk path: form scores for several lineups (e.g. both XIs) in one call."""
+    return engine.team_form_scores(lineups)
+
+def get_team_match_form_scores(lineups):
+    return engine.team_form_scores(lineups, engine.match_form)
 
 def reset_trackers():
-    player_batting_scores.clear()
-    player_bowling_wickets.clear()
-    player_of_match_count.clear()
+    engine.reset()
+
+def export_state():
+    return engine.export_state()
+
+def import_state(state):
+    engine.import_state(state)
@@ -0,0 +1,239 @@
+import os
+import gzip
+import json
+import bisect
+import datetime
+import pandas as pd
+import player_tracker
+from feature_eng import FeatureState, T20_DATA_DIR
+from ingest import index_matches, load_record, match_sort_key, is_t20
+from player_tracker import reset_trackers
+
+# Snapshots of the full tracker state, one per interval of match dates
+PIT_STORE_DIR = "pit_snapshots"
+SNAPSHOT_INTERVAL_DAYS = 90
+INDEX_FILE = "index.json"
+
+
+def _date_str(date):
+    if isinstance(date, (datetime.date, datetime.datetime)):
+        return date.strftime("%Y-%m-%d")
+    return str(date)
+
+
+def _add_days(date, days):
+    try:
+        return (datetime.date.fromisoformat(date) + datetime.timedelta(days=days)).isoformat()
+    except ValueError:
+        return "~"  # undated matches sort last; no boundary after them
+
+
+class PointInTimeFeatures:
+    """Features for any fixture as of any date, without replaying the archive.
+
+    build() replays every T20 match in (date, file name) order and writes the
+    complete tracker state (team, h2h, venue, toss and player form) every
+    interval_days of match dates. State "as of D" is every match dated
+    strictly before D: the nearest snapshot at or before that point is
+    loaded and only the matches in between are replayed. Queries moving
+    forward in time carry on from the last state instead of reloading.
+
+    Form scores use player stats from before D. The builder's rows include
+    the match's own player stats in its form columns, so for archived
+    fixtures those two columns differ from the CSV by design.
+
+    Player form lives in the player_tracker globals, so one state is live at
+    a time; anything else that resets the trackers forces a snapshot reload.
+    """
+
+    def __init__(self, data_dir=T20_DATA_DIR, store_dir=PIT_STORE_DIR, interval_days=SNAPSHOT_INTERVAL_DAYS):
+        self.data_dir = data_dir
+        self.store_dir = store_dir
+        self.interval_days = interval_days
+        self.entries = []    # (fname, info) in replay order
+        self.dates = []      # match date of each entry
+        self.snapshots = []  # positions (entries already applied) with a saved state
+        self.state = None
+        self.position = 0
+        self._registry = None
+
+    def _snapshot_path(self, position):
+        return os.path.join(self.store_dir, f"snapshot-{position:07d}.json.gz")
+
+    def _save_snapshot(self, position, state):
+        tmp_path = f"{self._snapshot_path(position)}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps(state.to_dict()))
+        os.replace(tmp_path, self._snapshot_path(position))
+        self.snapshots.append(position)
+
+    def _json_files(self):
+        return sorted(f for f in os.listdir(self.data_dir) if f.endswith(".json"))
+
+    def build(self):
+        fnames = self._json_files()
+        self.entries = index_matches(self.data_dir, fnames, match_filter=is_t20)
+        self.dates = [match_sort_key(fname, info)[0] for fname, info in self.entries]
+        self.snapshots = []
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        for name in os.listdir(self.store_dir):
+            if name.startswith("snapshot-"):
+                os.remove(os.path.join(self.store_dir, name))
+
+        state = FeatureState()
+        reset_trackers()
+        boundary = None
+        for position, (fname, info) in enumerate(self.entries):
+            if boundary is None or self.dates[position] >= boundary:
+                # Every match before this one is dated before it, so this is
+                # the state as of this match's date
+                self._save_snapshot(position, state)
+                boundary = _add_days(self.dates[position], self.interval_days)
+            state.apply_match(load_record(self.data_dir, fname, info))
+        self._save_snapshot(len(self.entries), state)
+
+        index = {"interval_days": self.interval_days, "files": fnames, "entries": [fname for fname, _ in self.entries],
+                 "dates": self.dates, "snapshots": self.snapshots}
+        tmp_path = os.path.join(self.store_dir, f"{INDEX_FILE}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(index))
+        os.replace(tmp_path, os.path.join(self.store_dir, INDEX_FILE))
+
+        self._adopt(state, len(self.entries))
+        print(f"Point-in-time store: {len(self.snapshots)} snapshots over {len(self.entries)} matches")
+        return self
+
+    def load(self):
+        """Use existing snapshots if they cover the current archive, else build."""
+        path = os.path.join(self.store_dir, INDEX_FILE)
+        if not os.path.exists(path):
+            return self.build()
+        with open(path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        fnames = self._json_files()
+        if index["files"] != fnames or index["interval_days"] != self.interval_days:
+            print("Point-in-time snapshots are stale, rebuilding")
+            return self.build()
+
+        infos = dict(index_matches(self.data_dir, fnames, match_filter=is_t20))
+        self.entries = [(fname, infos[fname]) for fname in index["entries"]]
+        self.dates = index["dates"]
+        self.snapshots = index["snapshots"]
+        self.state = None
+        return self
+
+    def _adopt(self, state, position):
+        self.state = state
+        self.position = position
+        self._registry = player_tracker.engine.registry
+
+    def state_at(self, position):
+        """FeatureState with exactly the first `position` matches applied."""
+        live = self.state is not None and self._registry is player_tracker.engine.registry
+        nearest = self.snapshots[bisect.bisect_right(self.snapshots, position) - 1]
+        if not (live and nearest <= self.position <= position):
+            with gzip.open(self._snapshot_path(nearest), "rt", encoding="utf-8") as f:
+                self._adopt(FeatureState.from_dict(json.load(f)), nearest)
+
+        for fname, info in self.entries[self.position:position]:
+            self.state.apply_match(load_record(self.data_dir, fname, info))
+        self.position = position
+        return self.state
+
+    def state_as_of(self, date):
+        return self.state_at(bisect.bisect_left(self.dates, _date_str(date)))
+
+    def features_as_of(self, teamA, teamB, venue, date, toss_winner=None, toss_decision=None,
+                       teamA_players=None, teamB_players=None):
+        """Feature values for teamA vs teamB at venue using only matches dated
+        before date. Lineups default to each team's latest XI as of then."""
+        state = self.state_as_of(date)
+        return state.fixture_features(teamA, teamB, venue, toss_winner or "Unknown", toss_decision or "Unknown",
+                                      teamA_players, teamB_players)
+
+    def features_for_fixtures(self, fixtures):
+        """features_as_of for many fixtures (dicts with teamA, teamB, venue,
+        date and optionally toss_winner, toss_decision, teamA_players,
+        teamB_players). They are answered in date order, so the whole batch
+        replays each archived match at most once. Returns a DataFrame in input
+        order."""
+        fixtures = list(fixtures)
+        order = sorted(range(len(fixtures)), key=lambda i: _date_str(fixtures[i]["date"]))
+        rows = [None] * len(fixtures)
+        for i in order:
+            fx = fixtures[i]
+            rows[i] = self.features_as_of(fx["teamA"], fx["teamB"], fx["venue"], fx["date"],
+                                          fx.get("toss_winner"), fx.get("toss_decision"),
+                                          fx.get("teamA_players"), fx.get("teamB_players"))
+        return pd.DataFrame(rows, columns=list(rows[0]) if rows else None)
+
+
+def verify(data_dir, samples=40, interval_days=30, seed=0):
+    """Compare as-of features against a from-scratch replay up to each date."""
+    import random
+    import shutil
+    import tempfile
+    import time
+
+    store_dir = tempfile.mkdtemp(prefix="pit_check_")
+    try:
+        pit = PointInTimeFeatures(data_dir, store_dir, interval_days).build()
+        rng = random.Random(seed)
+        fixtures = []
+        for fname, info in rng.sample(pit.entries, min(samples, len(pit.entries))):
+            players = info.get("players", {})
+            A, B = info["teams"]
+            fixtures.append({"teamA": A, "teamB": B, "venue": info.get("venue", "Unknown"),
+                             "date": info["dates"][0], "toss_winner": info["toss"]["winner"],
+                             "toss_decision": info["toss"]["decision"],
+                             "teamA_players": players.get(A, []), "teamB_players": players.get(B, [])})
+
+        start = time.perf_counter()
+        as_of = pit.features_for_fixtures(fixtures)
+        pit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        mismatches = 0
+        for i, fx in enumerate(fixtures):
+            state = FeatureState()
+            reset_trackers()
+            for fname, info in pit.entries[:bisect.bisect_left(pit.dates, fx["date"])]:
+                state.apply_match(load_record(data_dir, fname, info))
+            expected = state.fixture_features(fx["teamA"], fx["teamB"], fx["venue"], fx["toss_winner"],
+                                              fx["toss_decision"], fx["teamA_players"], fx["teamB_players"])
+            if expected != as_of.iloc[i].to_dict():
+                mismatches += 1
+                print(f"[ERROR] Mismatch for {fx['teamA']} vs {fx['teamB']} on {fx['date']}")
+        replay_seconds = time.perf_counter() - start
+
+        print(f"Checked {len(fixtures)} fixtures, {mismatches} mismatches; as-of {pit_seconds:.2f}s "
+              f"vs full replay {replay_seconds:.2f}s")
+        return mismatches == 0
+    finally:
+        shutil.rmtree(store_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Point-in-time feature snapshots and as-of queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("build", "query", "verify"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("--data-dir", default=T20_DATA_DIR)
+        cmd.add_argument("--store-dir", default=PIT_STORE_DIR)
+        cmd.add_argument("--interval-days", type=int, default=SNAPSHOT_INTERVAL_DAYS)
+    query = sub.choices["query"]
+    for arg in ("teamA", "teamB", "venue", "date"):
+        query.add_argument(arg)
+    sub.choices["verify"].add_argument("--samples", type=int, default=40)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        PointInTimeFeatures(args.data_dir, args.store_dir, args.interval_days).build()
+    elif args.command == "query":
+        pit = PointInTimeFeatures(args.data_dir, args.store_dir, args.interval_days).load()
+        print(json.dumps(pit.features_as_of(args.teamA, args.teamB, args.venue, args.date), indent=2))
+    elif not verify(args.data_dir, args.samples, args.interval_days):
+        raise SystemExit(1)
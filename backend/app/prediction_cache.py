@@ -0,0 +1,199 @@
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+# Configured from the environment by make_cache(): "memory", "sqlite:<path>" or "off"
+DEFAULT_BACKEND = "memory"
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 3600.0
+
+# MatchInput fields, in the order they make up a cache key
+KEY_FIELDS = ("teamA", "teamB", "venue", "toss_winner", "toss_decision", "competition")
+
+
+def normalize_input(values):
+    """Strip surrounding whitespace, the only difference between requests
+    that should not change the prediction."""
+    return {field: values[field].strip() for field in KEY_FIELDS}
+
+
+def cache_key(values, model_version, snapshot_version):
+    # Live features are part of the prediction, so the snapshot version is
+    # part of the key as well as the model version
+    return "\x1f".join([model_version, snapshot_version] + [values[field] for field in KEY_FIELDS])
+
+
+class _Counters:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def as_dict(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+            "expirations": self.expirations, "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class MemoryCache:
+    """Per-process LRU of key -> (win probability, stored at) with a TTL."""
+
+    backend = "memory"
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.counters = _Counters()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] >= self.ttl:
+                del self.entries[key]
+                self.counters.expirations += 1
+                entry = None
+            if entry is None:
+                self.counters.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.counters.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self.entries[key] = (value, time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.counters.evictions += 1
+
+    def invalidate(self, model_version=None):
+        with self._lock:
+            self.entries.clear()
+            self.counters.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters.as_dict(), backend=self.backend, entries=len(self.entries),
+                        max_entries=self.max_entries, ttl_seconds=self.ttl)
+
+
+class SqliteCache:
+    """Cache in a local SQLite file, so every worker on the host shares hits.
+
+    Counters are this process's own; entries and evictions are shared. LRU
+    trimming runs every TRIM_EVERY inserts rather than on each one.
+    """
+
+    backend = "sqlite"
+    TRIM_EVERY = 64
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.counters = _Counters()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        with self._connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS predictions ("
+                       "key TEXT PRIMARY KEY, model_version TEXT, value REAL, stored_at REAL, used_at REAL)")
+            db.execute("CREATE INDEX IF NOT EXISTS predictions_used_at ON predictions (used_at)")
+
+    def _connection(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _count(self, name, n=1):
+        with self._lock:
+            setattr(self.counters, name, getattr(self.counters, name) + n)
+
+    def get(self, key):
+        db = self._connection()
+        row = db.execute("SELECT value, stored_at FROM predictions WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and now - row[1] >= self.ttl:
+            db.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            self._count("expirations")
+            row = None
+        if row is None:
+            self._count("misses")
+            return None
+        db.execute("UPDATE predictions SET used_at = ? WHERE key = ?", (now, key))
+        self._count("hits")
+        return row[0]
+
+    def put(self, key, value):
+        db = self._connection()
+        now = time.time()
+        db.execute("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                   (key, key.split("\x1f", 1)[0], value, now, now))
+        with self._lock:
+            self._inserts += 1
+            trim = self._inserts % self.TRIM_EVERY == 0
+        if trim:
+            cur = db.execute("DELETE FROM predictions WHERE key IN (SELECT key FROM predictions "
+                             "ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self._count("evictions", max(cur.rowcount, 0))
+
+    def invalidate(self, model_version=None):
+        # Other workers may still be on the old model for a moment; only
+        # entries from other versions go
+        db = self._connection()
+        if model_version is None:
+            db.execute("DELETE FROM predictions")
+        else:
+            db.execute("DELETE FROM predictions WHERE model_version != ?", (model_version,))
+        self._count("invalidations")
+
+    def stats(self):
+        entries = self._connection().execute("SELECT COUNT(*) FROM predictions").fetchone()[0]
+        with self._lock:
+            counters = self.counters.as_dict()
+        return dict(counters, backend=self.backend, path=self.path, entries=entries,
+                    max_entries=self.max_entries, ttl_seconds=self.ttl)
+
+
+class NullCache:
+    backend = "off"
+
+    def get(self, key):
+        return None
+
+    def put(self, key, value):
+        pass
+
+    def invalidate(self, model_version=None):
+        pass
+
+    def stats(self):
+        return {"backend": self.backend}
+
+
+def make_cache(spec=None, max_entries=None, ttl=None):
+    """Build the cache named by spec, defaulting to the CRICPRED_PREDICTION_CACHE*
+    environment variables."""
+    spec = spec or os.environ.get("CRICPRED_PREDICTION_CACHE", DEFAULT_BACKEND)
+    max_entries = max_entries or int(os.environ.get("CRICPRED_PREDICTION_CACHE_SIZE", DEFAULT_MAX_ENTRIES))
+    ttl = ttl or float(os.environ.get("CRICPRED_PREDICTION_CACHE_TTL", DEFAULT_TTL_SECONDS))
+    if spec == "off":
+        return NullCache()
+    if spec == "memory":
+        return MemoryCache(max_entries, ttl)
+    if spec.startswith("sqlite:"):
+        return SqliteCache(spec[len("sqlite:"):], max_entries, ttl)
+    raise ValueError(f"Unknown prediction cache backend {spec!r}")
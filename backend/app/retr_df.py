@@ -1,42 +1,30 @@
-import os
-import json
 import pandas as pd
+from ingest import index_matches, is_t20
 
 def parse_t20_matches(folder):
     match_data = []
 
-    for fname in os.listdir(folder):
-        if fname.endswith(".json"):
-            with open(os.path.join(folder, fname), "r", encoding="utf-8") as f:
-                try:
-                    match = json.load(f)
-                    info = match.get("info", {})
-
-                    if info.get("match_type") != "T20":
-                        continue
-
-                    teams = info.get("teams", ["?", "?"])
-                    winner = info.get("outcome", {}).get("winner", "No Result")
-                    toss = info.get("toss", {})
-                    venue = info.get("venue", "Unknown")
-                    date = info.get("dates", ["?"])[0]
-                    competition = info.get("competition", "Unknown")
-
-                    match_data.append({
-                        "team_1": teams[0],
-                        "team_2": teams[1],
-                        "venue": venue,
-                        "date": date,
-                        "competition": competition,
-                        "toss_winner": toss.get("winner", "Unknown"),
-                        "toss_decision": toss.get("decision", "Unknown"),
-                        "match_winner": winner,
-                        "result_given": "winner" in info.get("outcome", {})
-                    })
-
-                except Exception as e:
-                    print(f"Failed to parse {fname}: {e}")
-                    continue
+    # Metadata only: cached files are never re-parsed, and unreadable files are
+    # reported and skipped by the ingestion layer
+    for fname, info in index_matches(folder, match_filter=is_t20):
+        teams = info.get("teams", ["?", "?"])
+        winner = info.get("outcome", {}).get("winner", "No Result")
+        toss = info.get("toss", {})
+        venue = info.get("venue", "Unknown")
+        date = info.get("dates", ["?"])[0]
+        competition = info.get("competition", "Unknown")
+
+        match_data.append({
+            "team_1": teams[0],
+            "team_2": teams[1],
+            "venue": venue,
+            "date": date,
+            "competition": competition,
+            "toss_winner": toss.get("winner", "Unknown"),
+            "toss_decision": toss.get("decision", "Unknown"),
+            "match_winner": winner,
+            "result_given": "winner" in info.get("outcome", {})
+        })
 
     return pd.DataFrame(match_data)
 
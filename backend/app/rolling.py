@@ -0,0 +1,75 @@
+class RollingStats:
+    """Sum/count/mean over the last N values for several window sizes at once.
+
+    Values sit in a ring buffer sized to the largest window and every window
+    keeps a running sum, so push() and the lookups are O(1) per window and
+    memory stays bounded no matter how long the history gets.
+    """
+
+    __slots__ = ("windows", "capacity", "buffer", "sums", "count")
+
+    def __init__(self, windows=(5,)):
+        self.windows = tuple(sorted(set(windows)))
+        self.capacity = self.windows[-1]
+        self.buffer = [0] * self.capacity
+        self.sums = dict.fromkeys(self.windows, 0)
+        self.count = 0  # values ever pushed
+
+    def __len__(self):
+        return self.count
+
+    def push(self, value):
+        pos = self.count % self.capacity
+        for w in self.windows:
+            if self.count >= w:
+                # Read the value falling out of this window before it is overwritten
+                self.sums[w] -= self.buffer[(pos - w) % self.capacity]
+            self.sums[w] += value
+        self.buffer[pos] = value
+        self.count += 1
+
+    def extend(self, values):
+        values = list(values)
+        if len(values) < self.capacity:
+            for value in values:
+                self.push(value)
+            return
+        # Only the last `capacity` values survive, so rebuild from those directly
+        tail = values[-self.capacity:]
+        self.count += len(values)
+        start = (self.count - self.capacity) % self.capacity
+        for i, value in enumerate(tail):
+            self.buffer[(start + i) % self.capacity] = value
+        for w in self.windows:
+            self.sums[w] = sum(tail[-w:])
+
+    def window_count(self, window):
+        return min(self.count, window)
+
+    def sum(self, window):
+        return self.sums[window]
+
+    def mean(self, window, default=0):
+        n = min(self.count, window)
+        return self.sums[window] / n if n else default
+
+    def values(self):
+        """The retained values, oldest first."""
+        n = min(self.count, self.capacity)
+        start = self.count - n
+        return [self.buffer[(start + i) % self.capacity] for i in range(n)]
+
+    def to_dict(self):
+        return {"windows": list(self.windows), "values": self.values(), "count": self.count}
+
+    @classmethod
+    def from_dict(cls, d):
+        stats = cls(d["windows"])
+        values = d["values"]
+        stats.count = d["count"]
+        start = (stats.count - len(values)) % stats.capacity
+        for i, value in enumerate(values):
+            stats.buffer[(start + i) % stats.capacity] = value
+        for w in stats.windows:
+            stats.sums[w] = sum(values[-w:])
+        return stats
@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import List, Annotated
+from pydantic import BaseModel, Field
 
 class MatchInput(BaseModel):
     teamA: str
@@ -6,4 +7,19 @@ class MatchInput(BaseModel):
     venue: str
     toss_winner: str
     toss_decision: str
-    competition: str
\ No newline at end of file
+    competition: str
+
+# Player names as in Cricsheet; unknown players count as zero form
+Lineup = Annotated[List[str], Field(min_length=1, max_length=11)]
+
+class LineupInput(MatchInput):
+    teamA_players: Lineup
+    teamB_players: Lineup
+
+class LineupPair(BaseModel):
+    teamA_players: Lineup
+    teamB_players: Lineup
+
+class LineupBatchInput(MatchInput):
+    """Candidate XIs for one fixture, priced together (lineup optimization)."""
+    lineups: List[LineupPair] = Field(min_length=1)
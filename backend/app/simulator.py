@@ -0,0 +1,326 @@
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from deliveries import PlayerRegistry
+from ingest import iter_matches, is_t20
+
+# Phase of each over: powerplay (0-5), middle (6-14), death (15+)
+PHASES = ["powerplay", "middle", "death"]
+OVER_PHASE = np.array([0] * 6 + [1] * 9 + [2] * 5)
+
+# Outcome classes of a legal delivery: total runs 0..6 (6 covers anything higher), then a wicket
+OUTCOME_RUNS = np.array([0, 1, 2, 3, 4, 5, 6, 0])
+WICKET = 7
+N_OUTCOMES = len(OUTCOME_RUNS)
+
+# Wides and no-balls are re-bowled; their total runs, penalty included, are
+# binned 0..7 (7 covers anything higher)
+EXTRA_RUNS = np.arange(8)
+
+OVERS = 20
+BALLS_PER_OVER = 6
+BOWLERS_USED = 5
+
+# Pseudo-deliveries of the phase baseline mixed into each player's counts, so
+# players with few balls regress toward the average
+PRIOR_BALLS = 60.0
+
+
+class OutcomeModel:
+    """Per-phase outcome counts of legal deliveries for every batter and
+    bowler, each bowler's wides and no-balls, the runs those cost, and each
+    team's most recent XI."""
+
+    def __init__(self):
+        self.registry = PlayerRegistry()
+        self.bat_counts = np.zeros((0, len(PHASES), N_OUTCOMES))
+        self.bowl_counts = np.zeros((0, len(PHASES), N_OUTCOMES))
+        self.bowl_extras = np.zeros((0, len(PHASES)))
+        self.extra_runs = np.zeros((len(PHASES), len(EXTRA_RUNS)))
+        self.team_players = {}
+
+    def _grow(self):
+        n = len(self.registry)
+        if n > len(self.bat_counts):
+            extra = max(n - len(self.bat_counts), len(self.bat_counts))
+            pad = np.zeros((extra, len(PHASES), N_OUTCOMES))
+            self.bat_counts = np.concatenate([self.bat_counts, pad])
+            self.bowl_counts = np.concatenate([self.bowl_counts, pad])
+            self.bowl_extras = np.concatenate([self.bowl_extras, np.zeros((extra, len(PHASES)))])
+
+    def add_match(self, record):
+        table = record["deliveries"]
+        batter, bowler = table.global_ids(self.registry)
+        self._grow()
+
+        phase = OVER_PHASE[np.minimum(table.over, OVERS - 1)]
+        outcome = np.where(table.wicket > 0, WICKET, np.minimum(table.total_runs, 6))
+        legal, illegal = table.illegal == 0, table.illegal > 0
+        has_batter, has_bowler = legal & (batter >= 0), legal & (bowler >= 0)
+        np.add.at(self.bat_counts, (batter[has_batter], phase[has_batter], outcome[has_batter]), 1)
+        np.add.at(self.bowl_counts, (bowler[has_bowler], phase[has_bowler], outcome[has_bowler]), 1)
+        extra_by = illegal & (bowler >= 0)
+        np.add.at(self.bowl_extras, (bowler[extra_by], phase[extra_by]), 1)
+        np.add.at(self.extra_runs, (phase[illegal], np.minimum(table.total_runs[illegal], EXTRA_RUNS[-1])), 1)
+
+        for team, players in record["info"].get("players", {}).items():
+            self.team_players[team] = list(players)
+
+    @classmethod
+    def build(cls, data_dir):
+        model = cls()
+        for record in iter_matches(data_dir, match_filter=is_t20):
+            model.add_match(record)
+        n = len(model.registry)
+        model.bat_counts = model.bat_counts[:n]
+        model.bowl_counts = model.bowl_counts[:n]
+        model.bowl_extras = model.bowl_extras[:n]
+        return model
+
+    def save(self, path):
+        teams = sorted(self.team_players)
+        n = len(self.registry)
+        np.savez(path, players=np.array(self.registry.names, dtype=str),
+                 bat_counts=self.bat_counts[:n], bowl_counts=self.bowl_counts[:n],
+                 bowl_extras=self.bowl_extras[:n], extra_runs=self.extra_runs,
+                 teams=np.array(teams, dtype=str),
+                 team_players=np.array(["\t".join(self.team_players[t]) for t in teams], dtype=str))
+
+    @classmethod
+    def load(cls, path):
+        model = cls()
+        with np.load(path) as saved:
+            model.registry = PlayerRegistry(saved["players"].tolist())
+            model.bat_counts = saved["bat_counts"]
+            model.bowl_counts = saved["bowl_counts"]
+            # Models built before extras were split out simulate without them
+            if "bowl_extras" in saved.files:
+                model.bowl_extras = saved["bowl_extras"]
+                model.extra_runs = saved["extra_runs"]
+            else:
+                model.bowl_extras = np.zeros(model.bowl_counts.shape[:2])
+            model.team_players = {team: players.split("\t") for team, players in
+                                  zip(saved["teams"].tolist(), saved["team_players"].tolist())}
+        return model
+
+    def phase_baseline(self):
+        counts = self.bat_counts.sum(axis=0) + 1.0  # Laplace smoothing keeps every class possible
+        return counts / counts.sum(axis=1, keepdims=True)
+
+    def _shrunk(self, counts, players, baseline):
+        ids = [self.registry.ids.get(p, -1) for p in players]
+        player_counts = np.array([counts[i] if i >= 0 else np.zeros_like(baseline) for i in ids])
+        mixed = player_counts + PRIOR_BALLS * baseline
+        return mixed / mixed.sum(axis=2, keepdims=True)
+
+    def choose_bowlers(self, players):
+        """The BOWLERS_USED players in the XI with the most balls bowled."""
+        balls = [self.bowl_counts[self.registry.ids[p]].sum() if p in self.registry.ids else 0 for p in players]
+        order = np.argsort(balls, kind="stable")[::-1]
+        return [players[i] for i in order[:BOWLERS_USED]]
+
+    def matchup_cdf(self, batting_xi, bowling_xi):
+        """Cumulative outcome probabilities, shape (batter, over, outcome).
+
+        Batter and bowler distributions are combined per phase as
+        p_bat * p_bowl / p_baseline and renormalised, with the bowlers
+        rotating through the overs."""
+        baseline = self.phase_baseline()
+        bat = self._shrunk(self.bat_counts, batting_xi, baseline)
+        bowlers = self.choose_bowlers(bowling_xi)
+        bowl = self._shrunk(self.bowl_counts, bowlers, baseline)
+
+        over_bowler = np.arange(OVERS) % len(bowlers)
+        probs = bat[:, OVER_PHASE, :] * bowl[over_bowler, OVER_PHASE, :][None] / baseline[OVER_PHASE][None]
+        probs /= probs.sum(axis=2, keepdims=True)
+        cdf = np.cumsum(probs, axis=2)
+        cdf[..., -1] = 1.0  # no draw may fall past the last class through rounding
+        return cdf
+
+    def extras(self, bowling_xi):
+        """(rate, runs cdf) per over: the chance a delivery is a wide or
+        no-ball for the bowler of that over, shrunk toward the phase rate,
+        and the cumulative distribution of what such a delivery costs."""
+        legal = self.bowl_counts.sum(axis=2)
+        phase_rate = self.bowl_extras.sum(axis=0) / np.maximum((legal + self.bowl_extras).sum(axis=0), 1.0)
+        bowlers = self.choose_bowlers(bowling_xi)
+        ids = [self.registry.ids.get(p, -1) for p in bowlers]
+        illegal = np.array([self.bowl_extras[i] if i >= 0 else np.zeros(len(PHASES)) for i in ids])
+        total = illegal + np.array([legal[i] if i >= 0 else np.zeros(len(PHASES)) for i in ids])
+        rate = (illegal + PRIOR_BALLS * phase_rate) / (total + PRIOR_BALLS)
+
+        over_bowler = np.arange(OVERS) % len(bowlers)
+        runs = self.extra_runs + 1e-9  # a phase without extras still needs a valid distribution
+        runs_cdf = np.cumsum(runs / runs.sum(axis=1, keepdims=True), axis=1)
+        runs_cdf[:, -1] = 1.0
+        return rate[over_bowler, OVER_PHASE], runs_cdf[OVER_PHASE]
+
+
+def simulate_innings(cdf, n_sims, rng, target=None, extras=None):
+    """Simulate n_sims innings at once; returns (runs, wickets) arrays.
+
+    The loop runs over the 120 legal balls only: every ball is one
+    vectorised draw across all simulations. With extras (rate, runs cdf per
+    over, from OutcomeModel.extras) each ball is preceded by wides and
+    no-balls, re-bowled until a legal delivery comes; they add runs but
+    take no wickets and leave the strike unchanged. With a target
+    (per-simulation array), an innings stops once it is reached."""
+    n_batters = cdf.shape[0]
+    runs = np.zeros(n_sims, dtype=np.int64)
+    wickets = np.zeros(n_sims, dtype=np.int64)
+    striker = np.zeros(n_sims, dtype=np.int64)
+    non_striker = np.ones(n_sims, dtype=np.int64)
+    alive = np.ones(n_sims, dtype=bool)
+
+    for over in range(OVERS):
+        over_cdf = cdf[:, over, :]
+        for _ in range(BALLS_PER_OVER):
+            if extras is not None:
+                rebowl = alive.copy()
+                while True:
+                    rebowl &= rng.random(n_sims) < extras[0][over]
+                    if not rebowl.any():
+                        break
+                    extra = EXTRA_RUNS[(rng.random(n_sims)[:, None] > extras[1][over]).sum(axis=1)]
+                    runs += np.where(rebowl, extra, 0)
+                    if target is not None:
+                        alive &= runs < target
+                        rebowl &= alive
+
+            u = rng.random(n_sims)
+            outcome = (u[:, None] > over_cdf[striker]).sum(axis=1)
+
+            scored = np.where(alive, OUTCOME_RUNS[outcome], 0)
+            runs += scored
+            out = alive & (outcome == WICKET)
+            wickets += out
+            # Next batter in: openers are 0 and 1, so the k-th wicket brings in k + 1
+            striker = np.where(out, np.minimum(wickets + 1, n_batters - 1), striker)
+
+            swap = alive & (scored % 2 == 1)
+            striker, non_striker = np.where(swap, non_striker, striker), np.where(swap, striker, non_striker)
+
+            alive &= wickets < n_batters - 1
+            if target is not None:
+                alive &= runs < target
+        striker, non_striker = non_striker, striker
+
+    return runs, wickets
+
+
+def _simulate_chunk(args):
+    (cdf_first, extras_first), (cdf_second, extras_second), n_sims, seed = args
+    rng = np.random.default_rng(seed)
+    first_runs, first_wickets = simulate_innings(cdf_first, n_sims, rng, extras=extras_first)
+    second_runs, second_wickets = simulate_innings(cdf_second, n_sims, rng, target=first_runs + 1,
+                                                   extras=extras_second)
+    return first_runs, second_runs
+
+
+def summarize(first_runs, second_runs, first_team, second_team):
+    n = len(first_runs)
+    first_wins = (first_runs > second_runs).sum()
+    ties = (first_runs == second_runs).sum()
+    p_first = (first_wins + 0.5 * ties) / n  # ties split as a coin-flip super over
+    half_width = 1.96 * np.sqrt(p_first * (1 - p_first) / n)
+
+    def distribution(runs):
+        return {
+            "mean": float(runs.mean()),
+            "std": float(runs.std()),
+            "p05": float(np.percentile(runs, 5)),
+            "p50": float(np.percentile(runs, 50)),
+            "p95": float(np.percentile(runs, 95)),
+            "histogram": np.bincount(runs).tolist(),
+        }
+
+    return {
+        "n_sims": n,
+        "batting_first": first_team,
+        "win_probability": {first_team: float(p_first), second_team: float(1 - p_first)},
+        "win_probability_ci95": {
+            first_team: [float(max(0.0, p_first - half_width)), float(min(1.0, p_first + half_width))],
+            second_team: [float(max(0.0, 1 - p_first - half_width)), float(min(1.0, 1 - p_first + half_width))],
+        },
+        "tie_probability": float(ties / n),
+        "scores": {first_team: distribution(first_runs), second_team: distribution(second_runs)},
+    }
+
+
+def simulate_match(model, teamA, teamB, n_sims=10000, seed=None, workers=1,
+                   teamA_players=None, teamB_players=None, batting_first=None):
+    """Monte Carlo win probability for teamA vs teamB.
+
+    XIs default to each team's most recent one, in batting order. With
+    workers > 1 the simulations are split across a process pool, each chunk
+    with its own child seed, so results depend only on seed and workers."""
+    xi = {teamA: teamA_players or model.team_players.get(teamA, []),
+          teamB: teamB_players or model.team_players.get(teamB, [])}
+    for team, players in xi.items():
+        if len(players) < 2:
+            raise ValueError(f"No XI known for {team}; pass its players explicitly")
+
+    first = batting_first or teamA
+    second = teamB if first == teamA else teamA
+    first_innings = (model.matchup_cdf(xi[first], xi[second]), model.extras(xi[second]))
+    second_innings = (model.matchup_cdf(xi[second], xi[first]), model.extras(xi[first]))
+
+    workers = max(1, workers)
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    sizes = [n_sims // workers + (1 if i < n_sims % workers else 0) for i in range(workers)]
+    chunks = [(first_innings, second_innings, size, s) for size, s in zip(sizes, seeds) if size]
+
+    if len(chunks) == 1:
+        results = [_simulate_chunk(chunks[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            results = list(pool.map(_simulate_chunk, chunks))
+
+    first_runs = np.concatenate([r[0] for r in results])
+    second_runs = np.concatenate([r[1] for r in results])
+    return summarize(first_runs, second_runs, first, second)
+
+
+def benchmark(model, teamA, teamB, n_sims=100000, workers=1, seed=0):
+    """Time one simulate_match call and report simulated matches per second."""
+    start = time.perf_counter()
+    simulate_match(model, teamA, teamB, n_sims=n_sims, seed=seed, workers=workers)
+    elapsed = time.perf_counter() - start
+    result = {"n_sims": n_sims, "workers": workers, "seconds": elapsed, "sims_per_second": n_sims / elapsed}
+    print(f"{n_sims} matches on {workers} worker(s): {elapsed:.2f}s, {result['sims_per_second']:,.0f} sims/s")
+    return result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+    from feature_eng import T20_DATA_DIR
+
+    parser = argparse.ArgumentParser(description="Monte Carlo T20 match simulator")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="build the outcome model from the Cricsheet archive")
+    build.add_argument("--data-dir", default=T20_DATA_DIR)
+    build.add_argument("--out", default="sim_model.npz")
+    for name in ("simulate", "bench"):
+        cmd = sub.add_parser(name)
+        cmd.add_argument("teamA")
+        cmd.add_argument("teamB")
+        cmd.add_argument("--model", default="sim_model.npz")
+        cmd.add_argument("--sims", type=int, default=10000 if name == "simulate" else 100000)
+        cmd.add_argument("--workers", type=int, default=1)
+        cmd.add_argument("--seed", type=int, default=None if name == "simulate" else 0)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        model = OutcomeModel.build(args.data_dir)
+        model.save(args.out)
+        print(f"Outcome model for {len(model.registry)} players saved to {args.out}")
+    elif args.command == "simulate":
+        result = simulate_match(OutcomeModel.load(args.model), args.teamA, args.teamB,
+                                n_sims=args.sims, seed=args.seed, workers=args.workers)
+        for team in result["scores"]:
+            result["scores"][team].pop("histogram")
+        print(json.dumps(result, indent=2))
+    else:
+        model = OutcomeModel.load(args.model)
+        benchmark(model, args.teamA, args.teamB, n_sims=args.sims, workers=args.workers, seed=args.seed)
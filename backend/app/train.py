@@ -0,0 +1,252 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import resource
+import tracemalloc
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from model_store import PICKLE_FILES, VERSIONS_SUBDIR, TRAIN_REPORT_FILE, FEATURE_SCHEMA_VERSION, pack, publish_version
+
+# Preprocessing recipe of Notebooks/train.ipynb; bump DESIGN_FORMAT when it changes
+CAT_COLS = ['teamA', 'teamB', 'venue', 'toss_winner', 'toss_decision', 'competition']
+DROP_COLS = ['winner', 'date']
+TARGET = 'match_winner_teamA'
+# In the dataset but not model inputs: the API serves the shipped model's 22 columns
+UNMODELLED_COLS = ['teamA_match_form_score', 'teamB_match_form_score']
+DESIGN_FORMAT = 2
+
+TRAIN_CACHE_DIR = "train_cache"
+MODELS_DIR = "../models/"
+
+# Hyperparameters of the production model; used as-is with --no-search
+XGB_PARAMS = {"n_estimators": 100, "max_depth": 3, "learning_rate": 0.05, "subsample": 0.8,
+              "colsample_bytree": 0.8, "eval_metric": "logloss", "random_state": 42}
+
+# The notebook's XGBoost grid; n_estimators is the resource successive halving allocates
+SEARCH_GRID = {
+    "max_depth": [3, 5, 7],
+    "learning_rate": [0.01, 0.05, 0.1],
+    "subsample": [0.8, 1.0],
+    "colsample_bytree": [0.8, 1.0],
+}
+MAX_ESTIMATORS = 300
+HALVING_FACTOR = 3
+CV_FOLDS = 3
+HOLDOUT_FRACTION = 0.2
+
+
+class StageTimer:
+    """Wall time, peak traced Python allocations and the process RSS
+    high-water mark after each named stage."""
+
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            result = {"seconds": time.perf_counter() - start}
+            if self.track_memory:
+                result["peak_tracemalloc_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                tracemalloc.stop()
+            result["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.stages[name] = result
+            line = f"[INFO] {name:<10} {result['seconds']:8.2f}s"
+            if "peak_tracemalloc_mb" in result:
+                line += f"  peak {result['peak_tracemalloc_mb']:.1f}MB"
+            print(line + f"  rss {result['max_rss_mb']:.0f}MB")
+
+
+def dataset_hash(path):
+    digest = hashlib.sha256(f"design-v{DESIGN_FORMAT}:{','.join(CAT_COLS)}".encode())
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_design(df):
+    """Encode and scale as the notebook does. Rows are put in date order
+    (stable, so same-day matches keep their replay order) for the
+    time-ordered folds."""
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+
+    df = df.sort_values("date", kind="stable").reset_index(drop=True)
+    dates = df["date"].astype(str).to_numpy(dtype=str)
+    df = df.drop(DROP_COLS, axis=1).drop(UNMODELLED_COLS, axis=1, errors="ignore")
+    label_encoders = {}
+    for col in CAT_COLS:
+        le = LabelEncoder()
+        df[col] = le.fit_transform(df[col])
+        label_encoders[col] = le
+
+    X = df.drop(TARGET, axis=1)
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    return X_scaled, df[TARGET].to_numpy(), dates, label_encoders, scaler
+
+
+def load_design(features_csv, cache_dir=TRAIN_CACHE_DIR):
+    """(X, y, dates, label_encoders, scaler, key), from the cache when this
+    exact dataset has been encoded before."""
+    import joblib
+
+    key = dataset_hash(features_csv)
+    entry = os.path.join(cache_dir, key[:16])
+    if os.path.exists(os.path.join(entry, "design.npz")):
+        with np.load(os.path.join(entry, "design.npz")) as cached:
+            X, y, dates = cached["X"], cached["y"], cached["dates"]
+        label_encoders, scaler = joblib.load(os.path.join(entry, "preprocess.pkl"))
+        print(f"[INFO] Design matrix cache hit {key[:16]} ({X.shape[0]} x {X.shape[1]})")
+        return X, y, dates, label_encoders, scaler, key
+
+    X, y, dates, label_encoders, scaler = build_design(pd.read_csv(features_csv))
+    tmp_entry = f"{entry}.{os.getpid()}.tmp"
+    os.makedirs(tmp_entry, exist_ok=True)
+    np.savez(os.path.join(tmp_entry, "design.npz"), X=X, y=y, dates=dates)
+    joblib.dump((label_encoders, scaler), os.path.join(tmp_entry, "preprocess.pkl"))
+    try:
+        os.replace(tmp_entry, entry)
+    except OSError:
+        shutil.rmtree(tmp_entry, ignore_errors=True)  # another run cached it first
+    print(f"[INFO] Design matrix cached as {key[:16]} ({X.shape[0]} x {X.shape[1]})")
+    return X, y, dates, label_encoders, scaler, key
+
+
+def make_model(params, n_jobs=-1):
+    from xgboost import XGBClassifier
+    params = {**XGB_PARAMS, **params}
+    return XGBClassifier(**params, tree_method="hist", n_jobs=n_jobs)
+
+
+def search(X, y, scoring="accuracy", folds=CV_FOLDS, max_estimators=MAX_ESTIMATORS, factor=HALVING_FACTOR):
+    """Successive halving over SEARCH_GRID with n_estimators as the budget.
+    Every candidate starts on a few trees; each round keeps the best
+    1/factor on factor times as many. Folds are time-ordered: each one
+    validates on matches after everything it trained on."""
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingGridSearchCV, TimeSeriesSplit
+
+    halving = HalvingGridSearchCV(
+        make_model({}), SEARCH_GRID, resource="n_estimators", max_resources=max_estimators,
+        min_resources="exhaust", factor=factor, cv=TimeSeriesSplit(n_splits=folds), scoring=scoring,
+        refit=False, n_jobs=1,  # XGBoost already uses every core per fit
+    )
+    halving.fit(X, y)
+    results = pd.DataFrame(halving.cv_results_)
+    rounds = results.groupby("iter").agg(candidates=("params", "size"), n_estimators=("n_resources", "first"))
+    for i, row in rounds.iterrows():
+        print(f"[INFO] Round {i}: {row['candidates']} candidates x {row['n_estimators']} trees")
+    best = {**halving.best_params_}
+    print(f"[INFO] Best {scoring} {halving.best_score_:.4f} with {best}")
+    return best, float(halving.best_score_), int(len(results))
+
+
+def evaluate(model, X, y):
+    from sklearn.metrics import accuracy_score, log_loss, brier_score_loss
+    p = model.predict_proba(X)[:, 1]
+    return {"rows": int(len(y)), "accuracy": float(accuracy_score(y, p > 0.5)),
+            "log_loss": float(log_loss(y, p, labels=[0, 1])), "brier": float(brier_score_loss(y, p))}
+
+
+def write_report(version_dir, report):
+    tmp_path = os.path.join(version_dir, f"{TRAIN_REPORT_FILE}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(report, indent=2))
+    os.replace(tmp_path, os.path.join(version_dir, TRAIN_REPORT_FILE))
+
+
+def write_version(models_dir, version, model, label_encoders, scaler, report):
+    """Write a complete version directory (pickles, packed arrays, report)
+    under a temporary name and rename it into place."""
+    import joblib
+
+    versions_dir = os.path.join(models_dir, VERSIONS_SUBDIR)
+    final_dir = os.path.join(versions_dir, version)
+    tmp_dir = os.path.join(versions_dir, f".{version}.tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    joblib.dump(model, os.path.join(tmp_dir, PICKLE_FILES["model"]))
+    joblib.dump(label_encoders, os.path.join(tmp_dir, PICKLE_FILES["label_encoders"]))
+    joblib.dump(scaler, os.path.join(tmp_dir, PICKLE_FILES["scaler"]))
+    report["artifacts"] = pack(tmp_dir, feature_schema=report["feature_schema"])["content_hash"]
+    write_report(tmp_dir, report)
+    os.replace(tmp_dir, final_dir)
+    return final_dir
+
+
+def train(features_csv, models_dir=MODELS_DIR, cache_dir=TRAIN_CACHE_DIR, run_search=True, scoring="accuracy",
+          folds=CV_FOLDS, max_estimators=MAX_ESTIMATORS, holdout=HOLDOUT_FRACTION, promote=True,
+          track_memory=True):
+    timer = StageTimer(track_memory)
+    report = {"dataset": os.path.abspath(features_csv), "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "feature_schema": FEATURE_SCHEMA_VERSION}
+
+    with timer.stage("imports"):
+        import joblib  # noqa: F401
+        import sklearn.preprocessing  # noqa: F401
+        import xgboost  # noqa: F401
+    with timer.stage("design"):
+        X, y, dates, label_encoders, scaler, key = load_design(features_csv, cache_dir)
+    report["dataset_hash"] = key
+    split = int(len(y) * (1 - holdout))
+    report["holdout_from"] = str(dates[split]) if split < len(y) else None
+
+    params = {k: v for k, v in XGB_PARAMS.items() if k in SEARCH_GRID or k == "n_estimators"}
+    if run_search:
+        with timer.stage("search"):
+            params, cv_score, candidates = search(X[:split], y[:split], scoring, folds, max_estimators)
+        report["search"] = {"scoring": scoring, "cv_score": cv_score, "fits": candidates * folds,
+                            "grid_size": int(np.prod([len(v) for v in SEARCH_GRID.values()]))}
+    report["params"] = params
+
+    # Score on the most recent matches with a model that never saw them
+    if split < len(y):
+        with timer.stage("holdout"):
+            holdout_model = make_model(params).fit(X[:split], y[:split])
+            report["holdout"] = evaluate(holdout_model, X[split:], y[split:])
+        print(f"[INFO] Holdout from {report['holdout_from']}: {report['holdout']}")
+
+    with timer.stage("fit"):
+        model = make_model(params).fit(X, y)
+
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{key[:8]}"
+    report["version"] = version
+    report["stages"] = timer.stages
+    with timer.stage("publish"):
+        path = write_version(models_dir, version, model, label_encoders, scaler, report)
+        if promote:
+            publish_version(models_dir, version)
+    # Rewritten once the publish stage has closed, so its timing is in the report
+    write_report(path, report)
+    print(f"[INFO] Model version {version} written to {path}" + ("" if promote else " (not published)"))
+    return version, report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train, evaluate and publish the match winner model")
+    parser.add_argument("--features", default="t20_features_full.csv")
+    parser.add_argument("--models-dir", default=MODELS_DIR)
+    parser.add_argument("--cache-dir", default=TRAIN_CACHE_DIR)
+    parser.add_argument("--no-search", action="store_true", help="train the production hyperparameters as they are")
+    parser.add_argument("--scoring", default="accuracy")
+    parser.add_argument("--folds", type=int, default=CV_FOLDS)
+    parser.add_argument("--max-estimators", type=int, default=MAX_ESTIMATORS)
+    parser.add_argument("--holdout", type=float, default=HOLDOUT_FRACTION, help="most recent share of matches held out")
+    parser.add_argument("--no-promote", action="store_true", help="write the version without publishing it")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    train(args.features, args.models_dir, args.cache_dir, not args.no_search, args.scoring, args.folds,
+          args.max_estimators, args.holdout, not args.no_promote, not args.no_tracemalloc)
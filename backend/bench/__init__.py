@@ -0,0 +1,8 @@
+"""Benchmarks for ingestion, feature engineering and serving.
+
+Run from the repository root:
+
+    python -m backend.bench.synthetic bench_data 5000      # generate matches
+    python -m backend.bench.run --matches 5000 --out results.json
+    python -m backend.bench.run --matches 5000 --baseline results.json
+"""
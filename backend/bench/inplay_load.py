@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+
+DEFAULT_URL = "ws://127.0.0.1:8000/ws/inplay"
+
+
+def match_messages(path):
+    """The start message and one delivery message per ball of a Cricsheet file."""
+    with open(path, "r", encoding="utf-8") as f:
+        match = json.load(f)
+    info = match["info"]
+    teamA, teamB = info["teams"][:2]
+    start = {"type": "start", "match": {
+        "teamA": teamA, "teamB": teamB, "venue": info.get("venue", "Unknown"),
+        "toss_winner": info.get("toss", {}).get("winner", teamA),
+        "toss_decision": info.get("toss", {}).get("decision", "bat"),
+        "competition": info.get("event", {}).get("name", "Unknown")}}
+    deliveries = []
+    for innings, inning in enumerate(match.get("innings", [])[:2]):
+        for over in inning.get("overs", []):
+            for delivery in over.get("deliveries", []):
+                deliveries.append({"type": "delivery", "innings": innings, "team": inning["team"],
+                                   "over": over["over"], "delivery": delivery})
+    return start, deliveries
+
+
+async def replay(url, path, interval, latencies, errors):
+    """Replay one match ball by ball, waiting for each probability before
+    sending the next ball (and `interval` seconds between balls)."""
+    import websockets
+
+    start, deliveries = match_messages(path)
+    async with websockets.connect(url, max_size=None) as ws:
+        await ws.send(json.dumps(start))
+        reply = json.loads(await ws.recv())
+        if reply["type"] == "error":
+            raise RuntimeError(reply["error"])
+        for message in deliveries:
+            sent = time.perf_counter()
+            await ws.send(json.dumps(message))
+            reply = json.loads(await ws.recv())
+            latencies.append(time.perf_counter() - sent)
+            if reply["type"] == "error":
+                errors.append(reply["error"])
+            if interval:
+                await asyncio.sleep(interval)
+        await ws.send(json.dumps({"type": "end"}))
+        await ws.recv()
+
+
+async def run(url, files, connections, interval, ramp):
+    latencies, errors = [], []
+
+    async def connection(i):
+        await asyncio.sleep(ramp * i / max(connections, 1))
+        await replay(url, files[i % len(files)], interval, latencies, errors)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(connection(i) for i in range(connections)), return_exceptions=True)
+    seconds = time.perf_counter() - start
+    failed = [r for r in results if isinstance(r, Exception)]
+    for e in failed[:3]:
+        print(f"[ERROR] Connection failed: {e!r}")
+
+    lat = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {"connections": connections, "failed_connections": len(failed), "balls": len(latencies),
+            "error_replies": len(errors), "seconds": seconds, "balls_per_second": len(latencies) / seconds,
+            "latency_ms": {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)),
+                           "p99": float(np.percentile(lat, 99)), "max": float(lat.max())}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test /ws/inplay by replaying Cricsheet files as live matches")
+    parser.add_argument("--data-dir", required=True, help="folder of Cricsheet JSON files to replay")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--connections", type=int, default=200, help="matches replayed concurrently")
+    parser.add_argument("--interval", type=float, default=0.0, help="seconds between balls per match")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which connections open")
+    parser.add_argument("--out", help="write results as JSON")
+    args = parser.parse_args()
+
+    files = sorted(os.path.join(args.data_dir, f) for f in os.listdir(args.data_dir) if f.endswith(".json"))
+    if not files:
+        raise SystemExit(f"[ERROR] No Cricsheet JSON files in {args.data_dir}")
+    result = asyncio.run(run(args.url, files, args.connections, args.interval, args.ramp))
+    print(f"[INFO] {result['connections']} matches ({result['failed_connections']} failed), {result['balls']} balls "
+          f"in {result['seconds']:.1f}s: {result['balls_per_second']:.0f} balls/s, "
+          f"p50 {result['latency_ms']['p50']:.1f}ms p95 {result['latency_ms']['p95']:.1f}ms "
+          f"p99 {result['latency_ms']['p99']:.1f}ms, {result['error_replies']} error replies")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(result, indent=2))
@@ -0,0 +1,295 @@
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import platform
+import resource
+import tempfile
+import tracemalloc
+import subprocess
+import numpy as np
+
+from .synthetic import generate
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+APP_DIR = os.path.join(ROOT_DIR, "backend", "app")
+# The pipeline modules import each other as top-level names, as when run from backend/app
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import ingest  # noqa: E402
+import feature_store  # noqa: E402
+from feature_eng import feature_engineering  # noqa: E402
+from feature_vectorized import vectorized_feature_engineering  # noqa: E402
+from player_tracker import update_player_stats, reset_trackers  # noqa: E402
+from player_index import PlayerIndex, PLAYER_INDEX_SUBDIR, MAX_LINEUP_SIZE  # noqa: E402
+
+# A benchmark is flagged when it gets this much slower (or bigger) than the baseline
+DEFAULT_TOLERANCE = 0.15
+
+
+def _max_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(fn, repeat=3, track_memory=True, setup=None):
+    """Median wall time of fn() over `repeat` runs, then one tracemalloc run.
+
+    setup() runs before every call and is not timed. fn may return a dict of
+    extra fields (counts, latencies) which is merged into the result.
+    """
+    times, extra = [], {}
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        extra = fn() or {}
+        times.append(time.perf_counter() - start)
+
+    result = {"seconds": float(np.median(times)), "runs": times}
+    if track_memory:
+        if setup is not None:
+            setup()
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        result["peak_tracemalloc_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    result["max_rss_mb"] = _max_rss_mb()  # process high-water mark so far
+    result.update(extra)
+    return result
+
+
+def _per_second(result, n, unit):
+    result["throughput"] = n / result["seconds"]
+    result["unit"] = unit
+    return result
+
+
+def ensure_dataset(work_dir, n, seed, workers=None):
+    data_dir = os.path.join(work_dir, f"synthetic-{n}-{seed}")
+    marker = os.path.join(data_dir, ".complete")
+    if not os.path.exists(marker):
+        start = time.perf_counter()
+        generate(data_dir, n, seed=seed, workers=workers)
+        open(marker, "w").close()
+        print(f"[INFO] Generated {n} matches in {time.perf_counter() - start:.1f}s -> {data_dir}")
+    return data_dir
+
+
+def bench_pipeline(data_dir, repeat, track_memory, lineups=10000):
+    results = {}
+    fnames = sorted(f for f in os.listdir(data_dir) if f.endswith(".json"))
+    n = len(fnames)
+
+    def load_json():
+        for fname in fnames:
+            with open(os.path.join(data_dir, fname), "r", encoding="utf-8") as f:
+                json.load(f)
+    results["json_load"] = _per_second(measure(load_json, repeat, track_memory), n, "files/s")
+
+    scratch = tempfile.mkdtemp(prefix="cricpred-bench-")
+    cache_dir = os.path.join(scratch, "ingest_cache")
+    try:
+        def clear_cache():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        results["ingest_index_cold"] = _per_second(measure(
+            lambda: ingest.index_matches(data_dir, fnames, match_filter=ingest.is_t20, cache_dir=cache_dir),
+            repeat, track_memory, setup=clear_cache), n, "files/s")
+        entries = ingest.index_matches(data_dir, fnames, match_filter=ingest.is_t20, cache_dir=cache_dir)
+        results["ingest_index_warm"] = _per_second(measure(
+            lambda: ingest.index_matches(data_dir, fnames, match_filter=ingest.is_t20, cache_dir=cache_dir),
+            repeat, track_memory), n, "files/s")
+
+        records = [ingest.load_record(data_dir, fname, info, cache_dir=cache_dir) for fname, info in entries]
+
+        def update_players():
+            for record in records:
+                update_player_stats(record)
+        results["player_update"] = _per_second(
+            measure(update_players, repeat, track_memory, setup=reset_trackers), len(records), "matches/s")
+
+        results["feature_engineering"] = _per_second(
+            measure(lambda: {"rows": len(feature_engineering(iter(records)))}, repeat, track_memory),
+            len(records), "matches/s")
+        results["feature_vectorized"] = _per_second(
+            measure(lambda: {"rows": len(vectorized_feature_engineering(iter(records)))}, repeat, track_memory),
+            len(records), "matches/s")
+        del records
+
+        out_csv = os.path.join(scratch, "features.csv")
+        store_dir = os.path.join(scratch, "store")
+        # A scratch ingest cache, so the cold runs never touch the one in data_dir
+        build_cache = os.path.join(scratch, "build_cache")
+
+        def clear_build(cold):
+            def setup():
+                shutil.rmtree(store_dir, ignore_errors=True)
+                if cold:
+                    shutil.rmtree(build_cache, ignore_errors=True)
+            return setup
+        for name, cold in (("build_full_cold", True), ("build_full_warm", False)):
+            results[name] = _per_second(measure(
+                lambda: {"rows": len(feature_store.build_full(data_dir, out_csv, store_dir, build_cache))},
+                repeat, track_memory, setup=clear_build(cold)), n, "files/s")
+
+        # Candidate XI pairs scored against the index build_full just published
+        index = PlayerIndex.load(os.path.join(store_dir, PLAYER_INDEX_SUBDIR))
+        rng = np.random.default_rng(0)
+        names = index.players.tolist()
+        pairs = [[[names[j] for j in rng.choice(len(names), MAX_LINEUP_SIZE, replace=False)] for _ in range(2)]
+                 for _ in range(lineups)]
+        teamA, teamB = [pair[0] for pair in pairs], [pair[1] for pair in pairs]
+        results["lineup_index"] = _per_second(measure(
+            lambda: {"players": len(index), "form_A": float(index.team_form_scores(teamA).sum()),
+                     "form_B": float(index.team_form_scores(teamB).sum())},
+            repeat, track_memory), lineups, "lineups/s")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def _latencies(samples):
+    samples = np.asarray(samples)
+    return {"p50_ms": float(np.percentile(samples, 50) * 1000), "p95_ms": float(np.percentile(samples, 95) * 1000),
+            "p99_ms": float(np.percentile(samples, 99) * 1000)}
+
+
+def bench_api(requests, batch_size, repeat, track_memory, seed=0):
+    """/predict and /predict/batch through a TestClient request loop."""
+    os.environ.setdefault("CRICPRED_PREDICTION_CACHE", "off")
+    from fastapi.testclient import TestClient
+    from backend.app import api
+    from backend.app.prediction_cache import make_cache
+
+    rng = np.random.default_rng(seed)
+    encoders = api.models.artifacts.label_encoders
+    teams = encoders["teamA"].classes_
+    venues = encoders["venue"].classes_
+    competitions = encoders["competition"].classes_
+
+    def payload():
+        a, b = rng.choice(len(teams), 2, replace=False)
+        return {"teamA": str(teams[a]), "teamB": str(teams[b]), "venue": str(venues[rng.integers(len(venues))]),
+                "toss_winner": str(teams[a if rng.random() < 0.5 else b]),
+                "toss_decision": "bat" if rng.random() < 0.5 else "field",
+                "competition": str(competitions[rng.integers(len(competitions))])}
+
+    singles = [payload() for _ in range(requests)]
+    batches = [[payload() for _ in range(batch_size)] for _ in range(max(1, requests // batch_size))]
+    results = {}
+
+    with TestClient(api.app) as client:
+        client.post("/predict", json=singles[0])  # loads the model artifacts
+
+        def loop(path, bodies):
+            def run():
+                latencies = []
+                for body in bodies:
+                    start = time.perf_counter()
+                    response = client.post(path, json=body)
+                    latencies.append(time.perf_counter() - start)
+                    response.raise_for_status()
+                return _latencies(latencies)
+            return run
+
+        results["predict_single"] = _per_second(
+            measure(loop("/predict", singles), repeat, track_memory), len(singles), "requests/s")
+        results["predict_batch"] = _per_second(
+            measure(loop("/predict/batch", batches), repeat, track_memory), len(batches) * batch_size, "rows/s")
+        results["predict_batch"]["batch_size"] = batch_size
+
+        # Hot fixtures: a few inputs requested over and over, served from the cache
+        previous_cache = api.prediction_cache
+        api.prediction_cache = make_cache("memory")
+        try:
+            hot = [singles[i % 20] for i in range(len(singles))]
+            results["predict_single_cached"] = _per_second(
+                measure(loop("/predict", hot), repeat, track_memory), len(hot), "requests/s")
+        finally:
+            api.prediction_cache = previous_cache
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Benchmarks whose time or tracemalloc peak grew by more than tolerance."""
+    regressions = []
+    for name, current in results["benchmarks"].items():
+        previous = baseline["benchmarks"].get(name)
+        if previous is None:
+            continue
+        for field in ("seconds", "peak_tracemalloc_mb"):
+            if field in current and field in previous and previous[field] > 0:
+                ratio = current[field] / previous[field]
+                if ratio > 1 + tolerance:
+                    regressions.append({"benchmark": name, "field": field, "baseline": previous[field],
+                                        "current": current[field], "ratio": ratio})
+    return regressions
+
+
+def report(results):
+    for name, r in results["benchmarks"].items():
+        line = f"{name:<24} {r['seconds']:9.3f}s {r['throughput']:12,.0f} {r['unit']:<11}"
+        if "p50_ms" in r:
+            line += f" p50 {r['p50_ms']:.2f}ms p95 {r['p95_ms']:.2f}ms p99 {r['p99_ms']:.2f}ms"
+        if "peak_tracemalloc_mb" in r:
+            line += f" peak {r['peak_tracemalloc_mb']:.1f}MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark ingestion, feature engineering and serving")
+    parser.add_argument("--matches", type=int, default=1000, help="synthetic matches to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", help="benchmark an existing Cricsheet folder instead")
+    parser.add_argument("--work-dir", default=os.path.join(tempfile.gettempdir(), "cricpred-bench"))
+    parser.add_argument("--only", choices=["pipeline", "api"], help="run one group")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=500, help="requests per API load loop")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lineups", type=int, default=10000, help="candidate XI pairs scored per lineup run")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = {"environment": environment(), "config": vars(args), "benchmarks": {}}
+    track_memory = not args.no_tracemalloc
+    if args.only != "api":
+        data_dir = args.data_dir or ensure_dataset(args.work_dir, args.matches, args.seed)
+        results["benchmarks"].update(bench_pipeline(data_dir, args.repeat, track_memory, args.lineups))
+    if args.only != "pipeline":
+        results["benchmarks"].update(bench_api(args.requests, args.batch_size, args.repeat, track_memory, args.seed))
+    report(results)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(json.dumps(results, indent=2))
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("matches") != args.matches:
+            print(f"[WARN] Baseline was run with {baseline.get('config', {}).get('matches')} matches, this run with {args.matches}")
+        regressions = compare(results, baseline, args.tolerance)
+        for r in regressions:
+            print(f"[REGRESSION] {r['benchmark']} {r['field']}: {r['baseline']:.4g} -> {r['current']:.4g} ({r['ratio']:.2f}x)")
+        if regressions:
+            raise SystemExit(1)
+        print(f"[OK] No regressions beyond {args.tolerance:.0%} against {args.baseline}")
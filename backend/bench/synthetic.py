@@ -0,0 +1,183 @@
+import os
+import json
+import random
+import hashlib
+import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# Made-up franchises; a few venues carry the team name so is_home_teamA fires
+CITIES = ["Harbour", "Northgate", "Riverside", "Eastfield", "Kingsport", "Lakeview", "Westbury", "Southend",
+          "Highcliff", "Stonebridge", "Marlow", "Ashford", "Brookhaven", "Fairmont", "Glenwood", "Oakridge",
+          "Redcliffe", "Silverton", "Thornbury", "Whitby", "Yarrow", "Cedarvale", "Dunmore", "Elmstead"]
+NICKNAMES = ["Strikers", "Kings", "Titans", "Warriors", "Chargers", "Royals", "Hurricanes", "Giants"]
+COMPETITIONS = ["Premier T20 League", "Champions Cup", "National T20 Trophy", "Twenty20 Bash", "Super Series"]
+NEUTRAL_VENUES = ["Central Oval", "Memorial Ground", "Park Stadium", "Bay Arena", "Hill Ground", "Union Park"]
+
+SQUAD_SIZE = 18
+WICKET_KINDS = ["caught"] * 12 + ["bowled"] * 4 + ["lbw"] * 2 + ["run out", "stumped"]
+# Off-the-bat runs per legal ball, roughly T20 proportions
+RUN_WEIGHTS = {0: 36, 1: 37, 2: 8, 3: 0.5, 4: 12, 6: 5}
+
+
+def teams_for(n_teams):
+    return [f"{CITIES[i % len(CITIES)]} {NICKNAMES[(i // len(CITIES) + i) % len(NICKNAMES)]}" for i in range(n_teams)]
+
+
+def _innings(rng, team, batters, bowlers, target=None):
+    overs = []
+    total = wickets = 0
+    striker, non_striker, next_in = 0, 1, 2
+    weights = list(RUN_WEIGHTS.values())
+    outcomes = list(RUN_WEIGHTS)
+    for over in range(20):
+        bowler = bowlers[over % len(bowlers)]  # six bowlers, so nobody bowls more than four overs
+        deliveries = []
+        legal = 0
+        while legal < 6:
+            delivery = {"batter": batters[striker], "bowler": bowler, "non_striker": batters[non_striker]}
+            extra_roll = rng.random()
+            if extra_roll < 0.035:
+                extras = {"wides": 1}
+                runs = {"batter": 0, "extras": 1, "total": 1}
+            elif extra_roll < 0.045:
+                off_bat = rng.choices(outcomes, weights)[0]
+                extras = {"noballs": 1}
+                runs = {"batter": off_bat, "extras": 1, "total": off_bat + 1}
+            else:
+                extras = None
+                off_bat = rng.choices(outcomes, weights)[0]
+                if off_bat == 0 and rng.random() < 0.04:
+                    extras = {"legbyes": 1}
+                    runs = {"batter": 0, "extras": 1, "total": 1}
+                else:
+                    runs = {"batter": off_bat, "extras": 0, "total": off_bat}
+                legal += 1
+            if extras:
+                delivery["extras"] = extras
+            delivery["runs"] = runs
+            total += runs["total"]
+
+            if extras is None and rng.random() < 0.055:
+                kind = rng.choice(WICKET_KINDS)
+                wicket = {"player_out": batters[striker], "kind": kind}
+                if kind in ("caught", "run out", "stumped"):
+                    wicket["fielders"] = [{"name": rng.choice(bowlers)}]
+                delivery["wickets"] = [wicket]
+                wickets += 1
+                striker = next_in
+                next_in += 1
+            elif runs["batter"] % 2 == 1:
+                striker, non_striker = non_striker, striker
+            deliveries.append(delivery)
+
+            if wickets == 10 or (target is not None and total >= target):
+                overs.append({"over": over, "deliveries": deliveries})
+                return {"team": team, "overs": overs}, total, wickets, over * 6 + legal
+        overs.append({"over": over, "deliveries": deliveries})
+        striker, non_striker = non_striker, striker
+    return {"team": team, "overs": overs}, total, wickets, 120
+
+
+def synthetic_match(seed, k, teams=None, start=datetime.date(2008, 4, 1), days=6000):
+    """One Cricsheet-format match; depends only on (seed, k)."""
+    rng = random.Random(f"{seed}-{k}")
+    teams = teams or teams_for(24)
+    squads = {t: [f"{t.split()[0][0]}{t.split()[1][0]}{j} Player {i:02d}" for i in range(SQUAD_SIZE)]
+              for j, t in enumerate(teams)}
+
+    A, B = rng.sample(teams, 2)
+    xi = {A: rng.sample(squads[A], 11), B: rng.sample(squads[B], 11)}
+    date = start + datetime.timedelta(days=rng.randrange(days))
+    venue_roll = rng.random()
+    if venue_roll < 0.35:
+        venue = f"{A} Ground"
+    elif venue_roll < 0.6:
+        venue = f"{B.split()[0]} Cricket Stadium"
+    else:
+        venue = rng.choice(NEUTRAL_VENUES)
+
+    toss_winner = rng.choice([A, B])
+    decision = "field" if rng.random() < 0.6 else "bat"
+    first = toss_winner if decision == "bat" else (B if toss_winner == A else A)
+    second = B if first == A else A
+
+    first_innings, first_total, _, _ = _innings(rng, first, xi[first], xi[second][5:][::-1])
+    second_innings, second_total, second_wickets, _ = _innings(
+        rng, second, xi[second], xi[first][5:][::-1], target=first_total + 1)
+
+    info = {
+        "balls_per_over": 6,
+        "city": venue.split()[0],
+        "dates": [date.isoformat()],
+        "gender": "male",
+        "match_type": "T20" if rng.random() < 0.9 else "ODI",
+        "overs": 20,
+        "players": xi,
+        "registry": {"people": {p: hashlib.md5(p.encode()).hexdigest()[:8] for p in xi[A] + xi[B]}},
+        "season": str(date.year),
+        "team_type": "club",
+        "teams": [A, B],
+        "toss": {"winner": toss_winner, "decision": decision},
+        "venue": venue,
+    }
+    if rng.random() < 0.85:
+        info["event"] = {"name": rng.choice(COMPETITIONS), "match_number": k % 70 + 1}
+
+    if rng.random() < 0.02:
+        info["outcome"] = {"result": "no result"}
+        innings = [first_innings]
+    else:
+        innings = [first_innings, second_innings]
+        if second_total > first_total:
+            info["outcome"] = {"winner": second, "by": {"wickets": 10 - second_wickets}}
+        elif second_total < first_total:
+            info["outcome"] = {"winner": first, "by": {"runs": first_total - second_total}}
+        else:
+            info["outcome"] = {"result": "tie", "eliminator": rng.choice([A, B])}
+        winner = info["outcome"].get("winner", info["outcome"].get("eliminator"))
+        info["player_of_match"] = [rng.choice(xi[winner])]
+
+    return {"meta": {"data_version": "1.1.0", "created": date.isoformat(), "revision": 1},
+            "info": info, "innings": innings}
+
+
+def _write_range(args):
+    out_dir, seed, first, last, n_teams = args
+    teams = teams_for(n_teams)
+    for k in range(first, last):
+        with open(os.path.join(out_dir, f"{1000000 + k}.json"), "w", encoding="utf-8") as f:
+            f.write(json.dumps(synthetic_match(seed, k, teams)))
+    return last - first
+
+
+def generate(out_dir, n, seed=0, workers=None, n_teams=24, chunk=500):
+    """Write n synthetic T20 matches to out_dir as Cricsheet JSON files.
+
+    Each file depends only on (seed, index), so the output is identical for
+    any number of workers and a larger n extends a smaller one.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    ranges = [(out_dir, seed, i, min(i + chunk, n), n_teams) for i in range(0, n, chunk)]
+    if workers == 1 or len(ranges) == 1:
+        written = sum(_write_range(r) for r in ranges)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = sum(pool.map(_write_range, ranges))
+    return written
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate synthetic Cricsheet-format T20 matches")
+    parser.add_argument("out_dir")
+    parser.add_argument("n", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--teams", type=int, default=24)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    written = generate(args.out_dir, args.n, args.seed, args.workers, args.teams)
+    print(f"Wrote {written} matches to {args.out_dir} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,68 @@
+import os
+import sys
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Pipeline modules import their siblings directly, as when run from
+# backend/app; the API is imported as the backend.app package
+sys.path[:0] = [os.path.join(REPO_ROOT, "backend", "app"), REPO_ROOT]
+os.environ.setdefault("CRICPRED_MODELS_DIR", os.path.join(REPO_ROOT, "backend", "models"))
+
+SYNTHETIC_MATCHES = 150
+
+
+@pytest.fixture(scope="session")
+def synthetic_dir(tmp_path_factory):
+    """A small synthetic Cricsheet folder, shared by every test that replays one."""
+    from backend.bench.synthetic import generate
+    data_dir = str(tmp_path_factory.mktemp("synthetic"))
+    generate(data_dir, SYNTHETIC_MATCHES, seed=0, workers=1)
+    return data_dir
+
+
+class StubServer:
+    """Local HTTP server for scraper tests. respond(path, headers) returns
+    (status, response headers, body); every request is recorded."""
+
+    def __init__(self, respond):
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, headers, body = respond(self.path, self.headers)
+                server.requests.append((self.path, status))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                if body:
+                    self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stub_server():
+    """Factory for StubServers, shut down after the test."""
+    servers = []
+
+    def start(respond):
+        servers.append(StubServer(respond))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
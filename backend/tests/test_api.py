@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from backend.app import api
+from feature_server import FeatureSnapshot
+from feature_store import SNAPSHOT_FILE, build_full
+from player_index import load_published
+from prediction_cache import make_cache
+
+
+@pytest.fixture(scope="module")
+def snapshot(synthetic_dir, tmp_path_factory):
+    store_dir = tmp_path_factory.mktemp("store")
+    build_full(synthetic_dir, str(store_dir / "features.csv"), str(store_dir))
+    return FeatureSnapshot.load(str(store_dir / SNAPSHOT_FILE), load_published)
+
+
+@pytest.fixture(params=["no snapshot", "snapshot"])
+def client(request, monkeypatch):
+    # No cache, so every row is computed rather than replayed from an earlier call
+    monkeypatch.setattr(api, "prediction_cache", make_cache("off"))
+    served = request.getfixturevalue("snapshot") if request.param == "snapshot" else None
+    monkeypatch.setattr(api.feature_server, "snapshot", served)
+    return TestClient(api.app)
+
+
+def _inputs():
+    encoders = api.models.artifacts.label_encoders
+    teams = list(encoders["teamA"].classes_[:3])
+    # Synthetic teams and venues have live features in the snapshot
+    teams += sorted(api.feature_server.snapshot.teams)[:2] if api.feature_server.snapshot is not None else []
+    venue = encoders["venue"].classes_[0]
+    rows = [{"teamA": a, "teamB": b, "venue": venue, "toss_winner": a, "toss_decision": decision,
+             "competition": "IPL"} for a, b in zip(teams, teams[1:] + teams[:1]) for decision in ("bat", "field")]
+    # Unknown categories encode as -1 rather than failing the request
+    rows.append({"teamA": "Nowhere XI", "teamB": teams[0], "venue": "Nowhere Oval", "toss_winner": "Nowhere XI",
+                 "toss_decision": "bowl", "competition": "Nowhere League"})
+    return rows
+
+
+def test_batch_equals_single_predictions(client):
+    inputs = _inputs()
+    singles = []
+    for row in inputs:
+        response = client.post("/predict", json=row)
+        assert response.status_code == 200
+        singles.append(response.json())
+
+    response = client.post("/predict/batch", json=inputs)
+    assert response.status_code == 200
+    assert response.json() == singles
+
+
+def test_empty_batch_is_an_empty_list(client):
+    response = client.post("/predict/batch", json=[])
+    assert response.status_code == 200 and response.json() == []
+
+
+def test_unknown_categories_are_predicted(client):
+    row = _inputs()[-1]
+    prediction = client.post("/predict", json=row).json()
+    assert 0.0 <= prediction["win_probability_for_teamA"] <= 1.0
+    assert prediction["predicted_winner_is_teamA"] == (prediction["win_probability_for_teamA"] > 0.5)
+    assert client.post("/predict/batch", json=[row]).json() == [prediction]
+
+
+def test_unknown_categories_match_the_reference_path(monkeypatch):
+    monkeypatch.setattr(api, "prediction_cache", make_cache("off"))
+    monkeypatch.setattr(api.feature_server, "snapshot", None)
+    row = _inputs()[-1]
+    prediction = TestClient(api.app).post("/predict", json=row).json()
+    assert prediction["win_probability_for_teamA"] == pytest.approx(api.predict_dataframe(row), abs=1e-12)
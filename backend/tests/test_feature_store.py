@@ -0,0 +1,35 @@
+import json
+import os
+import pandas as pd
+import pytest
+import feature_store
+from feature_store import build_both, build_full, update_incremental
+
+
+@pytest.mark.parametrize("split", [0.5, 0.8])
+def test_incremental_matches_full_rebuild(synthetic_dir, split):
+    inc_df, full_df = build_both(synthetic_dir, split)
+    pd.testing.assert_frame_equal(inc_df, full_df, check_exact=True)
+
+
+def test_up_to_date_store_appends_nothing(synthetic_dir, tmp_path):
+    out_csv, store_dir = str(tmp_path / "features.csv"), str(tmp_path / "store")
+    rows = len(build_full(synthetic_dir, out_csv, store_dir))
+    assert update_incremental(synthetic_dir, out_csv, store_dir).empty
+    assert len(pd.read_csv(out_csv)) == rows
+
+
+def test_checkpoint_from_another_schema_is_rebuilt(synthetic_dir, tmp_path, monkeypatch):
+    out_csv, store_dir = str(tmp_path / "features.csv"), str(tmp_path / "store")
+    build_full(synthetic_dir, out_csv, store_dir)
+    calls = []
+    monkeypatch.setattr(feature_store, "build_full", lambda *args: calls.append(args) or pd.DataFrame())
+    manifest_path = os.path.join(store_dir, feature_store.MANIFEST_FILE)
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    manifest.pop("feature_schema")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    update_incremental(synthetic_dir, out_csv, store_dir)
+    assert len(calls) == 1
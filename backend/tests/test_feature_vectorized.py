@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+from feature_vectorized import build_both, column_mismatches
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_vectorized_builder_matches_loop_builder(synthetic_dir, workers):
+    expected, actual, _ = build_both(synthetic_dir, workers)
+    pd.testing.assert_frame_equal(actual, expected, check_exact=True)
+    assert column_mismatches(actual, expected) == {}
+
+
+def test_column_mismatches_names_the_differing_rows():
+    expected = pd.DataFrame({"a": [1, 2, 3], "b": [0.5, 0.5, 0.5]})
+    actual = expected.assign(b=[0.5, 0.25, 0.5])
+    assert {col: rows.tolist() for col, rows in column_mismatches(actual, expected).items()} == {"b": [1]}
+    with pytest.raises(ValueError):
+        column_mismatches(actual.drop(columns="b"), expected)
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from backend.app.api import models, predict_dataframe
+from backend.app.inference import parity_cases
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return models.get()
+
+
+@pytest.fixture(scope="module")
+def cases():
+    return parity_cases(models.artifacts.label_encoders)
+
+
+def test_engine_matches_pandas_path(engine, cases):
+    expected = np.array([predict_dataframe(case) for case in cases])
+    np.testing.assert_array_equal(engine.predict_proba_many(cases), expected)
+    np.testing.assert_array_equal([engine.predict_proba_one(case) for case in cases], expected)
+
+
+def test_batch_rows_match_single_rows(engine):
+    rows = [{"teamA": "India", "teamB": "Australia", "venue": "Eden Gardens", "toss_winner": "India",
+             "toss_decision": "bat", "competition": "T20I"},
+            {"teamA": "Unknown XI", "teamB": "India", "venue": "Unknown Ground", "toss_winner": "India",
+             "toss_decision": "field", "competition": "Unknown Cup"}]
+    numeric = np.random.default_rng(0).random((len(rows), len(engine.numeric_positions)))
+    batch = engine.transform_many(rows, numeric)
+    for i, row in enumerate(rows):
+        np.testing.assert_array_equal(batch[i], engine.transform_one(row, numeric[i])[0])
@@ -0,0 +1,78 @@
+import os
+import numpy as np
+import pytest
+from backend.bench.inplay_load import match_messages
+from ingest import index_matches, is_t20
+from inplay import MatchState, STATE_FEATURES, train, training_rows
+
+
+@pytest.fixture(scope="module")
+def inplay_model_path(synthetic_dir, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("inplay") / "inplay.npz")
+    train(synthetic_dir, path)
+    return path
+
+
+def _decided_files(data_dir):
+    return [os.path.join(data_dir, fname) for fname, info in index_matches(data_dir, match_filter=is_t20)
+            if info.get("outcome", {}).get("winner") is not None]
+
+
+def test_wides_and_no_balls_do_not_use_up_balls():
+    state = MatchState("A", "B")
+    state.apply(0, "A", 0, {"runs": {"total": 1}, "extras": {"wides": 1}})
+    state.apply(0, "A", 0, {"runs": {"total": 5}, "extras": {"noballs": 1}})
+    assert state.balls_left == 120 and state.runs == 6
+    state.apply(0, "A", 0, {"runs": {"total": 1}, "extras": {"legbyes": 1}})
+    assert state.balls_left == 119
+
+
+def test_serving_state_matches_training_rows(synthetic_dir):
+    innings, X, _, matches = training_rows(synthetic_dir)
+    balls_left = X[:, STATE_FEATURES.index("balls_left")]
+    runs = X[:, STATE_FEATURES.index("runs")]
+    for i, path in enumerate(_decided_files(synthetic_dir)[:5]):
+        start, deliveries = match_messages(path)
+        state = MatchState(start["match"]["teamA"], start["match"]["teamB"])
+        served = []
+        for message in deliveries:
+            state.apply(message["innings"], message["team"], message["over"], message["delivery"])
+            served.append((state.balls_left, state.runs))
+        np.testing.assert_array_equal(np.array(served), np.column_stack([balls_left, runs])[matches == i])
+
+
+def test_websocket_replays_a_match(synthetic_dir, inplay_model_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.app import api
+
+    monkeypatch.setattr(api.inplay_model, "path", inplay_model_path)
+    monkeypatch.setattr(api.inplay_model, "_model", None)
+    start, deliveries = match_messages(_decided_files(synthetic_dir)[0])
+
+    with TestClient(api.app).websocket_connect("/ws/inplay") as ws:
+        ws.send_json(start)
+        assert ws.receive_json()["type"] == "started"
+        replies = []
+        for message in deliveries:
+            ws.send_json(message)
+            replies.append(ws.receive_json())
+        ws.send_json({"type": "end"})
+        ws.receive_json()
+
+    assert [r["type"] for r in replies] == ["probability"] * len(deliveries)
+    assert [r["ball"] for r in replies] == list(range(1, len(deliveries) + 1))
+    assert all(0.0 <= r["win_probability_teamA"] <= 1.0 for r in replies)
+    last = replies[-1]
+    assert last["innings"] == 1 and last["win_probability_batting"] in (0.0, 0.5, 1.0)
+
+
+def test_delivery_before_start_is_an_error(inplay_model_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from backend.app import api
+
+    monkeypatch.setattr(api.inplay_model, "path", inplay_model_path)
+    monkeypatch.setattr(api.inplay_model, "_model", None)
+    with TestClient(api.app).websocket_connect("/ws/inplay") as ws:
+        ws.send_json({"type": "delivery", "innings": 0, "team": "A", "over": 0, "delivery": {}})
+        reply = ws.receive_json()
+    assert reply["type"] == "error" and "start" in reply["error"]
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import pytest
+from match_id_mapper import HttpCache, build_fixture_index, fetch_cached, lookup_match_id, map_cricsheet_to_espn
+
+PAGES = {
+    "/ipl-2023/fixtures": """<html><body>
+        <a href="/series/ipl-2023/mumbai-vs-chennai-1st-match-1359475/full-scorecard">
+          Mumbai Indians vs Chennai Super Kings, 1st Match <time datetime="2023-04-08">Apr 8</time></a>
+        <a href="/series/ipl-2023/chennai-vs-mumbai-49th-match-1359523/full-scorecard">
+          Chennai Super Kings vs Mumbai Indians, 49th Match <time datetime="2023-05-06">May 6</time></a>
+        <a href="/series/ipl-2023/points-table">Points table</a>
+    </body></html>""",
+    "/ipl-2022/fixtures": """<html><body>
+        <a href="/series/ipl-2022/kolkata-vs-delhi-19th-match-1304065/full-scorecard">
+          Kolkata Knight Riders vs Delhi Capitals, 19th Match</a>
+    </body></html>""",
+}
+
+
+def _etag(body):
+    return '"%s"' % hashlib.sha1(body.encode()).hexdigest()
+
+
+def _respond(path, headers):
+    body = PAGES.get(path)
+    if body is None:
+        return 404, {}, ""
+    if headers.get("If-None-Match") == _etag(body):
+        return 304, {"ETag": _etag(body)}, ""
+    return 200, {"ETag": _etag(body)}, body
+
+
+@pytest.fixture
+def fixtures_server(stub_server):
+    return stub_server(_respond)
+
+
+def _write_matches(data_dir, fixtures):
+    os.makedirs(data_dir)
+    for i, (date, teams) in enumerate(fixtures):
+        with open(os.path.join(data_dir, f"{i}.json"), "w") as f:
+            json.dump({"info": {"dates": [date], "teams": teams, "event": {"name": "IPL"}}, "innings": []}, f)
+
+
+def test_fixture_index_keys_cards_by_pair_and_date():
+    assert build_fixture_index(PAGES["/ipl-2023/fixtures"]) == {
+        (("Chennai", "Mumbai"), "2023-04-08"): "1359475",
+        (("Chennai", "Mumbai"), "2023-05-06"): "1359523",
+    }
+    assert build_fixture_index(PAGES["/ipl-2022/fixtures"]) == {(("Delhi", "Kolkata"), None): "1304065"}
+
+
+def test_same_day_card_resolves():
+    index = build_fixture_index(PAGES["/ipl-2023/fixtures"])
+    assert lookup_match_id(index, "2023-05-06", "Mumbai", "Chennai") == "1359523"
+    assert lookup_match_id(index, "2023-04-08", "Chennai", "Mumbai") == "1359475"
+
+
+def test_card_dated_another_day_does_not_resolve():
+    index = build_fixture_index(PAGES["/ipl-2023/fixtures"])
+    assert lookup_match_id(index, "2018-04-07", "Mumbai", "Chennai") is None
+
+
+def test_undated_card_resolves_any_day():
+    index = build_fixture_index(PAGES["/ipl-2022/fixtures"])
+    assert lookup_match_id(index, "2022-04-10", "Delhi", "Kolkata") == "1304065"
+
+
+def test_maps_archive_against_fixture_pages(fixtures_server, tmp_path):
+    data_dir = str(tmp_path / "data")
+    _write_matches(data_dir, [("2023-05-06", ["Chennai Super Kings", "Mumbai Indians"]),
+                              ("2023-04-08", ["Mumbai Indians", "Chennai Super Kings"]),
+                              ("2022-04-10", ["Delhi Capitals", "Kolkata Knight Riders"]),
+                              ("2018-04-07", ["Mumbai Indians", "Chennai Super Kings"])])
+    series = [("IPL 2023", f"{fixtures_server.url}/ipl-2023/fixtures"),
+              ("IPL 2022", f"{fixtures_server.url}/ipl-2022/fixtures"),
+              ("IPL 2021", f"{fixtures_server.url}/missing")]
+
+    mapping = map_cricsheet_to_espn(data_dir, series, str(tmp_path / "map.json"), str(tmp_path / "http_cache"))
+    assert mapping == {"Chennai_vs_Mumbai_2023-05-06": "1359523", "Mumbai_vs_Chennai_2023-04-08": "1359475",
+                       "Delhi_vs_Kolkata_2022-04-10": "1304065"}
+
+
+def test_http_cache_miss_fetches_and_stores(fixtures_server, tmp_path):
+    url = f"{fixtures_server.url}/ipl-2023/fixtures"
+    cache = HttpCache(str(tmp_path), ttl=3600)
+    assert fetch_cached(url, cache) == PAGES["/ipl-2023/fixtures"]
+    assert fixtures_server.requests == [("/ipl-2023/fixtures", 200)]
+    assert cache.get(url)[1]["etag"] == _etag(PAGES["/ipl-2023/fixtures"])
+
+
+def test_http_cache_hit_within_ttl_sends_nothing(fixtures_server, tmp_path):
+    url = f"{fixtures_server.url}/ipl-2023/fixtures"
+    cache = HttpCache(str(tmp_path), ttl=3600)
+    fetch_cached(url, cache)
+    assert fetch_cached(url, cache) == PAGES["/ipl-2023/fixtures"]
+    assert len(fixtures_server.requests) == 1
+
+
+def test_http_cache_revalidates_stale_entry(fixtures_server, tmp_path):
+    url = f"{fixtures_server.url}/ipl-2023/fixtures"
+    cache = HttpCache(str(tmp_path), ttl=0)
+    fetch_cached(url, cache)
+    assert fetch_cached(url, cache) == PAGES["/ipl-2023/fixtures"]
+    assert fixtures_server.requests == [("/ipl-2023/fixtures", 200), ("/ipl-2023/fixtures", 304)]
+
+
+def test_error_page_is_not_cached(fixtures_server, tmp_path):
+    url = f"{fixtures_server.url}/missing"
+    cache = HttpCache(str(tmp_path), ttl=3600)
+    assert fetch_cached(url, cache) is None
+    assert cache.get(url) == (None, None)
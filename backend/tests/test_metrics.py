@@ -0,0 +1,20 @@
+import pytest
+from backend.app.metrics import Metrics, QUANTILE_WINDOW
+
+
+def _sample(text, line_prefix):
+    return float(next(line for line in text.splitlines() if line.startswith(line_prefix)).rsplit(" ", 1)[1])
+
+
+def test_recent_summary_sum_and_count_cover_the_window():
+    metrics = Metrics()
+    for _ in range(QUANTILE_WINDOW):
+        metrics.observe("latency", (), 1.0)
+    for _ in range(QUANTILE_WINDOW):
+        metrics.observe("latency", (), 0.001)
+    text = metrics.render()
+
+    assert _sample(text, "latency_count ") == 2 * QUANTILE_WINDOW
+    assert _sample(text, "latency_recent_count ") == QUANTILE_WINDOW
+    assert _sample(text, "latency_recent_sum ") == pytest.approx(0.001 * QUANTILE_WINDOW)
+    assert _sample(text, 'latency_recent{quantile="0.5"}') == pytest.approx(0.001)
@@ -0,0 +1,81 @@
+import pandas as pd
+import pytest
+import pitch_conditions
+from pitch_conditions import PITCH_KEYWORDS, PitchCache, classify_pitch_type, get_pitch_types, get_season_pitch_types
+
+CHEPAUK = "MA Chidambaram Stadium, Chepauk"
+FIXTURES = [(CHEPAUK, "2023-04-03"), ("Wankhede Stadium", "2023-04-08"), (CHEPAUK, "2023-05-06")]
+
+
+def _classify_by_count(text):
+    # Reference for the single-pass matcher: one str.count per keyword
+    scores = {k: sum(text.count(kw) for kw in kws) for k, kws in PITCH_KEYWORDS.items()}
+    if all(v == 0 for v in scores.values()):
+        return "unknown"
+    return max(scores.items(), key=lambda x: x[1])[0]
+
+
+@pytest.fixture
+def espn(stub_server, monkeypatch):
+    """Stand-in for ESPN search and pitch reports; searches for Eden are rate limited."""
+    def respond(path, headers):
+        if path.startswith("/search/") and "Eden" in path:
+            return 429, {}, "<p>Too many requests, slow down</p>"
+        if path.startswith("/search/"):
+            slug = "spin" if "Chepauk" in path else "flat"
+            return 200, {}, f'<a href="{server.url}/pitch-report-{slug}">report</a><a href="/other">x</a>'
+        if path == "/pitch-report-spin":
+            return 200, {}, "<p>A dry surface that will turn and grip; spin-friendly.</p>"
+        if path == "/pitch-report-flat":
+            return 200, {}, "<p>Flat deck, plenty of runs, a run fest expected.</p>"
+        return 404, {}, ""
+
+    server = stub_server(respond)
+    monkeypatch.setattr(pitch_conditions, "ESPN_SEARCH_URL", f"{server.url}/search/{{query}}")
+    return server
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return str(tmp_path / "pitch_cache.json")
+
+
+def test_fixtures_are_classified_from_reports(espn, cache_path):
+    results = get_pitch_types(FIXTURES, cache=PitchCache(cache_path), per_host_interval=0.05)
+    assert results == {(CHEPAUK, "2023-04-03"): "spin", ("Wankhede Stadium", "2023-04-08"): "batting",
+                       (CHEPAUK, "2023-05-06"): "spin"}
+
+
+def test_one_search_per_venue(espn, cache_path):
+    get_pitch_types(FIXTURES, cache=PitchCache(cache_path), per_host_interval=0.05)
+    searches = [path for path, _ in espn.requests if path.startswith("/search/")]
+    assert len(searches) == 2 and len(espn.requests) == 4
+
+
+def test_second_lookup_is_served_from_persistent_cache(espn, cache_path):
+    first = get_pitch_types(FIXTURES, cache=PitchCache(cache_path), per_host_interval=0.05)
+    requests_made = len(espn.requests)
+    assert get_pitch_types(FIXTURES, cache=PitchCache(cache_path)) == first
+    assert len(espn.requests) == requests_made
+
+
+def test_failed_fetch_is_not_cached(espn, cache_path):
+    fixture = ("Eden Gardens", "2023-04-23")
+    assert get_pitch_types([fixture], cache=PitchCache(cache_path)) == {fixture: "unknown"}
+    assert espn.requests[-1][1] == 429
+    assert PitchCache(cache_path).get(*fixture) is None
+
+
+def test_season_without_matches_is_an_empty_series():
+    matches = pd.DataFrame({"venue": ["Wankhede Stadium"], "date": ["2023-04-08"]})
+    pitch_types = get_season_pitch_types(matches, season=2019)
+    assert isinstance(pitch_types, pd.Series) and pitch_types.empty
+    assert get_season_pitch_types(pd.DataFrame({"venue": [], "date": []})).empty
+
+
+@pytest.mark.parametrize("text", [
+    "spin-friendly, assists spinners, slow turn", "green seam pace in space", "",
+    "balanced even contest flat", "a flat deck with plenty of runs; the new ball may seam",
+])
+def test_single_pass_matches_str_count(text):
+    assert classify_pitch_type(text) == _classify_by_count(text)
@@ -0,0 +1,28 @@
+import json
+import os
+import numpy as np
+import player_tracker
+from ingest import index_matches, is_t20, load_record
+
+
+def _replay(matches):
+    player_tracker.reset_trackers()
+    for match in matches:
+        player_tracker.update_player_stats(match)
+    return player_tracker.export_state()
+
+
+def test_raw_matches_update_like_ingest_records(synthetic_dir):
+    entries = index_matches(synthetic_dir, match_filter=is_t20)[:40]
+    raw = []
+    for fname, _ in entries:
+        with open(os.path.join(synthetic_dir, fname), "r", encoding="utf-8") as f:
+            raw.append(json.load(f))
+
+    from_raw = _replay(raw)
+    players = sorted(player_tracker.engine.registry.names)
+    raw_form = player_tracker.get_team_form_scores([players])
+    from_records = _replay(load_record(synthetic_dir, fname, info) for fname, info in entries)
+
+    assert from_raw == from_records
+    np.testing.assert_array_equal(raw_form, player_tracker.get_team_form_scores([players]))
@@ -0,0 +1,114 @@
+import pytest
+import prediction_cache
+from prediction_cache import MemoryCache, SqliteCache, cache_key, make_cache, normalize_input
+
+VALUES = {"teamA": "Mumbai Indians", "teamB": "Chennai Super Kings", "venue": "Wankhede Stadium",
+          "toss_winner": "Mumbai Indians", "toss_decision": "field", "competition": "IPL"}
+
+
+class FakeClock:
+    """Stands in for the time module; memory entries age on monotonic(), SQLite ones on time()."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(prediction_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make(request, tmp_path, clock):
+    def make(max_entries=100, ttl=60.0):
+        if request.param == "memory":
+            return MemoryCache(max_entries, ttl)
+        cache = SqliteCache(str(tmp_path / "predictions.sqlite"), max_entries, ttl)
+        cache.TRIM_EVERY = 1  # trim on every insert so eviction is observable at once
+        return cache
+    return make
+
+
+def _key(teamA, model_version="v1"):
+    return cache_key(dict(VALUES, teamA=teamA), model_version, "snap-1")
+
+
+def test_least_recently_used_entry_is_evicted_at_capacity(make, clock):
+    cache = make(max_entries=2)
+    cache.put(_key("A"), 0.1)
+    clock.advance(1)
+    cache.put(_key("B"), 0.2)
+    clock.advance(1)
+    assert cache.get(_key("A")) == 0.1
+    clock.advance(1)
+    cache.put(_key("C"), 0.3)
+
+    assert cache.get(_key("B")) is None
+    assert cache.get(_key("A")) == 0.1 and cache.get(_key("C")) == 0.3
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1
+
+
+def test_entry_expires_after_ttl(make, clock):
+    cache = make(ttl=60.0)
+    cache.put(_key("A"), 0.4)
+    clock.advance(59)
+    assert cache.get(_key("A")) == 0.4
+    clock.advance(1)
+    assert cache.get(_key("A")) is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1 and stats["entries"] == 0
+
+
+def test_new_model_version_misses_old_entries(make):
+    cache = make()
+    cache.put(_key("A", "v1"), 0.5)
+    assert _key("A", "v1") != _key("A", "v2")
+    assert cache.get(_key("A", "v2")) is None
+
+
+def test_model_reload_invalidates_old_version(make):
+    cache = make()
+    cache.put(_key("A", "v1"), 0.5)
+    cache.invalidate("v2")
+    assert cache.get(_key("A", "v1")) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_sqlite_invalidation_keeps_entries_of_the_new_version(tmp_path):
+    # Other workers may already have cached under the new model
+    cache = SqliteCache(str(tmp_path / "predictions.sqlite"))
+    cache.put(_key("A", "v1"), 0.5)
+    cache.put(_key("B", "v2"), 0.6)
+    cache.invalidate("v2")
+    assert cache.get(_key("A", "v1")) is None and cache.get(_key("B", "v2")) == 0.6
+
+
+def test_sqlite_entries_are_shared_between_instances(tmp_path):
+    path = str(tmp_path / "predictions.sqlite")
+    SqliteCache(path).put(_key("A"), 0.7)
+    assert SqliteCache(path).get(_key("A")) == 0.7
+
+
+def test_whitespace_does_not_change_the_key():
+    padded = {field: f"  {value} " for field, value in VALUES.items()}
+    assert cache_key(normalize_input(padded), "v1", "snap-1") == cache_key(normalize_input(VALUES), "v1", "snap-1")
+
+
+def test_make_cache_backends(tmp_path):
+    assert make_cache("off").get(_key("A")) is None
+    assert make_cache("memory").backend == "memory"
+    assert make_cache(f"sqlite:{tmp_path / 'predictions.sqlite'}").backend == "sqlite"
+    with pytest.raises(ValueError):
+        make_cache("redis")